@@ -3,49 +3,295 @@ stock exchange holidays"""
 
 from  pandas.tseries.offsets import *
 from datetime import date, datetime, timedelta
+import hashlib
+import numpy as np
 import pandas as pd
+import logging
 import myLogger
+from holidayrules import *
+from pyquantdateutils import is_date_array, as_datetime64, datetime64_as_days, like_dates
 
 # create logger
-module_logger = myLogger.TLogger(__name__)
-
-#gives names to calendar numbers for readability and to use globally within module
-Monday      = 1
-Tuesday     = 2
-Wednesday   = 3
-Thursday    = 4
-Friday      = 5
-Saturday    = 6
-Sunday      = 7
-
-January     = 1
-February    = 2
-March       = 3
-April       = 4
-May         = 5
-June        = 6
-July        = 7
-August      = 8
-September   = 9
-October     = 10
-November    = 11
-December    = 12
+module_logger = myLogger.getLogger(__name__)
 
 class Singleton(type):
     """Need a Singleton class to make all HolidayProfiles singletons.
-       Each HolidayProfile can only bee instantiated once.
-       HolidayProfile defines a metaclass that uses this SIngleton class."""
+       Each HolidayProfile can only bee instantiated once, so all users of a profile
+       share its cached business-day tables.
+       HolidayProfile uses this SIngleton class as metaclass."""
     
     def __call__(self, *args, **kwargs):
         if 'instance' not in self.__dict__:
             self.instance = super(Singleton, self).__call__(*args, **kwargs)
         return self.instance
 
-class HolidayProfile(object):
+def _toDay(date):
+    """Returns the day number of a date, datetime or Timestamp counted from 1970-01-01."""
+    return date.toordinal() - EPOCH_ORDINAL
+
+def _shiftTo(date, day):
+    """Moves a date, datetime or Timestamp to the given day number, keeping the time of day."""
+    return date + timedelta(int(day) - _toDay(date))
+
+def _splitYears(firstyear, lastyear, businessdays, holidays):
+    """Splits the tables of consecutive years, starting on January 1st of firstyear, into a dict of per-year tables."""
+    bounds = epoch_days(np.arange(firstyear, lastyear + 2), 1, 1) - epoch_days(firstyear, 1, 1)
+    return dict((year, (businessdays[start:end], holidays[start:end]))
+                for year, start, end in zip(range(firstyear, lastyear + 1), bounds[:-1], bounds[1:]))
+
+def _asDays(dates):
+    """Returns the day number of a date, or the day numbers of an array of dates without NaT."""
+    if not is_date_array(dates):
+        return _toDay(dates)
+    values = as_datetime64(dates)
+    if np.isnat(values).any():
+        raise ValueError("Dates must not contain NaT")
+    return datetime64_as_days(values)
+
+
+class BusinessDayIndex(object):
+    """Business-day tables for a contiguous range of days, starting at day number first
+       (days counted from 1970-01-01). Besides the business-day and holiday bitmaps it keeps
+       the number of business days before each day and the position of every business day,
+       so that checking a day, counting business days and adding business days are all
+       array lookups independent of the distance involved.
+       All lookups accept single day numbers as well as arrays of day numbers.
+
+       >>> index = BusinessDayIndex(0, np.array([1, 0, 1, 1, 0, 1], dtype=bool), np.zeros(6, dtype=bool))
+       >>> int(index.count(0, 6)), int(index.add(0, 2)), int(index.add(5, -3))
+       (4, 3, 0)
+       >>> index.add(np.array([0, 1, 4]), np.array([1, 0, -1])).tolist()
+       [2, 1, 3]
+       >>> index.following(np.array([1, 4])).tolist(), index.preceding(np.array([1, 4])).tolist()
+       ([2, 5], [0, 3])
+    """
+
+    def __init__(self, first, businessdays, holidays):
+        self.first = first
+        self.last = first + len(businessdays) - 1
+        self.businessdays = businessdays
+        self.holidays = holidays
+        #number of business days before each day, with one extra entry for the day after the last
+        self.cumulative = np.concatenate(([0], np.cumsum(businessdays, dtype=np.int64)))
+        #offset from first of the k-th business day
+        self.positions = np.flatnonzero(businessdays)
+
+    def covers(self, first, last):
+        return self.first <= first and last <= self.last
+
+    def isBusinessDay(self, day):
+        return self.businessdays[day - self.first]
+
+    def isHoliday(self, day):
+        return self.holidays[day - self.first]
+
+    def count(self, start, end):
+        """Number of business days from start (inclusive) to end (exclusive),
+           negative if end is before start."""
+        return self.cumulative[end - self.first] - self.cumulative[start - self.first]
+
+    def businessDay(self, k):
+        """Returns the day number of the k-th business day of the index.
+           Raises IndexError if k lies outside the index."""
+        if np.any(k < 0) or np.any(k >= len(self.positions)):
+            raise IndexError("Business day lies outside the index")
+        return self.first + self.positions[k]
+
+    def add(self, day, n):
+        """Returns the n-th business day after day (before day if n is negative),
+           day itself if n is 0. Raises IndexError if the result lies outside the index."""
+        i = day - self.first
+        if np.ndim(n) == 0:
+            if n == 0:
+                return day
+            return self.businessDay(self.cumulative[i + 1] + (n - 1) if n > 0 else self.cumulative[i] + n)
+        k = np.where(n > 0, self.cumulative[i + 1] + n - 1, self.cumulative[i] + n)
+        return np.where(n == 0, day, self.businessDay(np.where(n == 0, 0, k)))
+
+    def following(self, day):
+        """Returns day if it is a business day, otherwise the next business day."""
+        return self.businessDay(self.cumulative[day - self.first])
+
+    def preceding(self, day):
+        """Returns day if it is a business day, otherwise the previous business day."""
+        return self.businessDay(self.cumulative[day - self.first + 1] - 1)
+
+
+class BusinessCalendar(object):
+    """Base class of calendars that answer business-day questions from precomputed tables.
+       Subclasses implement _buildYear(year), which returns the business-day and holiday
+       bitmaps of one year. Each year is built once and cached; the years needed are joined
+       into a BusinessDayIndex which grows on demand.
+       All queries take a single date, datetime or Timestamp, or an array of dates:
+       a datetime64 array, a DatetimeIndex, a Series or a list of dates. Arrays are answered
+       with one vectorized lookup; dates returned for arrays keep the type of the input
+       and their time of day, NaT stays NaT.
+    """
+
+    def __init__(self):
+        self._years = {}
+        self._index = None
+        self._packed = None
+
+    def _buildYear(self, year):
+        raise NotImplementedError
+
+    def _buildYears(self, firstyear, lastyear):
+        """Returns a dict with the tables of the years firstyear to lastyear. Subclasses that
+           build many years at once faster than one at a time override this."""
+        return dict((year, self._buildYear(year)) for year in range(firstyear, lastyear + 1))
+
+    def businessDayTable(self, year):
+        """Returns the cached boolean array of business days of the year, one entry per calendar day."""
+        return self._yearTables(year)[0]
+
+    def _yearTables(self, year):
+        self._ensureYears(year, year)
+        return self._years[year]
+
+    def _ensureYears(self, firstyear, lastyear):
+        """Builds the years from firstyear to lastyear that are not cached yet, in one batch."""
+        missing = [year for year in range(firstyear, lastyear + 1) if year not in self._years]
+        if missing:
+            packed = self._packed
+            if packed is not None and packed[0] <= missing[0] and missing[-1] <= packed[1]:
+                tables = self._unpackYears(missing[0], missing[-1])
+            else:
+                tables = self._buildYears(missing[0], missing[-1])
+            for year, yeartables in tables.items():
+                self._years.setdefault(year, yeartables)
+
+    def installTables(self, firstyear, lastyear, businessbits, holidaybits):
+        """Takes the tables of the years firstyear to lastyear from bitmaps packed with
+           np.packbits(..., bitorder="little"), one bit per day from January 1st of firstyear,
+           e.g. memory-mapped from a calendar file (see holidaycalendar.Calendar). These years are
+           unpacked on first use instead of being built; tables built before are dropped."""
+        self._packed = (firstyear, lastyear, businessbits, holidaybits)
+        self._years = {}
+        self._index = None
+
+    def _unpackYears(self, firstyear, lastyear):
+        """Unpacks the installed tables of the years firstyear to lastyear."""
+        packedfirst, packedlast, businessbits, holidaybits = self._packed
+        start = int(epoch_days(firstyear, 1, 1) - epoch_days(packedfirst, 1, 1))
+        end = int(epoch_days(lastyear, 12, 31) - epoch_days(packedfirst, 1, 1)) + 1
+        def unpack(bits):
+            days = np.unpackbits(bits[start // 8:(end + 7) // 8], bitorder="little")
+            return days[start % 8:start % 8 + end - start].view(bool)
+        return _splitYears(firstyear, lastyear, unpack(businessbits), unpack(holidaybits))
+
+    def businessDayIndex(self, first, last):
+        """Returns a BusinessDayIndex covering at least the day numbers first to last, in whole years."""
+        index = self._index
+        if index is not None and index.covers(first, last):
+            return index
+        if index is not None:
+            first, last = min(first, index.first), max(last, index.last)
+        firstyear = (date.fromordinal(int(first) + EPOCH_ORDINAL)).year
+        lastyear = (date.fromordinal(int(last) + EPOCH_ORDINAL)).year
+        self._ensureYears(firstyear, lastyear)
+        tables = [self._years[year] for year in range(firstyear, lastyear + 1)]
+        self._index = BusinessDayIndex(_toDay(date(firstyear, 1, 1)),
+                                       np.concatenate([t[0] for t in tables]),
+                                       np.concatenate([t[1] for t in tables]))
+        return self._index
+
+    def _lookup(self, dates, lookup):
+        """Applies lookup(index, days) to a single date or an array of dates; for NaT the result is False."""
+        if not is_date_array(dates):
+            day = _toDay(dates)
+            return bool(lookup(self.businessDayIndex(day, day), day))
+        values = as_datetime64(dates)
+        days = datetime64_as_days(values)
+        valid = ~np.isnat(values)
+        result = np.zeros(values.shape, dtype=bool)
+        if valid.any():
+            days = days[valid]
+            result[valid] = lookup(self.businessDayIndex(days.min(), days.max()), days)
+        return like_dates(dates, result)
+
+    def _move(self, dates, span, move):
+        """Moves a single date or an array of dates to the days returned by move(index, days).
+           The index is grown by span days around the dates until it holds the results."""
+        if not is_date_array(dates):
+            day = _toDay(dates)
+            first, last = day, day
+        else:
+            values = as_datetime64(dates)
+            days = datetime64_as_days(values)
+            valid = ~np.isnat(values)
+            if not valid.any():
+                return like_dates(dates, values)
+            first, last = days[valid].min(), days[valid].max()
+        while True:
+            index = self.businessDayIndex(first - span, last + span)
+            try:
+                if not is_date_array(dates):
+                    return _shiftTo(dates, move(index, day))
+                newdays = days.copy()
+                newdays[valid] = move(index, days[valid])
+                break
+            except IndexError:
+                span *= 2
+        return like_dates(dates, values + (newdays - days).astype("timedelta64[D]"))
+
+    @property
+    def name(self):
+        return self.__class__.__name__
+
+    def __and__(self, other):
+        """Calendar of the days that are business days in both calendars."""
+        return JointCalendar.combine((self, other), JOIN_BUSINESS_DAYS)
+
+    def __or__(self, other):
+        """Calendar of the days that are business days in either calendar."""
+        return JointCalendar.combine((self, other), JOIN_HOLIDAYS)
+
+    def isBusinessDay(self, date):
+        """Looks the date up in the business-day table."""
+        return self._lookup(date, BusinessDayIndex.isBusinessDay)
+
+    def isHoliday(self, date):
+        """Looks the date, or an array of dates, up in the cached holiday table of the year."""
+        return self._lookup(date, BusinessDayIndex.isHoliday)
+
+    def addBusinessDays(self, date, n):
+        """Returns the date n business days after date (before date if n is negative),
+           keeping the time of day. For n = 0 the date itself is returned.
+           For an array of dates n is a single number or one number per date."""
+        if is_date_array(date):
+            if np.ndim(n) > 0:
+                n = np.broadcast_to(np.asarray(n, dtype=np.int64), np.shape(date))
+                n = n[~np.isnat(as_datetime64(date))]
+        span = 2 * int(np.abs(n).max(initial=0)) + 31
+        return self._move(date, span, lambda index, days: index.add(days, n))
+
+    def rollForward(self, date):
+        """Returns date if it is a business day, otherwise the next business day."""
+        return self._move(date, 31, BusinessDayIndex.following)
+
+    def rollBackward(self, date):
+        """Returns date if it is a business day, otherwise the previous business day."""
+        return self._move(date, 31, BusinessDayIndex.preceding)
+
+    def businessDaysBetween(self, start, end):
+        """Returns the number of business days from start (inclusive) to end (exclusive).
+           The result is negative if end is before start.
+           start and end can be arrays of dates of the same length, or one of them a single date."""
+        if not (is_date_array(start) or is_date_array(end)):
+            startday, endday = _toDay(start), _toDay(end)
+            return int(self.businessDayIndex(min(startday, endday), max(startday, endday)).count(startday, endday))
+        startdays, enddays = _asDays(start), _asDays(end)
+        first = min(np.min(startdays), np.min(enddays))
+        last = max(np.max(startdays), np.max(enddays))
+        return self.businessDayIndex(first, last).count(startdays, enddays)
+
+
+class HolidayProfile(BusinessCalendar, metaclass=Singleton):
 
     """HolidayProfile is the superclass for all calendars. Per default Saturday and Sunday are weekends and are not business days. 
        This needs to be overwritten for Arabic countries where Friday and Saturday are weekends.
-       No national holidays are declared in this base class. These can be added in subclass by overwriting the isHoliday() function.
+       No national holidays are declared in this base class. These are declared in subclasses as rules, see holidayrules.
        Contains a function to calculate Easter for a given year. This is often needed for Western calendars and was put in the base class
        so that all subclasses inherit the function.
        It also contains a function to calculate the Vernal and Autumn Equinox which is needed for Asian calendars.
@@ -74,59 +320,83 @@ class HolidayProfile(object):
        True
        >>> h.EasterSunday(2012)
        datetime.date(2012, 4, 8)
+       >>> h.addBusinessDays(HolyNight_Tuesday, 5)
+       datetime.datetime(2008, 12, 31, 0, 0)
+       >>> h.businessDaysBetween(HolyNight_Tuesday, datetime(2009, 1, 1))
+       6
+       >>> NYSE() is NYSE(), NYSE() is LSE()
+       (True, False)
     """
 
-    __metaclass__ = Singleton # see http://stackoverflow.com/questions/100003/what-is-a-metaclass-in-python
-
     def __init__(self):
-        self.logger = myLogger.TLogger(self.__class__.__name__)
-        self.logger.debug("Creating holiday profile: {}".format(self.__class__.__name__))
+        super(HolidayProfile, self).__init__()
+        self.logger = myLogger.getLogger(self.__class__.__name__)
+        self.logger.debug("Creating holiday profile: %s", self.__class__.__name__)
+
+    #declarative holiday rules of the profile, see holidayrules
+    rules = ()
+
+    def _buildYear(self, year):
+        return self._buildYears(year, year)[year]
+
+    def _buildYears(self, firstyear, lastyear):
+        """Evaluates the weekend and holiday rules for all days of the years at once.
+        Profiles that still implement _isHoliday by hand are evaluated once per day."""
+        fields = DayFields.forYears(firstyear, lastyear)
+        holidays = holiday_mask(self.rules, fields)
+        if type(self)._isHoliday != HolidayProfile._isHoliday:
+            epoch = datetime(1970, 1, 1)
+            holidays |= np.array([self._isHoliday(epoch + timedelta(int(day))) for day in fields.days], dtype=bool)
+        weekends = self.isWeekend(fields.days.astype("datetime64[D]"))
+        businessdays = ~(holidays | weekends)
+        return _splitYears(firstyear, lastyear, businessdays, holidays)
         
+    def ruleHash(self):
+        """Returns a fingerprint of the rules of the profile. Tables stored with another
+        fingerprint were built from other rules and are stale."""
+        parts = [self.__class__.__name__, repr(self.rules)]
+        for name in ("_isHoliday", "isWeekend"):
+            function = getattr(type(self), name)
+            if function != getattr(HolidayProfile, name):
+                #hand-written rules can only be told apart by their code
+                code = getattr(function, "__func__", function).__code__
+                parts.append(repr((code.co_code, code.co_consts)))
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
     def isWeekend(self, date):
-        """In this base class Weekend is defined as Saturday and Sunday. For differen weekends, e.g. Saudi Arabia this method needs to be overwritten. """
+        """In this base class Weekend is defined as Saturday and Sunday. For differen weekends, e.g. Saudi Arabia this method needs to be overwritten.
+        Also takes an array of dates."""
+        if is_date_array(date):
+            #1970-01-01 was a Thursday
+            isoweekdays = (datetime64_as_days(as_datetime64(date)) + Thursday - 1) % 7 + 1
+            return like_dates(date, isoweekdays > Friday)
         return date.isoweekday() > Friday
 
-    def isHoliday(self, date):
-        """No holidays defined in the base class. Returns falls for all dates."""
+    def _isHoliday(self, date):
+        """Hand-written holiday rules for a single date, evaluated once per day when the tables
+        of a year are built in addition to the rules. Prefer declaring rules, which are evaluated
+        for whole years at once. No holidays defined in the base class. Returns falls for all dates."""
         return False
         
     def isBusinessDay(self, date):
-        """If not weekend or holiday it's a business day."""
-        return not(self.isWeekend(date) or self.isHoliday(date))
+        """If not weekend or holiday it's a business day.
+        The answer is looked up in the cached business-day table of the year."""
+        return super(HolidayProfile, self).isBusinessDay(date)
         
     def EasterSunday(self, year):
         """Returns Easter as a date object.
         Uses the Butcher alogrithm. The date for Easter is needed for most Western calendars."""
-        a = year % 19
-        b = year // 100
-        c = year % 100
-        d = (19 * a + b - b // 4 - ((b - (b + 8) // 25 + 1) // 3) + 15) % 30
-        e = (32 + 2 * (b % 4) + 2 * (c // 4) - d - (c % 4)) % 7
-        f = d + e - 7 * ((a + 11 * d + 22 * e) // 451) + 114
-        month = f // 31
-        day = f % 31 + 1
-        return date(year, month, day)
+        return date.fromordinal(int(easter_sunday(year)) + EPOCH_ORDINAL)
         
     def VernalEquinox(self, year):
-        """Returns vernal equinox as date object.
+        """Returns the day in March of the vernal equinox.
         Needed for some Eastern calendars."""
-        exact_vernal_equinox_time = 20.69115
-        ve = self.__Equinox(exact_vernal_equinox_time, year)
-        return ve
+        return int(equinox_day(VERNAL_EQUINOX, year))
         
     def AutumnalEquinox(self,year):
-        """Returns autunal equinox as date object.
+        """Returns the day in September of the autunal equinox.
         Needed for some Eastern calendars."""
-        exact_autumnal_equinox_time = 23.09
-        ae = self.__Equinox(exact_autumnal_equinox_time, year)
-        return ae
-        
-    def __Equinox(self, equinoxtime, y):
-        diff_per_year = 0.242194;
-        moving_amount = (y-2000)*diff_per_year
-        number_of_leap_years = (y-2000)//4+(y-2000)//100-(y-2000)//400
-        equinoxday = equinoxtime + moving_amount - number_of_leap_years
-        return int(equinoxday)
+        return int(equinox_day(AUTUMNAL_EQUINOX, year))
         
 
 class NYSE(HolidayProfile):
@@ -157,65 +427,51 @@ class NYSE(HolidayProfile):
         False
     """
 
-    def isHoliday(self, date):
-        
-        self.logger.debug("Calculating holiday for {}".format(date))
-        #split date into components for easy readability in holiday rules below
-        w = date.isoweekday() #where Monday is 1 and Sunday is 7
-        m = date.month          #Between 1 and 12 inclusive.
-        d = date.day    #Between 1 and the number of days in the given month of the given year.
-        y = date.year            #Between MINYEAR and MAXYEAR inclusive.
-        es = self.EasterSunday(y)
-        dayoffset = pd.offsets.Day(1)
-
-        holiday =   (
-            # Presidential election days
-            (y % 4 == 0 and m == November and d <= 7 and w == Tuesday)
-            # New Year's Day (possibly moved to Monday if on Sunday)
-            or ((d == 1 or (d == 2 and w == Monday)) and m == January)
-            # Washington's birthday (third Monday in February)
-            or ((d >= 15 and d <= 21) and w == Monday and m == February)
-            # Good Friday
-            or (date == es- 2 * dayoffset)
-            # Memorial Day (last Monday in May)
-            or (d >= 25 and w == Monday and m == May)
-            # Independence Day (Monday if Sunday or Friday if Saturday)
-            or ((d == 4 or (d == 5 and w == Monday) or
-            (d == 3 and w == Friday)) and m == July)
-            # Labor Day (first Monday in September)
-            or (d <= 7 and w == Monday and m == September)
-            # Thanksgiving Day (fourth Thursday in November)
-            or ((d >= 22 and d <= 28) and w == Thursday and m == November)
-            # Christmas (Monday if Sunday or Friday if Saturday)
-            or ((d == 25 or (d == 26 and w == Monday) or
-            (d == 24 and w == Friday)) and m == December)
-            # Martin Luther King's birthday (third Monday in January)
-            or ((d >= 15 and d <= 21) and w == Monday and m == January)
-            # President Reagan's funeral
-            or (y == 2004 and m == June and d == 11)
-            #September 11, 2001
-            or (y == 2001 and m == September and (11 <= d and d <= 14))
-            # President Ford's funeral
-            or (y == 2007 and m == January and d == 2)
-            #1977 Blackout
-            or (y == 1977 and m == July and d == 14)
-            #Funeral of former President Lyndon B. Johnson.
-            or (y == 1973 and m == January and d == 25)
-            # Funeral of former President Harry S. Truman
-            or (y == 1972 and m == December and d == 28)
-            # National Day of Participation for the lunar exploration.
-            or (y == 1969 and m == July and d == 21)
-            # Funeral of former President Eisenhower.
-            or (y == 1969 and m == March and d == 31)
-            # Closed all day - heavy snow.
-            or (y == 1969 and m == February and d == 10)
-            # Day after Independence Day.
-            or (y == 1968 and m == July and d == 5)
-            #June 12-Dec. 31, 1968
-            # Four day week (closed on Wednesdays) - Paperwork Crisis
-            or (y == 1968 and dd >= 163 and w == Wednesday))
-
-        return holiday
+    rules = (
+        # Presidential election days
+        WeekdayInRange(November, Tuesday, 1, 7, every=4),
+        # New Year's Day (possibly moved to Monday if on Sunday)
+        FixedDate(January, 1, observed=MONDAY_IF_SUNDAY),
+        # Washington's birthday (third Monday in February)
+        NthWeekday(February, Monday, 3),
+        # Good Friday
+        EasterOffset(-2),
+        # Memorial Day (last Monday in May)
+        LastWeekday(May, Monday),
+        # Independence Day (Monday if Sunday or Friday if Saturday)
+        FixedDate(July, 4, observed=NEAREST_WEEKDAY),
+        # Labor Day (first Monday in September)
+        NthWeekday(September, Monday, 1),
+        # Thanksgiving Day (fourth Thursday in November)
+        NthWeekday(November, Thursday, 4),
+        # Christmas (Monday if Sunday or Friday if Saturday)
+        FixedDate(December, 25, observed=NEAREST_WEEKDAY),
+        # Martin Luther King's birthday (third Monday in January)
+        NthWeekday(January, Monday, 3),
+        # President Reagan's funeral
+        OneOff(date(2004, 6, 11)),
+        #September 11, 2001
+        Closure(date(2001, 9, 11), date(2001, 9, 14)),
+        # President Ford's funeral
+        OneOff(date(2007, 1, 2)),
+        #1977 Blackout
+        OneOff(date(1977, 7, 14)),
+        #Funeral of former President Lyndon B. Johnson.
+        OneOff(date(1973, 1, 25)),
+        # Funeral of former President Harry S. Truman
+        OneOff(date(1972, 12, 28)),
+        # National Day of Participation for the lunar exploration.
+        OneOff(date(1969, 7, 21)),
+        # Funeral of former President Eisenhower.
+        OneOff(date(1969, 3, 31)),
+        # Closed all day - heavy snow.
+        OneOff(date(1969, 2, 10)),
+        # Day after Independence Day.
+        OneOff(date(1968, 7, 5)),
+        #June 12-Dec. 31, 1968
+        # Four day week (closed on Wednesdays) - Paperwork Crisis
+        Closure(date(1968, 6, 11), date(1968, 12, 31), weekdays=(Wednesday,)),
+        )
 
 
 class LSE(HolidayProfile):
@@ -245,41 +501,31 @@ class LSE(HolidayProfile):
         False
     """
 
-    def isHoliday(self, date):
-        #  split date into components fand easy readability in holiday rules below
-        w = date.isoweekday() #where Monday is 1 and Sunday is 7
-        m = date.month          #Between 1 and 12 inclusive.
-        d = date.day    #Between 1 and the number of days in the given month of the given year.
-        y = date.year            #Between MINYEAR and MAXYEAR inclusive.
-        es = self.EasterSunday(y)
-        dayoffset = pd.offsets.Day(1)
-
-        holiday =   (
-            # New Year's Day (possibly moved to Monday)
-            ((d == 1 or ((d == 2 or d == 3) and w == Monday)) and m == January)
-            #Good Friday
-            or (date == es - 2*dayoffset)
-            #Easter Monday
-            or (date == es + dayoffset)
-            #first Monday of May (Early May Bank Holiday)
-            or (d <= 7 and w == Monday and m == May)
-            #last Monday of May (Spring Bank Holiday)
-            or (d >= 25 and w == Monday and m == May and y != 2002)
-            #last Monday of August (Summer Bank Holiday)
-            or (d >= 25 and w == Monday and m == August)
-            # Christmas (possibly moved to Monday and Tuesday)
-            or ((d == 25 or (d == 27 and (w == Monday or w == Tuesday))) and m == December)
-            #Boxing Day (possibly moved to Monday and Tuesday)
-            or ((d == 26 or (d == 28 and (w == Monday or w == Tuesday))) and m == December)
-            #June 3rd, 2002 only (Golden Jubilee Bank Holiday)
-            #June 4rd, 2002 only (special Spring Bank Holiday)
-            or ((d == 3 or d == 4) and m == June and y == 2002)
-            #June 5th, 2012 only (Diamond Jubilee Bank Holiday)
-            or (d == 5 and m == June and y == 2012)
-            #December 31st, 1999 only
-            or (d == 31 and m == December and y == 1999))
-            
-        return holiday
+    rules = (
+        # New Year's Day (possibly moved to Monday)
+        FixedDate(January, 1, observed=MONDAY_IF_WEEKEND),
+        #Good Friday
+        EasterOffset(-2),
+        #Easter Monday
+        EasterOffset(1),
+        #first Monday of May (Early May Bank Holiday)
+        NthWeekday(May, Monday, 1),
+        #last Monday of May (Spring Bank Holiday)
+        LastWeekday(May, Monday, except_years=(2002,)),
+        #last Monday of August (Summer Bank Holiday)
+        LastWeekday(August, Monday),
+        # Christmas (possibly moved to Monday and Tuesday)
+        FixedDate(December, 25, observed=CHRISTMAS_BOXING_DAY),
+        #Boxing Day (possibly moved to Monday and Tuesday)
+        FixedDate(December, 26, observed=CHRISTMAS_BOXING_DAY),
+        #June 3rd, 2002 only (Golden Jubilee Bank Holiday)
+        #June 4rd, 2002 only (special Spring Bank Holiday)
+        OneOff(date(2002, 6, 3), date(2002, 6, 4)),
+        #June 5th, 2012 only (Diamond Jubilee Bank Holiday)
+        OneOff(date(2012, 6, 5)),
+        #December 31st, 1999 only
+        OneOff(date(1999, 12, 31)),
+        )
 
 
 class LME(HolidayProfile):
@@ -309,53 +555,28 @@ class LME(HolidayProfile):
         False
     """
 
-    def isHoliday(self, date):
-        
-        #split date into components fand easy readability in holiday rules below
-        w = date.isoweekday() #where Monday is 1 and Sunday is 7
-        m = date.month          #Between 1 and 12 inclusive.
-        d = date.day    #Between 1 and the number of days in the given month of the given year.
-        y = date.year            #Between MINYEAR and MAXYEAR inclusive.
-        es = self.EasterSunday(y)
-        dayoffset = pd.offsets.Day(1)
-
-        holiday =   (
-            # New Year's Day (possibly moved to Monday)
-            ((d == 1 or ((d == 2 or d == 3) and w == Monday)) and m == January)
-            #Good Friday
-            or (date == es - 2*dayoffset)
-            #Easter Monday
-            or (date == es + dayoffset)
-            # first Monday of May (Early May Bank Holiday)
-            or (d <= 7 and w == Monday and m == May)
-            # last Monday of May (Spring Bank Holiday)
-            or (d >= 25 and w == Monday and m == May and y != 2002)
-            # last Monday of August (Summer Bank Holiday)
-            or (d >= 25 and w == Monday and m == August)
-            # Christmas (possibly moved to Monday and Tuesday)
-            or ((d == 25 or (d == 27 and (w == Monday or w == Tuesday))) and m == December)
-            # Boxing Day (possibly moved to Monday and Tuesday)
-            or ((d == 26 or (d == 28 and (w == Monday or w == Tuesday))) and m == December)
-            # June 3rd, 2002 only (Golden Jubilee Bank Holiday)
-            # June 4rd, 2002 only (special Spring Bank Holiday)
-            or ((d == 3 or d == 4) and m == June and y == 2002)
-            #June 5th, 2012 only (Diamond Jubilee Bank Holiday)
-            or (d == 5 and m == June and y == 2012)
-            # December 31st, 1999 only
-            or (d == 31 and m == December and y == 1999))
-
-        return holiday
+    #the London Metal Exchange closes on the same days as the London Stock Exchange
+    rules = LSE.rules
 
 
 class BOVESPA(HolidayProfile):
-    """ Holiday Profile fand the Sao Paolo Stock Exchange (Bovespa) and the Brazilian Mercantile and Futures Exchange (BM&F).
-        >>> h = LME()
-        >>> HolyNight_Tuesday = datetime(2008, 12, 24)
-        >>> h.isWeekend(HolyNight_Tuesday)
+    """ Holiday Profile for the Sao Paulo Stock Exchange (Bovespa) and the Brazilian Mercantile and Futures Exchange (BM&F).
+        >>> h = BOVESPA()
+        >>> CarnivalMonday = datetime(2012, 2, 20)
+        >>> h.isWeekend(CarnivalMonday)
         False
-        >>> h.isHoliday(HolyNight_Tuesday)
+        >>> h.isHoliday(CarnivalMonday)
+        True
+        >>> h.isBusinessDay(CarnivalMonday)
         False
-        >>> h.isBusinessDay(HolyNight_Tuesday)
+        >>> CarnivalTuesday = datetime(2012, 2, 21)
+        >>> h.isHoliday(CarnivalTuesday)
+        True
+        >>> AshWednesday = datetime(2012, 2, 22)
+        >>> h.isBusinessDay(AshWednesday)
+        True
+        >>> CorpusChristi_Thursday = datetime(2012, 6, 7)
+        >>> h.isHoliday(CorpusChristi_Thursday)
         True
         >>> NewYear_Sunday = datetime(2012, 1, 1)
         >>> h.isWeekend(NewYear_Sunday)
@@ -364,72 +585,57 @@ class BOVESPA(HolidayProfile):
         True
         >>> h.isBusinessDay(NewYear_Sunday)
         False
-        >>> DiamondJubilee_Tuesday = datetime(2012, 6, 5)
-        >>> h.isWeekend(DiamondJubilee_Tuesday)
-        False
-        >>> h.isHoliday(DiamondJubilee_Tuesday)
-        True
-        >>> h.isBusinessDay(DiamondJubilee_Tuesday)
-        False
     """
 
-    def isHoliday(self, date):
-        
-        #split date into components fand easy readability in holiday rules below
-        w = date.isoweekday() #where Monday is 1 and Sunday is 7
-        m = date.month          #Between 1 and 12 inclusive.
-        d = date.day    #Between 1 and the number of days in the given month of the given year.
-        y = date.year            #Between MINYEAR and MAXYEAR inclusive.
-        es = self.EasterSunday(y)
-        dayoffset = pd.offsets.Day(1)
-
-        holiday =   (
-    
-            # New Year's Day
-            (d == 1 and m == January)
-            # Sao Paulo City Day
-            or (d == 25 and m == January)
-            # Tiradentes Day
-            or (d == 21 and m == April)
-            # Labor Day
-            or (d == 1 and m == May)
-            # Revolution Day
-            or (d == 9 and m == July)
-            # Independence Day
-            or (d == 7 and m == September)
-            # Nossa Sra. Aparecida Day
-            or (d == 12 and m == October)
-            # All Souls Day
-            or (d == 2 and m == November)
-            # Republic Day
-            or (d == 15 and m == November)
-            # Black Consciousness Day
-            or (d == 20 and m == November and y >= 2007)
-            # Christmas
-            or (d == 25 and m == December)
-            # Passion of Christ
-            #TODO: change this
-            or (date == es-2 * dayoffset )
-            # Carnival
-            or (date == es-49 * dayoffset or date == es-48 * dayoffset)
-            # Corpus Christi
-            or (date== es + 59 * dayoffset)
-            # last business day of the year
-            or (m == December and (d == 31 or (d >= 29 and w == Friday)))
-            )
-
-        return holiday
+    rules = (
+        # New Year's Day
+        FixedDate(January, 1),
+        # Sao Paulo City Day
+        FixedDate(January, 25),
+        # Tiradentes Day
+        FixedDate(April, 21),
+        # Labor Day
+        FixedDate(May, 1),
+        # Revolution Day
+        FixedDate(July, 9),
+        # Independence Day
+        FixedDate(September, 7),
+        # Nossa Sra. Aparecida Day
+        FixedDate(October, 12),
+        # All Souls Day
+        FixedDate(November, 2),
+        # Republic Day
+        FixedDate(November, 15),
+        # Black Consciousness Day
+        FixedDate(November, 20, first_year=2007),
+        # Christmas
+        FixedDate(December, 25),
+        # Passion of Christ (Good Friday)
+        EasterOffset(-2),
+        # Carnival Monday and Tuesday
+        EasterOffset(-48),
+        EasterOffset(-47),
+        # Corpus Christi
+        EasterOffset(60),
+        # last business day of the year
+        FixedDate(December, 31, observed=((-1, (Friday,)), (-2, (Friday,)))),
+        )
     
 class ASX(HolidayProfile):
     
     """ Holiday Profile for the Australian Stock Exchange (ASX).
-        >>> h = LME()
-        >>> HolyNight_Tuesday = datetime(2008, 12, 24)
-        >>> h.isWeekend(HolyNight_Tuesday)
+        >>> h = ASX()
+        >>> AustraliaDay_Thursday = datetime(2012, 1, 26)
+        >>> h.isWeekend(AustraliaDay_Thursday)
         False
-        >>> h.isHoliday(HolyNight_Tuesday)
+        >>> h.isHoliday(AustraliaDay_Thursday)
+        True
+        >>> h.isBusinessDay(AustraliaDay_Thursday)
         False
-        >>> h.isBusinessDay(HolyNight_Tuesday)
+        >>> AustraliaDay_Saturday = datetime(2013, 1, 26)
+        >>> h.isWeekend(AustraliaDay_Saturday)
+        True
+        >>> h.isHoliday(datetime(2013, 1, 28))
         True
         >>> NewYear_Sunday = datetime(2012, 1, 1)
         >>> h.isWeekend(NewYear_Sunday)
@@ -438,61 +644,46 @@ class ASX(HolidayProfile):
         True
         >>> h.isBusinessDay(NewYear_Sunday)
         False
-        >>> DiamondJubilee_Tuesday = datetime(2012, 6, 5)
-        >>> h.isWeekend(DiamondJubilee_Tuesday)
-        False
-        >>> h.isHoliday(DiamondJubilee_Tuesday)
-        True
-        >>> h.isBusinessDay(DiamondJubilee_Tuesday)
-        False
     """
 
-    def isHoliday(self, date):
-        
-        #split date into components fand easy readability in holiday rules below
-        w = date.isoweekday() #where Monday is 1 and Sunday is 7
-        m = date.month          #Between 1 and 12 inclusive.
-        d = date.day    #Between 1 and the number of days in the given month of the given year.
-        y = date.year            #Between MINYEAR and MAXYEAR inclusive.
-        es = self.EasterSunday(y)
-        dayoffset = pd.offsets.Day(1)
-
-        holiday =   (
-    
-            # New Year's Day (possibly moved to Monday)
-            (d == 1  and m == January)
-            # Australia Day, January 26th (possibly moved to Monday)
-            or ((d == 26 or ((d == 27 or d == 28) and w == Monday)) and m == January)
-            #Good Friday
-            or (date == es - 2*dayoffset)
-            #Easter Monday
-            or (date == es + dayoffset)
-            # ANZAC Day, April 25th (possibly moved to Monday)
-            or ((d == 25 or (d == 26 and w == Monday)) and m == April)
-            # Queen's Birthday, second Monday in June
-            or ((d > 7 and d <= 14) and w == Monday and m == June)
-            # Bank Holiday, first Monday in August
-            or (d <= 7 and w == Monday and m == August)
-            # Labour Day, first Monday in October
-            or (d <= 7 and w == Monday and m == October)
-            # Christmas, December 25th (possibly Monday or Tuesday)
-            or ((d == 25 or (d == 27 and (w == Monday or w == Tuesday))) and m == December)
-            # Boxing Day, December 26th (possibly Monday or Tuesday)
-            or ((d == 26 or (d == 28 and (w == Monday or w == Tuesday))) and m == December)
-            )
-
-        return holiday
+    rules = (
+        # New Year's Day (possibly moved to Monday)
+        FixedDate(January, 1),
+        # Australia Day, January 26th (possibly moved to Monday)
+        FixedDate(January, 26, observed=MONDAY_IF_WEEKEND),
+        #Good Friday
+        EasterOffset(-2),
+        #Easter Monday
+        EasterOffset(1),
+        # ANZAC Day, April 25th (possibly moved to Monday)
+        FixedDate(April, 25, observed=MONDAY_IF_SUNDAY),
+        # Queen's Birthday, second Monday in June
+        NthWeekday(June, Monday, 2),
+        # Bank Holiday, first Monday in August
+        NthWeekday(August, Monday, 1),
+        # Labour Day, first Monday in October
+        NthWeekday(October, Monday, 1),
+        # Christmas, December 25th (possibly Monday or Tuesday)
+        FixedDate(December, 25, observed=CHRISTMAS_BOXING_DAY),
+        # Boxing Day, December 26th (possibly Monday or Tuesday)
+        FixedDate(December, 26, observed=CHRISTMAS_BOXING_DAY),
+        )
 
 class TSX(HolidayProfile):
     
     """ Holiday Profile for the Toronto Stock Exchange (TSX).
-        >>> h = LME()
-        >>> HolyNight_Tuesday = datetime(2008, 12, 24)
-        >>> h.isWeekend(HolyNight_Tuesday)
+        >>> h = TSX()
+        >>> CanadaDay_Monday = datetime(2013, 7, 1)
+        >>> h.isWeekend(CanadaDay_Monday)
         False
-        >>> h.isHoliday(HolyNight_Tuesday)
+        >>> h.isHoliday(CanadaDay_Monday)
+        True
+        >>> h.isBusinessDay(CanadaDay_Monday)
         False
-        >>> h.isBusinessDay(HolyNight_Tuesday)
+        >>> CanadaDay_Sunday = datetime(2012, 7, 1)
+        >>> h.isWeekend(CanadaDay_Sunday)
+        True
+        >>> h.isHoliday(datetime(2012, 7, 2))
         True
         >>> NewYear_Sunday = datetime(2012, 1, 1)
         >>> h.isWeekend(NewYear_Sunday)
@@ -501,49 +692,30 @@ class TSX(HolidayProfile):
         True
         >>> h.isBusinessDay(NewYear_Sunday)
         False
-        >>> DiamondJubilee_Tuesday = datetime(2012, 6, 5)
-        >>> h.isWeekend(DiamondJubilee_Tuesday)
-        False
-        >>> h.isHoliday(DiamondJubilee_Tuesday)
-        True
-        >>> h.isBusinessDay(DiamondJubilee_Tuesday)
-        False
     """
 
-    def isHoliday(self, date):
-        
-        #split date into components fand easy readability in holiday rules below
-        w = date.isoweekday() #where Monday is 1 and Sunday is 7
-        m = date.month          #Between 1 and 12 inclusive.
-        d = date.day    #Between 1 and the number of days in the given month of the given year.
-        y = date.year            #Between MINYEAR and MAXYEAR inclusive.
-        es = self.EasterSunday(y)
-        dayoffset = pd.offsets.Day(1)
-
-        holiday =   (
-            # New Year's Day (possibly moved to Monday)
-            ((d == 1 or (d == 2 and w == Monday)) and m == January)
-            # Family Day (third Monday in February, since 2008)
-            or ((d >= 15 and d <= 21) and w == Monday and m == February and y >= 2008)
-            # Good Friday
-            or (date == es-2 * dayoffset)
-            # The Monday on or preceding 24 May (Victoria Day)
-            or (d > 17 and d <= 24 and w == Monday and m == May)
-            # July 1st, possibly moved to Monday (Canada Day)
-            or ((d == 1 or ((d == 2 or d == 3) and w == Monday)) and m==July)
-            # first Monday of August (Provincial Holiday)
-            or (d <= 7 and w == Monday and m == August)
-            # first Monday of September (Labor Day)
-            or (d <= 7 and w == Monday and m == September)
-            # second Monday of October (Thanksgiving Day)
-            or (d > 7 and d <= 14 and w == Monday and m == October)
-            # Christmas (possibly moved to Monday or Tuesday)
-            or ((d == 25 or (d == 27 and (w == Monday or w == Tuesday))) and m == December)
-            # Boxing Day (possibly moved to Monday or Tuesday)
-            or ((d == 26 or (d == 28 and (w == Monday or w == Tuesday))) and m == December)
-            )
-
-        return holiday
+    rules = (
+        # New Year's Day (possibly moved to Monday)
+        FixedDate(January, 1, observed=MONDAY_IF_SUNDAY),
+        # Family Day (third Monday in February, since 2008)
+        NthWeekday(February, Monday, 3, first_year=2008),
+        # Good Friday
+        EasterOffset(-2),
+        # The Monday on or preceding 24 May (Victoria Day)
+        WeekdayInRange(May, Monday, 18, 24),
+        # July 1st, possibly moved to Monday (Canada Day)
+        FixedDate(July, 1, observed=MONDAY_IF_WEEKEND),
+        # first Monday of August (Provincial Holiday)
+        NthWeekday(August, Monday, 1),
+        # first Monday of September (Labor Day)
+        NthWeekday(September, Monday, 1),
+        # second Monday of October (Thanksgiving Day)
+        NthWeekday(October, Monday, 2),
+        # Christmas (possibly moved to Monday or Tuesday)
+        FixedDate(December, 25, observed=CHRISTMAS_BOXING_DAY),
+        # Boxing Day (possibly moved to Monday or Tuesday)
+        FixedDate(December, 26, observed=CHRISTMAS_BOXING_DAY),
+        )
         
 class FSE(HolidayProfile):
 
@@ -553,9 +725,9 @@ class FSE(HolidayProfile):
         >>> h.isWeekend(HolyNight_Tuesday)
         False
         >>> h.isHoliday(HolyNight_Tuesday)
-        False
-        >>> h.isBusinessDay(HolyNight_Tuesday)
         True
+        >>> h.isBusinessDay(HolyNight_Tuesday)
+        False
         >>> NewYear_Sunday = datetime(2012, 1, 1)
         >>> h.isWeekend(NewYear_Sunday)
         True
@@ -563,44 +735,33 @@ class FSE(HolidayProfile):
         True
         >>> h.isBusinessDay(NewYear_Sunday)
         False
-        >>> DiamondJubilee_Tuesday = datetime(2012, 6, 5)
-        >>> h.isWeekend(DiamondJubilee_Tuesday)
+        >>> LabourDay_Tuesday = datetime(2012, 5, 1)
+        >>> h.isWeekend(LabourDay_Tuesday)
         False
-        >>> h.isHoliday(DiamondJubilee_Tuesday)
+        >>> h.isHoliday(LabourDay_Tuesday)
         True
-        >>> h.isBusinessDay(DiamondJubilee_Tuesday)
+        >>> h.isBusinessDay(LabourDay_Tuesday)
         False
     """
 
-    def isHoliday(self, date):
-        
-        #split date into components fand easy readability in holiday rules below
-        w = date.isoweekday() #where Monday is 1 and Sunday is 7
-        m = date.month          #Between 1 and 12 inclusive.
-        d = date.day    #Between 1 and the number of days in the given month of the given year.
-        y = date.year            #Between MINYEAR and MAXYEAR inclusive.
-        es = self.EasterSunday(y)
-        dayoffset = pd.offsets.Day(1)
-
-        holiday =   (
-            # New Year's Day
-            (d == 1 and m == January)
-            # Good Friday
-            or (date== es-2*dayoffset)
-            # Easter Monday
-            or (date == es + dayoffset)
-            # Labour Day
-            or (d == 1 and m == May)
-            # Christmas' Eve
-            or (d == 24 and m == December)
-            # Christmas
-            or (d == 25 and m == December)
-            # Christmas Day
-            or (d == 26 and m == December)
-            # New Year's Eve
-            or (d == 31 and m == December))
-
-        return holiday
+    rules = (
+        # New Year's Day
+        FixedDate(January, 1),
+        # Good Friday
+        EasterOffset(-2),
+        # Easter Monday
+        EasterOffset(1),
+        # Labour Day
+        FixedDate(May, 1),
+        # Christmas' Eve
+        FixedDate(December, 24),
+        # Christmas
+        FixedDate(December, 25),
+        # Christmas Day
+        FixedDate(December, 26),
+        # New Year's Eve
+        FixedDate(December, 31),
+        )
         
 class MIL(HolidayProfile):
 
@@ -610,9 +771,9 @@ class MIL(HolidayProfile):
         >>> h.isWeekend(HolyNight_Tuesday)
         False
         >>> h.isHoliday(HolyNight_Tuesday)
-        False
-        >>> h.isBusinessDay(HolyNight_Tuesday)
         True
+        >>> h.isBusinessDay(HolyNight_Tuesday)
+        False
         >>> NewYear_Sunday = datetime(2012, 1, 1)
         >>> h.isWeekend(NewYear_Sunday)
         True
@@ -620,46 +781,35 @@ class MIL(HolidayProfile):
         True
         >>> h.isBusinessDay(NewYear_Sunday)
         False
-        >>> DiamondJubilee_Tuesday = datetime(2012, 6, 5)
-        >>> h.isWeekend(DiamondJubilee_Tuesday)
+        >>> Assumption_Wednesday = datetime(2012, 8, 15)
+        >>> h.isWeekend(Assumption_Wednesday)
         False
-        >>> h.isHoliday(DiamondJubilee_Tuesday)
+        >>> h.isHoliday(Assumption_Wednesday)
         True
-        >>> h.isBusinessDay(DiamondJubilee_Tuesday)
+        >>> h.isBusinessDay(Assumption_Wednesday)
         False
     """
 
-    def isHoliday(self, date):
-        
-        #split date into components fand easy readability in holiday rules below
-        w = date.isoweekday() #where Monday is 1 and Sunday is 7
-        m = date.month          #Between 1 and 12 inclusive.
-        d = date.day    #Between 1 and the number of days in the given month of the given year.
-        y = date.year            #Between MINYEAR and MAXYEAR inclusive.
-        es = self.EasterSunday(y)
-        dayoffset = pd.offsets.Day(1)
-
-        holiday =   (
-            # New Year's Day
-            (d == 1 and m == January)
-            # Good Friday
-            or (date== es-2*dayoffset)
-            # Easter Monday
-            or (date == es + dayoffset)
-            # Labour Day
-            or (d == 1 and m == May)
-            # Assumption
-            or (d == 15 and m == August)
-            # Christmas' Eve
-            or (d == 24 and m == December)
-            # Christmas
-            or (d == 25 and m == December)
-            # St. Stephen
-            or (d == 26 and m == December)
-            # New Year's Eve
-            or (d == 31 and m == December))
-
-        return holiday
+    rules = (
+        # New Year's Day
+        FixedDate(January, 1),
+        # Good Friday
+        EasterOffset(-2),
+        # Easter Monday
+        EasterOffset(1),
+        # Labour Day
+        FixedDate(May, 1),
+        # Assumption
+        FixedDate(August, 15),
+        # Christmas' Eve
+        FixedDate(December, 24),
+        # Christmas
+        FixedDate(December, 25),
+        # St. Stephen
+        FixedDate(December, 26),
+        # New Year's Eve
+        FixedDate(December, 31),
+        )
 
 class TSE(HolidayProfile):
 
@@ -688,80 +838,135 @@ class TSE(HolidayProfile):
         False
     """
 
-    def isHoliday(self, date):
-        
-        #split date into components fand easy readability in holiday rules below
-        w = date.isoweekday()   #where Monday is 1 and Sunday is 7
-        m = date.month          #Between 1 and 12 inclusive.
-        d = date.day            #Between 1 and the number of days in the given month of the given year.
-        y = date.year            #Between MINYEAR and MAXYEAR inclusive.
-        es = self.EasterSunday(y)
-        ve = self.VernalEquinox(y)
-        ae = self.AutumnalEquinox(y)
-        dayoffset = pd.offsets.Day(1)
-        
-        holiday =   (
-            # New Year's Day
-            (d == 1  and m == January)
-            # Bank Holiday
-            or (d == 2  and m == January)
-            # Bank Holiday
-            or (d == 3  and m == January)
-            # Coming of Age Day (2nd Monday in January),
-            # was January 15th until 2000
-            or (w == Monday and (d >= 8 and d <= 14) and m == January and y >= 2000)
-            or ((d == 15 or (d == 16 and w == Monday)) and m == January and y < 2000)
-            # National Foundation Day
-            or ((d == 11 or (d == 12 and w == Monday)) and m == February)
-            # Vernal Equinox
-            or ((d == ve or (d == ve+1 and w == Monday)) and m == March)
-            # Greenery Day
-            or ((d == 29 or (d == 30 and w == Monday)) and m == April)
-            # Constitution Memandial Day
-            or (d == 3  and m == May)
-            # Holiday fand a Nation
-            or (d == 4  and m == May)
-            # Children's Day
-            or (d == 5  and m == May)
-            # any of the three above observed later if on Saturday and Sunday
-            or (d == 6 and m == May and (w == Monday or w == Tuesday or w == Wednesday))
-            # Marine Day (3rd Monday in July),
-            # was July 20th until 2003, not a holiday befande 1996
-            or (w == Monday and (d >= 15 and d <= 21) and m == July and y >= 2003)
-            or ((d == 20 or (d == 21 and w == Monday)) and m == July and y >= 1996 and y < 2003)
-            # Respect fand the Aged Day (3rd Monday in September),
-            # was September 15th until 2003
-            or (w == Monday and (d >= 15 and d <= 21) and m == September and y >= 2003)
-            or ((d == 15 or (d == 16 and w == Monday)) and m == September and y < 2003)
-            # If a single day falls between Respect fand the Aged Day
-            # and the Autumnal Equinox, it is holiday
-            or (w == Tuesday and d+1 == ae and d >= 16 and d <= 22 and m == September and y >= 2003)
-            # Autumnal Equinox
-            or ((d == ae or (d == ae+1 and w == Monday)) and m == September)
-            # Health and Spandts Day (2nd Monday in October),
-            # was October 10th until 2000
-            or (w == Monday and (d >= 8 and d <= 14) and m == October and y >= 2000)
-            or ((d == 10 or (d == 11 and w == Monday)) and m == October and y < 2000)
-            # National Culture Day
-            or ((d == 3  or (d == 4 and w == Monday)) and m == November)
-            # Laband Thanksgiving Day
-            or ((d == 23 or (d == 24 and w == Monday)) and m == November)
-            # Emperand's Birthday
-            or ((d == 23 or (d == 24 and w == Monday)) and m == December and y >= 1989)
-            # Bank Holiday
-            or (d == 31 and m == December)
-            # one-shot holidays
-            # Marriage of Prince Akihito
-            or (d == 10 and m == April and y == 1959)
-            # Rites of Imperial Funeral
-            or (d == 24 and m == February and y == 1989)
-            # Enthronement Ceremony
-            or (d == 12 and m == November and y == 1990)
-            # Marriage of Prince Naruhito
-            or (d == 9 and m == June and y == 1993)
-            )
-
-        return holiday
+    rules = (
+        # New Year's Day
+        FixedDate(January, 1),
+        # Bank Holiday
+        FixedDate(January, 2),
+        # Bank Holiday
+        FixedDate(January, 3),
+        # Coming of Age Day (2nd Monday in January),
+        # was January 15th until 2000
+        NthWeekday(January, Monday, 2, first_year=2000),
+        FixedDate(January, 15, observed=MONDAY_IF_SUNDAY, last_year=1999),
+        # National Foundation Day
+        FixedDate(February, 11, observed=MONDAY_IF_SUNDAY),
+        # Vernal Equinox
+        Equinox(March, VERNAL_EQUINOX, observed=MONDAY_IF_SUNDAY),
+        # Greenery Day
+        FixedDate(April, 29, observed=MONDAY_IF_SUNDAY),
+        # Constitution Memandial Day
+        FixedDate(May, 3),
+        # Holiday fand a Nation
+        FixedDate(May, 4),
+        # Children's Day
+        FixedDate(May, 5),
+        # any of the three above observed later if on Saturday and Sunday
+        FixedDate(May, 6, weekdays=(Monday, Tuesday, Wednesday)),
+        # Marine Day (3rd Monday in July),
+        # was July 20th until 2003, not a holiday befande 1996
+        NthWeekday(July, Monday, 3, first_year=2003),
+        FixedDate(July, 20, observed=MONDAY_IF_SUNDAY, first_year=1996, last_year=2002),
+        # Respect fand the Aged Day (3rd Monday in September),
+        # was September 15th until 2003
+        NthWeekday(September, Monday, 3, first_year=2003),
+        FixedDate(September, 15, observed=MONDAY_IF_SUNDAY, last_year=2002),
+        # If a single day falls between Respect fand the Aged Day
+        # and the Autumnal Equinox, it is holiday
+        Equinox(September, AUTUMNAL_EQUINOX, offset=-1, first_year=2003) & WeekdayInRange(September, Tuesday, 16, 22),
+        # Autumnal Equinox
+        Equinox(September, AUTUMNAL_EQUINOX, observed=MONDAY_IF_SUNDAY),
+        # Health and Spandts Day (2nd Monday in October),
+        # was October 10th until 2000
+        NthWeekday(October, Monday, 2, first_year=2000),
+        FixedDate(October, 10, observed=MONDAY_IF_SUNDAY, last_year=1999),
+        # National Culture Day
+        FixedDate(November, 3, observed=MONDAY_IF_SUNDAY),
+        # Laband Thanksgiving Day
+        FixedDate(November, 23, observed=MONDAY_IF_SUNDAY),
+        # Emperand's Birthday
+        FixedDate(December, 23, observed=MONDAY_IF_SUNDAY, first_year=1989),
+        # Bank Holiday
+        FixedDate(December, 31),
+        # one-shot holidays
+        # Marriage of Prince Akihito
+        OneOff(date(1959, 4, 10)),
+        # Rites of Imperial Funeral
+        OneOff(date(1989, 2, 24)),
+        # Enthronement Ceremony
+        OneOff(date(1990, 11, 12)),
+        # Marriage of Prince Naruhito
+        OneOff(date(1993, 6, 9)),
+        )
+
+#rules of a JointCalendar: business day in all calendars, or business day in any calendar
+JOIN_BUSINESS_DAYS = "and"
+JOIN_HOLIDAYS = "or"
+
+class JointCalendar(BusinessCalendar):
+    """Combines several calendars, e.g. holiday profiles of the exchanges of a cross-listed
+    instrument. With JOIN_BUSINESS_DAYS a day is a business day if it is one in all calendars
+    (NYSE() & LSE()), with JOIN_HOLIDAYS if it is one in any calendar (FSE() | MIL()).
+    The tables of each year are combined once with a bitwise and/or of the tables of the
+    calendars, so all queries run on the same index arithmetic as a single profile.
+    Use combine, & or | to share one joint calendar per combination.
+
+    >>> nyse_lse = NYSE() & LSE()
+    >>> nyse_lse.name, nyse_lse is (LSE() & NYSE())
+    ('LSE&NYSE', True)
+    >>> Christmas_Eve, Boxing_Day = datetime(2012, 12, 24), datetime(2012, 12, 26)
+    >>> nyse_lse.isBusinessDay(Boxing_Day), (NYSE() | LSE()).isBusinessDay(Boxing_Day)
+    (False, True)
+    >>> nyse_lse.addBusinessDays(Christmas_Eve, 1)
+    datetime.datetime(2012, 12, 27, 0, 0)
+    """
+
+    #joint calendars by combination key
+    _combinations = {}
+
+    def __init__(self, calendars, rule=JOIN_BUSINESS_DAYS):
+        super(JointCalendar, self).__init__()
+        if rule not in (JOIN_BUSINESS_DAYS, JOIN_HOLIDAYS):
+            raise ValueError("Unknown rule for joining calendars: {}".format(rule))
+        self.calendars = tuple(calendars)
+        self.rule = rule
+
+    @classmethod
+    def combine(cls, calendars, rule=JOIN_BUSINESS_DAYS):
+        """Returns the cached joint calendar of the calendars. Joint calendars with the same rule
+        are flattened, and the order of the calendars does not matter."""
+        flat = {}
+        for calendar in calendars:
+            parts = calendar.calendars if isinstance(calendar, JointCalendar) and calendar.rule == rule else (calendar,)
+            for part in parts:
+                flat[part.name] = part
+        key = (rule, tuple(sorted(flat)))
+        joint = cls._combinations.get(key)
+        if joint is None:
+            joint = cls._combinations[key] = cls([flat[name] for name in key[1]], rule)
+        return joint
+
+    @property
+    def name(self):
+        return ("&" if self.rule == JOIN_BUSINESS_DAYS else "|").join(calendar.name for calendar in self.calendars)
+
+    def _buildYears(self, firstyear, lastyear):
+        combine = np.logical_and if self.rule == JOIN_BUSINESS_DAYS else np.logical_or
+        years = range(firstyear, lastyear + 1)
+        for calendar in self.calendars:
+            calendar._ensureYears(firstyear, lastyear)
+        tables = {}
+        for year in years:
+            parts = [calendar._yearTables(year) for calendar in self.calendars]
+            businessdays = combine.reduce([part[0] for part in parts])
+            #a day is a holiday of the joint calendar if it is a holiday somewhere and not a business day
+            holidays = np.logical_or.reduce([part[1] for part in parts]) & ~businessdays
+            tables[year] = (businessdays, holidays)
+        return tables
+
+    def __repr__(self):
+        return "JointCalendar({})".format(self.name)
+
 
 class BusinessDayWithHolidays(BDay):
     """ Extends the pandas business day function with an holiday parameter
@@ -769,51 +974,56 @@ class BusinessDayWithHolidays(BDay):
     A holiday profile class for that holiday calendar with the same name needs to exist.
     
     Pass a string for a holiday profile to create one or pass a holiday profile object to the function.
-    
+    A JointCalendar of several profiles, e.g. NYSE() & LSE(), can be passed as well.
+    The profile is kept as profile, because pandas reserves the holidays attribute.
+    Adding the offset to a date or an array of dates is a lookup in the cumulative
+    business-day index of the profile, so the cost does not depend on n.
+
+    >>> datetime(2013, 1, 2) + BusinessDayWithHolidays(250, holidays=NYSE())
+    Timestamp('2013-12-30 00:00:00')
+    >>> datetime(2012, 12, 26) - BusinessDayWithHolidays(2, holidays="LSE")
+    Timestamp('2012-12-21 00:00:00')
+    >>> (pd.DatetimeIndex(["2012-07-03", "2012-07-04"]) + BusinessDayWithHolidays()).strftime("%Y-%m-%d").tolist()
+    ['2012-07-05', '2012-07-05']
+    >>> BusinessDayWithHolidays().count_between(datetime(2012, 7, 1), datetime(2012, 7, 8))
+    4
     """
 
-    def __init__(self, n=1, **kwds):
-        self.logger = myLogger.TLogger(__name__)
-        super(BusinessDayWithHolidays, self).__init__(n, **kwds)
-        self.holidays = kwds.get('holidays', "NYSE")
+    #pandas builds negated and multiplied offsets from the attributes, so the profile is one of them
+    _attributes = BDay._attributes + ("profile",)
+
+    def __init__(self, n=1, normalize=False, offset=timedelta(0), holidays="NYSE", profile=None):
+        self.logger = myLogger.getLogger(__name__)
+        super(BusinessDayWithHolidays, self).__init__(n, normalize=normalize, offset=offset)
+        self.profile = holidays if profile is None else profile
         
             #if string is passed instead of a HolidayProfile create the HolidayProfile from the string
-        if isinstance(self.holidays, str):
+        if isinstance(self.profile, str):
             try:
-                a = self.holidays
-                self.holidays =  eval(a)()  # create a holiday profile from string
-            except TypeError:
-                print "Could not create a Holiday Profil    e for" + self.holidays + ". Does it exist?" 
+                self.profile = globals()[self.profile]()  # create a holiday profile from string
+            except (KeyError, TypeError):
+                raise ValueError("Could not create a Holiday Profile for " + self.profile + ". Does it exist?")
         
         #this could be used to check if the object passed was a Holiday Profile, but that's non pythonic
-        #if not isinstance(self.holidays, HolidayProfile):
-        #    raise Exception (str(self.holidays) + " is not a Holiday Profile object.") 
+        #if not isinstance(self.profile, HolidayProfile):
+        #    raise Exception (str(self.profile) + " is not a Holiday Profile object.") 
         
     @property
     def rule_code(self):
         return 'BH'
 
-    def apply(self, other):
-            self.logger.debug("Apply was called with {}".format(other))
+    def _apply(self, other):
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Apply was called with %s", other)
             if isinstance(other, datetime):
                 n = self.n
 
-                if n == 0 and not self.holidays.isBusinessDay(other):
+                if n == 0 and not self.profile.isBusinessDay(other):
                     n = 1
 
-                result = other
-
-                # avoid slowness below
-                #if abs(n) > 5:
-                #    k = n // 5
-                #    result = result + timedelta(7 * k)
-                #    n -= 5 * k
-
-                while n != 0:
-                    k = n // abs(n)
-                    result = result + timedelta(k)
-                    if self.holidays.isBusinessDay(result):
-                        n -= k
+                # a lookup in the cumulative business-day index of the holiday profile,
+                # the cost does not depend on n or on the number of holidays
+                result = self.profile.addBusinessDays(other, n)
 
                 if self.normalize:
                     result = datetime(result.year, result.month, result.day)
@@ -821,17 +1031,55 @@ class BusinessDayWithHolidays(BDay):
                 if self.offset:
                     result = result + self.offset
 
-                return result
+                return pd.Timestamp(result)
+
+            elif is_date_array(other):
+                return self.apply_index(other)
 
-            elif isinstance(other, (timedelta, Tick)):
+            elif isinstance(other, timedelta):
                 return BDay(self.n, offset=self.offset + other,
                             normalize=self.normalize)
             else:
                 raise Exception('Only know how to combine business day with '
                                 'datetime or timedelta!')
 
-    def onOffset(self, date):
-        return self.holidays.isBusinessDay(date)
+    #name of _apply in older pandas versions
+    apply = _apply
+
+    def _apply_array(self, dates):
+        """Called by pandas for a DatetimeIndex or Series; dates is a datetime64 array."""
+        return self.apply_index(dates)
+
+    def apply_index(self, dates):
+        """Vectorized apply for a DatetimeIndex, a Series or a datetime64 array of dates.
+        The shift is a lookup in the business-day index for all dates at once."""
+        if self.n == 0:
+            result = self.profile.rollForward(dates)
+        else:
+            result = self.profile.addBusinessDays(dates, self.n)
+        if self.normalize:
+            result = like_dates(dates, as_datetime64(result).astype("datetime64[D]").astype(as_datetime64(dates).dtype))
+        if self.offset:
+            result = result + np.timedelta64(self.offset)
+        return result
+
+    def rollforward(self, date):
+        """Returns date if it is a business day, otherwise the next business day."""
+        return self.profile.rollForward(date)
+
+    def rollback(self, date):
+        """Returns date if it is a business day, otherwise the previous business day."""
+        return self.profile.rollBackward(date)
+
+    def count_between(self, start, end):
+        """Returns the number of business days from start (inclusive) to end (exclusive)."""
+        return self.profile.businessDaysBetween(start, end)
+
+    def is_on_offset(self, date):
+        """True if date is a business day; takes an array of dates as well."""
+        return self.profile.isBusinessDay(date)
+
+    onOffset = is_on_offset
 
 if __name__ == "__main__" :
     module_logger.info('Running EnhancedBDay main')
@@ -839,5 +1087,5 @@ if __name__ == "__main__" :
     #doctest.testmod(verbose=True)
     day1 = datetime(2008, 12, 30)
     day2 = datetime(2008, 12, 24)
-    print day1 - 2 * BDay()
-    print day1 - 2 * BusinessDayWithHolidays()
+    print(day1 - 2 * BDay())
+    print(day1 - 2 * BusinessDayWithHolidays())
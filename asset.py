@@ -5,7 +5,7 @@ from globals import *
 import myLogger
 
 # create logger
-module_logger = myLogger.TLogger(__name__)
+module_logger = myLogger.getLogger(__name__)
 
 class Asset(object):
     """ The asset class is  the superclass from which any financial asset is derived
@@ -19,13 +19,32 @@ class Asset(object):
         >>> ast.description   
         'No description given'
         """
+
+    __slots__ = ("pv", "price", "_description", "_id")
+
+    #one logger for all assets instead of one reference per object
+    logger = myLogger.getLogger(__name__)
         
     def __init__(self, pv = None, description="No description given", price= None):
-        self.logger = myLogger.TLogger(__name__)
         self.pv = pv
         self.price = price
-        self.description = description
-        self.id = uuid.uuid1()
+        self._description = description
+        self._id = None
+
+    @property
+    def description(self):
+        return self._description
+
+    @description.setter
+    def description(self, description):
+        self._description = description
+
+    @property
+    def id(self):
+        """Unique identifier of the asset, created on first use."""
+        if self._id is None:
+            self._id = uuid.uuid1()
+        return self._id
 
 
 if __name__ == "__main__":
@@ -1,20 +1,25 @@
 # -*- coding: utf-8 -*-
 import datetime as dt
+import numpy as np
 import pandas as pd
 from asset import Asset
-import pandas.core.datetools as pdt
 from cashflow import Cashflow
+from businessdayconvention import getConvention
 import myLogger
 
 
 # create logger
-module_logger = myLogger.TLogger(__name__)
+module_logger = myLogger.getLogger(__name__)
 
 class Bond(Asset):
     """
     This class generates a bond from some basic economic information
     and generates the corresponding cashflow.
     If no price is given the bond is assumed to be 100.
+    Bonds are kept small (__slots__): the cashflow, the id and the description are
+    only created when first used.
+    If a businessdayconvention (e.g. "ModifiedFollowing") and a calendar (e.g. NYSE())
+    are given, the coupon dates are adjusted to business days.
     Offset and coupon dates are a bit rudimentary and need to be improved.
     e.g. Daycount conventions, rolling, etc.
        
@@ -22,7 +27,7 @@ class Bond(Asset):
     
     >>> startdate = dt.datetime(2012, 1, 1)
     >>> maturitydate = dt.datetime(2015, 1, 1)
-    >>> bd = Bond(startdate = startdate, maturitydate = maturitydate, couponrate = 0.05, frequency_per_anno  = 2, businessdayconvention, calendar)
+    >>> bd = Bond(startdate = startdate, maturitydate = maturitydate, couponrate = 0.05, frequency_per_anno  = 2)
     >>> bd.price
     100.0
     >>> bd.couponrate
@@ -30,35 +35,94 @@ class Bond(Asset):
     >>> bd.frequency
     2
     >>> bd.startdate
-    datetime.datetime(2012, 1, 2, 0, 0)
+    datetime.datetime(2012, 1, 1, 0, 0)
     >>> bd.maturitydate
-    datetime.datetime(2015, 1, 2, 0, 0)
-    >>> bd
+    datetime.datetime(2015, 1, 1, 0, 0)
+    >>> len(bd.cf.cf)
+    7
+    >>> print("{0:.5f} {1:.5f}".format(bd.getPV(0.05), bd.getPV(0.04)))
+    0.16953 2.91363
+    >>> from discountcurve import DiscountCurve
+    >>> print("{0:.5f}".format(bd.getPV(DiscountCurve.fromZeroRates([365], [0.05]))))
+    0.16953
+    >>> bd.getPV(0.05) is bd.getPV(0.05), bd.cacheInfo().hits
+    (True, 2)
     """
     
-    def __init__ (self, maturitydate, couponrate, frequency_per_anno, price = 100.0, startdate=dt.datetime.utcnow(), businessdayconvention, calendar, daycounter):
-        self.logger = myLogger.TLogger(__name__)
-        super(Bond, self).__init__()
-        self.description = str(maturitydate.strftime("%d/%m/%y")) + "_" + str(couponrate)
-        self.logger.info("Generating bond {}".format(self.description))
+    __slots__ = ("_price", "startdate", "maturitydate", "couponrate", "frequency",
+                 "businessdayconvention", "calendar", "daycounter", "cache_size", "_cf")
+
+    #one logger for all bonds instead of one reference per bond
+    logger = myLogger.getLogger(__name__)
+
+    def __init__ (self, maturitydate, couponrate, frequency_per_anno, price = 100.0, startdate=dt.datetime.utcnow(), businessdayconvention = None, calendar = None, daycounter = None, cache_size = 32):
+        self._cf = None
+        super(Bond, self).__init__(description=None)
         self.price = price        
         self.startdate = startdate
         self.maturitydate = maturitydate
         self.couponrate = couponrate
         self.frequency = frequency_per_anno
-        self.cf = self._generateCashflow()
         self.businessdayconvention = businessdayconvention
         self.calendar = calendar
         self.daycounter = daycounter
+        self.cache_size = cache_size
+
+    @property
+    def description(self):
+        """Maturity and coupon of the bond unless a description was set."""
+        if self._description is None:
+            return str(self.maturitydate.strftime("%d/%m/%y")) + "_" + str(self.couponrate)
+        return self._description
+
+    @description.setter
+    def description(self, description):
+        self._description = description
+
+    @property
+    def cf(self):
+        """The cashflow of the bond. The schedule is only generated on first use and then kept."""
+        if self._cf is None:
+            self.logger.debug("Generating cashflow of bond %s", self.description)
+            self._cf = self._generateCashflow()
+        return self._cf
+
+    @property
+    def price(self):
+        return self._price
+
+    @price.setter
+    def price(self, price):
+        """The price is the first (negative) cashflow, so changing it updates a generated cashflow and invalidates its cache."""
+        self._price = price
+        if self._cf is not None:
+            amounts = self._cf.cf.values.copy()
+            amounts[0] = -price
+            self._cf.cf_amounts = amounts
         
     def _generateCashflow(self):
-        monthly_offset = 12 /  self.frequency       
+        monthly_offset = 12 //  self.frequency       
         #offset = int(365.2425/self.frequency)
-        dr = pd.DateRange(self.startdate, self.maturitydate, offset = pdt.DateOffset(months=monthly_offset))#bday *   offset)      
-        cf = Cashflow(cf_times=dr, cf_amounts=self.couponrate * 100/self.frequency )
-        cf.cf[0] = -self.price
-        cf.cf[cf.cf.count()-1] +=  100.0   
-        return cf
+        dr = pd.date_range(self.startdate, self.maturitydate, freq = pd.DateOffset(months=monthly_offset))#bday *   offset)      
+        if self.businessdayconvention is not None and self.calendar is not None:
+            #all coupon dates are adjusted at once against the business-day index of the calendar
+            dr = getConvention(self.businessdayconvention).adjust(dr, self.calendar)
+        amounts = np.repeat(self.couponrate * 100.0/self.frequency, len(dr))
+        amounts[0] = -self.price
+        amounts[-1] +=  100.0   
+        return Cashflow(cf_times=dr, cf_amounts=amounts, time_type="Dates", cache_size=self.cache_size)
+
+    def getPV(self, r):
+        """Returns the present value of the bond cashflow given an interest rate (r) or a DiscountCurve. Results are cached per rate."""
+        return self.cf.getPV(r)
+
+    def getDiscountFactors(self, r):
+        """Returns the discount factors of the bond cashflow given an interest rate (r) or a DiscountCurve. Results are cached per rate."""
+        return self.cf.getDiscountFactors(r)
+
+    def cacheInfo(self):
+        """Returns hits, misses, size and maximum size of the per-rate cache of the bond cashflow."""
+        return self.cf.cacheInfo()
         
     def __repr__(self):
         return "Bond(startdate= {}, maturitydate= {}, couponrate= {}, frequency_per_anno  = {}, price = {} ".format(self.startdate, self.maturitydate, self.couponrate,       self.frequency, self.price) 
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import myLogger
+from globalsconstants import *
+from pyquantdateutils import as_datetime64, datetime64_as_days
+from businessdayconvention import getConvention
+from cashflowportfolio import CashflowPortfolio
+from bond import Bond
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+
+def _monthStarts(months):
+    """Returns the day numbers of the first days of months counted from January of year 0."""
+    return (months - 1970 * 12).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+def coupon_schedules(startdates, maturitydates, months):
+    """Generates the coupon dates of many bonds at once, the same way as Bond: from the
+       startdate every months[i] months up to the maturitydate, where a day of month that a
+       month does not have is moved to its last day for this and all later dates.
+       Returns the offsets and the flat datetime64[D] array of the dates (CSR layout).
+
+       >>> offsets, dates = coupon_schedules(np.array(['2012-03-31', '2012-01-01'], dtype='datetime64[D]'),
+       ...                                   np.array(['2013-03-31', '2013-01-01'], dtype='datetime64[D]'), [3, 6])
+       >>> offsets.tolist()
+       [0, 5, 8]
+       >>> [str(d) for d in dates[:4]]
+       ['2012-03-31', '2012-06-30', '2012-09-30', '2012-12-30']
+    """
+    starts = datetime64_as_days(as_datetime64(startdates))
+    maturities = datetime64_as_days(as_datetime64(maturitydates))
+    months = np.broadcast_to(np.asarray(months, dtype=np.int64), starts.shape)
+    if np.any(starts > maturities):
+        raise ValueError("Startdates must not be after the maturitydates")
+    firstmonths = starts.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) + 1970 * 12
+    lastmonths = maturities.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) + 1970 * 12
+    startday = starts - _monthStarts(firstmonths) + 1
+    #enough candidate dates per bond, the ones after the maturity are dropped below
+    counts = (lastmonths - firstmonths) // months + 1
+    rows = np.repeat(np.arange(len(starts)), counts)
+    k = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    couponmonths = firstmonths[rows] + k * months[rows]
+    monthstarts = _monthStarts(couponmonths)
+    monthdays = _monthStarts(couponmonths + 1) - monthstarts
+    #the day of month is the running minimum of the start day and the month lengths so far;
+    #shifting every bond by 64 makes one running minimum restart at each bond
+    days = np.where(k == 0, startday[rows], monthdays) - 64 * rows
+    days = np.minimum.accumulate(days) + 64 * rows
+    dates = monthstarts + days - 1
+    keep = dates <= maturities[rows]
+    counts = np.bincount(rows[keep], minlength=len(starts))
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    return offsets, dates[keep].astype("datetime64[D]")
+
+
+class BondTable(object):
+    """Holds many fixed coupon bonds as columns of NumPy arrays instead of Bond objects.
+       The coupon schedules of all bonds are generated together on first use as flat arrays
+       with per-bond offsets (the layout of CashflowPortfolio), adjusted to business days in
+       one call if a businessdayconvention and a calendar are given, and kept.
+       Cashflows follow Bond: the first payment is -price on the startdate, coupons are
+       couponrate * 100 / frequency and the last date also pays back 100.
+       table[i] returns the i-th bond as a Bond.
+
+       >>> table = BondTable(startdates=['2012-01-01', '2012-01-01'], maturitydates=['2015-01-01', '2013-01-01'],
+       ...                   couponrates=[0.05, 0.04], frequencies=[2, 1])
+       >>> len(table), table.offsets.tolist()
+       (2, [0, 7, 9])
+       >>> pf = table.toPortfolio()
+       >>> np.round(pf.getIRR().irr, 4).tolist()
+       [0.0506, 0.04]
+    """
+
+    def __init__(self, startdates, maturitydates, couponrates, frequencies, prices=100.0,
+                 businessdayconvention=None, calendar=None, daycounter=None, ids=None):
+        self.logger = myLogger.getLogger(__name__)
+        self.startdates = as_datetime64(startdates).astype("datetime64[D]")
+        self.maturitydates = as_datetime64(maturitydates).astype("datetime64[D]")
+        n = len(self.startdates)
+        self.couponrates = np.broadcast_to(np.asarray(couponrates, dtype=np.float64), (n,))
+        self.frequencies = np.broadcast_to(np.asarray(frequencies, dtype=np.int64), (n,))
+        self.prices = np.broadcast_to(np.asarray(prices, dtype=np.float64), (n,)).copy()
+        if len(self.maturitydates) != n:
+            raise ValueError("Expected {} maturitydates, got {}".format(n, len(self.maturitydates)))
+        if np.any(12 % self.frequencies != 0):
+            raise ValueError("Coupon frequencies must divide 12")
+        self.businessdayconvention = businessdayconvention
+        self.calendar = calendar
+        self.daycounter = daycounter
+        self.ids = np.arange(n) if ids is None else np.asarray(ids)
+        self._offsets = None
+        self._dates = None
+
+    @classmethod
+    def fromBonds(cls, bonds, ids=None):
+        """Builds a table from Bond objects, which must share conventions, calendar and day counter."""
+        bonds = list(bonds)
+        first = bonds[0] if bonds else Bond.__new__(Bond)
+        return cls([b.startdate for b in bonds], [b.maturitydate for b in bonds],
+                   [b.couponrate for b in bonds], [b.frequency for b in bonds], [b.price for b in bonds],
+                   getattr(first, "businessdayconvention", None), getattr(first, "calendar", None),
+                   getattr(first, "daycounter", None), ids)
+
+    def __len__(self):
+        return len(self.startdates)
+
+    def _generateSchedules(self):
+        offsets, dates = coupon_schedules(self.startdates, self.maturitydates, 12 // self.frequencies)
+        if self.businessdayconvention is not None and self.calendar is not None:
+            dates = getConvention(self.businessdayconvention).adjust(dates, self.calendar)
+        self.logger.info("Generated %s coupon dates for %s bonds", len(dates), len(self))
+        self._offsets, self._dates = offsets, dates
+
+    @property
+    def offsets(self):
+        """Start of the payments of each bond in the flat arrays, plus the total number of payments."""
+        if self._offsets is None:
+            self._generateSchedules()
+        return self._offsets
+
+    @property
+    def dates(self):
+        """The flat datetime64[D] array of the payment dates of all bonds."""
+        if self._dates is None:
+            self._generateSchedules()
+        return self._dates
+
+    @property
+    def rows(self):
+        """Bond number of every payment in the flat arrays."""
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def getTimes(self):
+        """Returns the payment times in days from the start of each bond, as in the
+           "Dates" schedule of Cashflow: one day less than the calendar days, 0 for the startdate."""
+        days = datetime64_as_days(self.dates)
+        first = self.offsets[:-1][np.diff(self.offsets) > 0]
+        times = days - np.repeat(days[self.offsets[:-1]] if len(days) else days[:0], np.diff(self.offsets)) - 1
+        times[first] = 0
+        return times
+
+    def getAmounts(self):
+        """Returns the flat array of payment amounts: -price, the coupons and the redemption of 100."""
+        counts = np.diff(self.offsets)
+        amounts = np.repeat(self.couponrates * 100.0 / self.frequencies, counts)
+        nonempty = counts > 0
+        amounts[self.offsets[:-1][nonempty]] = -self.prices[nonempty]
+        amounts[self.offsets[1:][nonempty] - 1] += 100.0
+        return amounts
+
+    def getYearFractions(self, daycounter=None):
+        """Returns the year fraction of the period ending at every payment date under the day counter
+           (by default the one of the table, otherwise Actual/365), 0 for the startdates."""
+        daycounter = daycounter or self.daycounter
+        dates = self.dates
+        previous = np.concatenate((dates[:1], dates[:-1]))
+        if daycounter is None:
+            fractions = (dates - previous).astype(np.float64) / DAYS_PER_YEAR
+        else:
+            fractions = np.asarray(daycounter.yearFraction(previous, dates), dtype=np.float64)
+        fractions[self.offsets[:-1][np.diff(self.offsets) > 0]] = 0.0
+        return fractions
+
+    def toPortfolio(self):
+        """Returns the cashflows of all bonds as a CashflowPortfolio for batched PVs, yields and risk."""
+        return CashflowPortfolio(self.offsets, self.getTimes(), self.getAmounts(), self.ids)
+
+    def __getitem__(self, i):
+        """Returns the i-th bond as a Bond object."""
+        todatetime = lambda d: pd.Timestamp(d).to_pydatetime()
+        return Bond(maturitydate=todatetime(self.maturitydates[i]), couponrate=float(self.couponrates[i]),
+                    frequency_per_anno=int(self.frequencies[i]), price=float(self.prices[i]),
+                    startdate=todatetime(self.startdates[i]), businessdayconvention=self.businessdayconvention,
+                    calendar=self.calendar, daycounter=self.daycounter)
+
+    def __repr__(self):
+        return "BondTable(bonds={})".format(len(self))
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
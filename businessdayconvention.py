@@ -1,12 +1,114 @@
 #BusinessDayConvention
+import numpy as np
+import myLogger
+from pyquantdateutils import is_date_array, as_datetime64, like_dates
 
-class BusinessdayConvention:
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+
+class BusinessdayConvention(object):
     """"These conventions specify the algorithm used to adjust a date in case
-    it is not a valid business day."""
-    
-    def __init__:
-        self.Following = "Choose the first business day after the given holiday."
-        self.ModifiedFollowing = "Choose the first business day after the given holiday unless it belongs to a different month, in which case choose the first business day before the holiday."
-        self.Preceding = "Choose the first business day before the given holiday."
-        self.ModifiedPreceding = "Choose the first business day before the given holiday unless it belongs to a different month, in which case choose the first business day after the holiday."
-        self.Unadjusted  = "Do not adjust."
+    it is not a valid business day.
+    adjust takes a single date or a whole array of dates (datetime64 array, DatetimeIndex,
+    Series) and a calendar, e.g. a HolidayProfile or JointCalendar. Arrays are adjusted
+    with gathers on the business-day index of the calendar, without a loop over the dates.
+
+    >>> from datetime import datetime
+    >>> from EnhancedBDay import NYSE
+    >>> MemorialDay_Monday = datetime(2012, 5, 28)
+    >>> Following().adjust(MemorialDay_Monday, NYSE())
+    datetime.datetime(2012, 5, 29, 0, 0)
+    >>> Sunday = np.array(['2012-09-30'], dtype='datetime64[D]')
+    >>> ModifiedFollowing().adjust(Sunday, NYSE())
+    array(['2012-09-28'], dtype='datetime64[D]')
+    >>> getConvention("Preceding").adjust(Sunday, NYSE())
+    array(['2012-09-28'], dtype='datetime64[D]')
+    """
+
+    description = ""
+
+    def adjust(self, dates, calendar):
+        raise NotImplementedError
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.__class__.__name__)
+
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+
+
+class Following(BusinessdayConvention):
+
+    description = "Choose the first business day after the given holiday."
+
+    def adjust(self, dates, calendar):
+        return calendar.rollForward(dates)
+
+
+class Preceding(BusinessdayConvention):
+
+    description = "Choose the first business day before the given holiday."
+
+    def adjust(self, dates, calendar):
+        return calendar.rollBackward(dates)
+
+
+def _keepMonth(dates, adjusted, fallback):
+    """Returns adjusted where it lies in the month of dates, otherwise fallback(), for a date or an array of dates."""
+    if not is_date_array(dates):
+        return adjusted if (adjusted.year, adjusted.month) == (dates.year, dates.month) else fallback()
+    values = as_datetime64(adjusted)
+    othermonth = values.astype("datetime64[M]") != as_datetime64(dates).astype("datetime64[M]")
+    if othermonth.any():
+        values = np.where(othermonth, as_datetime64(fallback()), values)
+    return like_dates(dates, values)
+
+
+class ModifiedFollowing(BusinessdayConvention):
+
+    description = "Choose the first business day after the given holiday unless it belongs to a different month, in which case choose the first business day before the holiday."
+
+    def adjust(self, dates, calendar):
+        return _keepMonth(dates, calendar.rollForward(dates), lambda: calendar.rollBackward(dates))
+
+
+class ModifiedPreceding(BusinessdayConvention):
+
+    description = "Choose the first business day before the given holiday unless it belongs to a different month, in which case choose the first business day after the holiday."
+
+    def adjust(self, dates, calendar):
+        return _keepMonth(dates, calendar.rollBackward(dates), lambda: calendar.rollForward(dates))
+
+
+class Unadjusted(BusinessdayConvention):
+
+    description = "Do not adjust."
+
+    def adjust(self, dates, calendar):
+        return dates
+
+
+#conventions by name
+CONVENTIONS = dict((convention.__name__, convention()) for convention in
+                   (Following, ModifiedFollowing, Preceding, ModifiedPreceding, Unadjusted))
+
+def getConvention(convention):
+    """Returns the convention for a name like "ModifiedFollowing"; conventions are returned as they are."""
+    if isinstance(convention, BusinessdayConvention):
+        return convention
+    try:
+        return CONVENTIONS[convention]
+    except KeyError:
+        raise ValueError("Unknown business day convention: {}".format(convention))
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
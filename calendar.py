@@ -1,17 +0,0 @@
-#calendarreader
-
-class Calendar:
-
-    def __init__(self):
-        pass
-        
-    def readCalendar(self):
-        pass
-    
-    def writeCalendar(self):
-        pass
-        
-    def isBusinessDay(self):
-        pass
-        
-        
@@ -1,12 +1,23 @@
 # -*- coding: utf-8 -*-
+from collections import namedtuple
 import pandas as pd
 import numpy as np
-from scipy.optimize import bisect
 import myLogger
 from globalsconstants import *
+from yieldsolver import solveIRR
+from lrucache import LRUCache
+from discountcurve import DiscountCurve
 
 # create logger
-module_logger = myLogger.TLogger(__name__)
+module_logger = myLogger.getLogger(__name__)
+
+#risk figures of a cashflow for one interest rate, see Cashflow.risk
+RiskRecord = namedtuple("RiskRecord", ["pv", "macaulay_duration", "modified_duration", "convexity", "dv01", "pv01"])
+
+def _rateKey(r):
+    """Cache key of an interest rate: the rate itself, or the fingerprint of a DiscountCurve,
+       so that cached results do not keep curves and their daily grids alive."""
+    return r.key if isinstance(r, DiscountCurve) else r
 
 #TODO
 #PV is inconsitent with cashflows starting at 0 and starting at 1
@@ -21,38 +32,87 @@ class Cashflow(object):
         times_type sepcifies the type of date, e.g. Excel for dates in Excel
         format.
         
-        >>> print "Precision is: " + str(PRECISION)
+        >>> print("Precision is: " + str(PRECISION))
         Precision is: 8
         >>> cf_times = [1,2,3]
         >>> cf_amounts = [-100.0, 10.0, 110.0]
         >>> cf = Cashflow(cf_times, cf_amounts, time_type = "Annual")
-        >>> print "{0:g}".format(cf.getIRR())
+        >>> print("{0:g}".format(cf.getIRR()))
         0.1
-        >>> print "{0:g}".format(cf.getMcAuleyDuration())
+        >>> print("{0:g}".format(cf.getMcAuleyDuration()))
         1.90909
         >>> cf.getCouponPaymentSchedule()
         array([  0, 365, 730])
         >>> r = 0.05
         >>> cf.getDiscountFactors(r)
-        array([ 1.        ,  0.95238095,  0.90702948])
+        array([1.        , 0.95238095, 0.90702948])
         >>> cf.getDiscountedCashflows(r)
         array([-100.        ,    9.52380952,   99.77324263])
-        >>> print "{0:g}".format(cf.getPV(r))
+        >>> print("{0:g}".format(cf.getPV(r)))
         9.29705
-        >>> print "{0:g}".format(cf.getDuration(r))
+        >>> print("{0:g}".format(cf.getDuration(r)))
         1.91286
+        >>> risk = cf.risk(r)
+        >>> print("{0:g} {1:g} {2:g}".format(risk.pv, risk.macaulay_duration, risk.modified_duration))
+        9.29705 1.91286 1.82177
+        >>> cf.cacheInfo().currsize > 0
+        True
+        >>> cf.cf_amounts = [-100.0, 10.0, 120.0]
+        >>> cf.cacheInfo().currsize
+        0
     """    
-    def __init__(self, cf_times, cf_amounts, time_type = "Excel"):
-        self.logger = myLogger.TLogger(__name__)
-        self.logger.warning("Generating cashflow")
-        self.cf = pd.Series( data=cf_amounts, index = cf_times)
-        self.logger.info(self.cf)
+    def __init__(self, cf_times, cf_amounts, time_type = "Excel", compounding = "Annual", cache_size = 32):
+        self.logger = myLogger.getLogger(__name__)
+        self.logger.debug("Generating cashflow")
+        if compounding not in ("Annual", "Continuous"):
+            raise ValueError("Unknown compounding: {}".format(compounding))
         self.time_type = time_type
-        self.cf_times = cf_times
-        self.cf_amounts = cf_amounts
+        self.compounding = compounding
+        self._cache = LRUCache(cache_size)
+        self._cf_times = cf_times
+        self._cf_amounts = cf_amounts
+        self.cf = pd.Series( data=cf_amounts, index = cf_times)
+        self.logger.debug("%s", self.cf)
+
+    @property
+    def cf(self):
+        return self._cf
+
+    @cf.setter
+    def cf(self, cf):
+        """Replacing the payments recomputes the payment schedule and invalidates the cache."""
+        self._cf = cf
         self.daily_payment_schedule = self.getCouponPaymentSchedule()
+        self.invalidate()
+
+    @property
+    def cf_times(self):
+        return self._cf_times
+
+    @cf_times.setter
+    def cf_times(self, cf_times):
+        self._cf_times = cf_times
+        self.cf = pd.Series( data=self._cf_amounts, index = cf_times)
+
+    @property
+    def cf_amounts(self):
+        return self._cf_amounts
+
+    @cf_amounts.setter
+    def cf_amounts(self, cf_amounts):
+        self._cf_amounts = cf_amounts
+        self.cf = pd.Series( data=cf_amounts, index = self._cf_times)
+
+    def invalidate(self):
+        """Drops all cached results. Call this after changing the values of cf in place;
+           assigning cf, cf_times or cf_amounts invalidates automatically."""
+        self._cache.clear()
         self._IRR = None
         self._mcAuleyDuration = None
+
+    def cacheInfo(self):
+        """Returns hits, misses, size and maximum size of the per-rate cache."""
+        return self._cache.info()
         
     def getCouponPaymentSchedule(self):
         """ Returns the days from the startdate of the cashflow"""
@@ -63,79 +123,127 @@ class Cashflow(object):
         elif self.time_type == "Annual":
             days_from_startdate = np.array([(i - self.cf.idxmin()) * 365 for i in self.cf.index])     
         days_from_startdate[0] = 0 #startdate is 0
-        self.logger.debug("Coupon days from startdate: {}".format(days_from_startdate))
+        self.logger.debug("Coupon days from startdate: %s", days_from_startdate)
         return days_from_startdate
         
     def getPV(self, r):
         """Returns the present value (PV) for a cashflow given an interest rate (r)"""
-        pv =sum(self.getDiscountedCashflows(r))
-        self.logger.warn("Present value for r = " + str(r) + ": " + str(pv))
+        key = ("pv", _rateKey(r), self.compounding)
+        pv = self._cache.get(key)
+        if pv is None:
+            pv = sum(self.getDiscountedCashflows(r))
+            self._cache.put(key, pv)
+        self.logger.debug("Present value for r = %s: %s", r, pv)
         return pv
     
     def getDiscountFactors(self, r):
-        """Returns a list of discount factors for a cashflow given an interest rate (r)"""
-        daily_r = (1+r)**(1.0/365.0) -1
-        discountfactors = (1.0 + daily_r) ** - self.daily_payment_schedule
-        #self.discountfactors = (1.0 + daily_r)        
-        self.logger.debug("Discount factors for r = " + str(r) + ": " +     str(discountfactors))
+        """Returns a list of discount factors for a cashflow given an interest rate (r)
+           or a DiscountCurve. The returned array is cached per rate and read-only."""
+        key = ("discountfactors", _rateKey(r), self.compounding)
+        discountfactors = self._cache.get(key)
+        if discountfactors is None:
+            if isinstance(r, DiscountCurve):
+                discountfactors = r.getDiscountFactors(self.daily_payment_schedule).copy()
+            elif self.compounding == "Continuous":
+                discountfactors = np.exp(-r * self.daily_payment_schedule / DAYS_PER_YEAR)
+            else:
+                daily_r = (1+r)**(1.0/365.0) -1
+                discountfactors = (1.0 + daily_r) ** - self.daily_payment_schedule
+            discountfactors.setflags(write=False)
+            self._cache.put(key, discountfactors)
+        self.logger.debug("Discount factors for r = %s: %s", r, discountfactors)
         return discountfactors
         
     def getDiscountedCashflows(self, r):
         """Returns a list of discounted cashflows for a cashflow given an interest rate (r)"""
         discountedcashflows = self.getDiscountFactors(r) * self.cf.values
-        self.logger.debug("Discounted cashflows for r = " + str(r) + ": " + str(discountedcashflows))
+        self.logger.debug("Discounted cashflows for r = %s: %s", r, discountedcashflows)
         return discountedcashflows
         
     def getIRR(self): 
         """Returns the internal rate of return (IRR) for a cashflow given an interest rate (r)"""
-        if self.IRR == None: #IRR  already  calculated?
-            lowerbound = 0.0
-            upperbound = 0.5
-            while self.getPV(upperbound) > 0.0:
-                upperbound = upperbound*2
-            IRR =  bisect(self.getPV,lowerbound, upperbound, xtol=1.0e-8, maxiter = 100)
-            self._IRR = _IRR
+        if self._IRR == None: #IRR  already  calculated?
+            result = solveIRR([0, len(self.cf)], self.daily_payment_schedule, self.cf.values)
+            self._IRR = result.irr[0]
         else:
             pass
-        self.logger.debug("Internal rate of return is: " + str(self._IRR))
+        self.logger.debug("Internal rate of return is: %s", self._IRR)
         return self._IRR
         
+    def risk(self, r):
+        """Returns PV, Macaulay duration, modified duration, convexity, DV01 and PV01
+           for a cashflow given an interest rate (r) as a RiskRecord.
+           The discount factors are computed once for all figures and the record is cached per rate.
+           Durations and convexity are in years and relative to the PV of the payments after the startdate.
+           DV01 is the duration based PV change for a one basis point rise of r,
+           PV01 the same change by full revaluation.
+           For a DiscountCurve the figures are for a parallel shift of its continuously
+           compounded zero rates."""
+        key = ("risk", _rateKey(r), self.compounding)
+        risk = self._cache.get(key)
+        if risk is not None:
+            return risk
+        t = self.daily_payment_schedule / DAYS_PER_YEAR
+        discountedcashflows = self.getDiscountedCashflows(r)
+        pv = discountedcashflows.sum()
+        B = pv - self.cf.values[0]
+        duration = (t * discountedcashflows).sum() / B
+        if self.compounding == "Continuous" or isinstance(r, DiscountCurve):
+            modifiedduration = duration
+            convexity = (t * t * discountedcashflows).sum() / B
+            shift = -BASIS_POINT
+        else:
+            modifiedduration = duration / (1 + r)
+            convexity = (t * (t + 1) * discountedcashflows).sum() / (1 + r)**2 / B
+            shift = np.log((1 + r) / (1 + r + BASIS_POINT))
+        dv01 = modifiedduration * B * BASIS_POINT
+        pv01 = -(discountedcashflows * np.expm1(t * shift)).sum()
+        risk = RiskRecord(pv, duration, modifiedduration, convexity, dv01, pv01)
+        self._cache.put(key, risk)
+        self.logger.debug("Risk for r = %s: %s", r, risk)
+        return risk
+        
     def getDuration(self,r): 
-        """Returns the duration in days for a cashflow given an interest rate (r)"""
-        D = sum((self.daily_payment_schedule/365)  * self.getDiscountedCashflows(r))
-        B = self.getPV(r) - self.cf_amounts[0]
-        duration  = D/B
-        self.logger.debug("Duration is for r = " + str(r) + ": " + str(duration))
+        """Returns the duration in years for a cashflow given an interest rate (r)"""
+        duration = self.risk(r).macaulay_duration
+        self.logger.debug("Duration is for r = %s: %s", r, duration)
         return duration
         
     def getMcAuleyDuration(self): 
-        """Returns the McAuley-duration in days for a cashflow given an interest rate (r).
+        """Returns the McAuley-duration in years for a cashflow.
            McAuleyDuration uses the internal rate of return (IRR) as interest rate to calculate duration."""
         if self._mcAuleyDuration == None:
-            IRR = self.getIRR()
-            mcAuleyDuration = self.getDuration(IRR)
-            self._mcAuleyDuration = mcAuleyDuration
-        else:
-            pass_
-        self.logger.debug("McAuley duration is: " + str(self._mcAuleyDuration))
+            self._mcAuleyDuration = self.risk(self.getIRR()).macaulay_duration
+        self.logger.debug("McAuley duration is: %s", self._mcAuleyDuration)
         return self._mcAuleyDuration
         
     def getModifiedDuration(self):
         """Returns Modified Duration in terms of internal rate of interest (yield to maturity).
            It measures the precentage change of the PV with regards to a change in the interest rate.""" 
-        D = getMcAuleyDuration()
-        ModifiedDuration = D/(1+IRR)
-        self.logger.debug("Modified duration is: " + str(ModifiedDuration))
-        return D/(1+IRR)
+        ModifiedDuration = self.risk(self.getIRR()).modified_duration
+        self.logger.debug("Modified duration is: %s", ModifiedDuration)
+        return ModifiedDuration
         
     def getConvexity(self, r):
         """ Measures the curvature in the relationship between PV and interest rate."""
-        Cx =  sum((self.daily_payment_schedule/365)  * ((self.daily_payment_schedule/365) + 1) * self.getDiscountedCashflows(r))
-        B = self.getPV(r) - self.cf_amounts[0]
-        Convexity = (CX/((1+r)**2))/B
-        self.logger.debug("Convexity is: " + str(Convexity)
+        Convexity = self.risk(r).convexity
+        self.logger.debug("Convexity is: %s", Convexity)
         return Convexity
         
+    def __getstate__(self):
+        """Pickles the payments and settings only; the logger and the cached results are
+           recreated empty, which keeps cashflows cheap to send to worker processes."""
+        state = self.__dict__.copy()
+        del state["logger"]
+        state["_cache"] = self._cache.maxsize
+        state["_IRR"] = state["_mcAuleyDuration"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.logger = myLogger.getLogger(__name__)
+        self._cache = LRUCache(state["_cache"])
+
     def __repr__(self):
         return "Cashflow(cf_times={}, cf_amounts={}, time_type={})".format(self.cf_times, self.cf_amounts, self.time_type)
     
@@ -152,7 +260,7 @@ class Perpetuity(object):
        X(1 + g)2 , and so on.    
     """
     def __init__(self, cf_amount, r, growth=0.0):
-        self.logger = myLogger.TLogger(__name__)
+        self.logger = myLogger.getLogger(__name__)
         self.cf_amount = cf_amount
         self.r = r
         self.pv = cf_amount / (r - growth)
@@ -166,7 +274,7 @@ class Annuity(object):
        rate g
     """
     def __init__(self, cf_amount, r, no_periods, growth=0.0):
-        self.logger = myLogger.TLogger(__name__)
+        self.logger = myLogger.getLogger(__name__)
         self.cf_amount = cf_amount
         self.r = r
         self.pv = cf_amount * (1.0/ (r - growth) -  (1.0/(r-growth)*((1.0+growth)/(1.0+r))**no_periods))
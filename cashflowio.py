@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import myLogger
+from pyquantdateutils import xldates_to_datetime64, XLDATE_OK
+from cashflowportfolio import CashflowPortfolio
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+#rows read from the file at a time
+DEFAULT_CHUNKSIZE = 1000000
+
+#columns holding the instrument id, the Excel date and the amount of a payment
+DEFAULT_COLUMNS = ("id", "date", "amount")
+
+
+def _instrumentStarts(ids):
+    """Positions at which a new instrument starts in an array of ids of consecutive rows."""
+    return np.flatnonzero(np.concatenate(([len(ids) > 0], ids[1:] != ids[:-1])))
+
+
+class CashflowReader(object):
+    """Streams the cashflows of many instruments from a CSV export with one payment per row
+       (instrument id, Excel date, amount) as CashflowPortfolio batches, so that files larger
+       than memory are priced chunk by chunk.
+       The file is read chunksize rows at a time. The rows of an instrument must be consecutive;
+       the last instrument of a chunk is held back and completed with the next chunk, so no
+       instrument is split between batches. As for Cashflow with time_type "Excel", the times
+       are the days from the earliest payment of each instrument, in whatever order its rows are.
+       Excel dates are checked with xldates_to_datetime64; rows that are not valid dates of the
+       datemode (e.g. empty, negative or before 1900-03-01) are dropped with a warning.
+
+       >>> import os, tempfile
+       >>> filename = os.path.join(tempfile.mkdtemp(), "cashflows.csv")
+       >>> with open(filename, "w") as f:
+       ...     _ = f.write("id,date,amount\\nA,40909,-100\\nA,41275,10\\nA,41640,110\\nB,40909,-50\\nB,41275,55\\n")
+       >>> reader = CashflowReader(filename, chunksize=2)
+       >>> [pf.ids.tolist() for pf in reader]
+       [['A'], ['B']]
+       >>> reader.getPV(0.05).round(5).tolist()
+       [9.28244, 2.37395]
+       >>> with open(filename, "w") as f:
+       ...     _ = f.write("id,date,amount\\nA,41275,10\\nA,40909,-100\\nA,41640,110\\nB,80000,-50\\nB,110000,55\\n")
+       >>> [(pf.times.tolist(), pf.amounts.tolist()) for pf in CashflowReader(filename)]
+       [([366.0, 0.0, 731.0], [10.0, -100.0, 110.0]), ([0.0, 30000.0], [-50.0, 55.0])]
+    """
+
+    def __init__(self, filename, chunksize=DEFAULT_CHUNKSIZE, columns=DEFAULT_COLUMNS, datemode=0, **csvoptions):
+        self.logger = myLogger.getLogger(__name__)
+        self.filename = filename
+        self.chunksize = chunksize
+        self.columns = tuple(columns)
+        self.datemode = datemode
+        self.csvoptions = csvoptions
+
+    def __iter__(self):
+        """Yields a CashflowPortfolio per chunk with the instrument ids as ids."""
+        idcolumn, datecolumn, amountcolumn = self.columns
+        carry = None
+        for chunk in pd.read_csv(self.filename, usecols=list(self.columns), chunksize=self.chunksize, **self.csvoptions):
+            rows = (chunk[idcolumn].values, chunk[datecolumn].values.astype(np.float64),
+                    chunk[amountcolumn].values.astype(np.float64))
+            if carry is not None:
+                rows = tuple(np.concatenate(pair) for pair in zip(carry, rows))
+            #the last instrument may continue in the next chunk
+            starts = _instrumentStarts(rows[0])
+            cut = starts[-1] if len(starts) else 0
+            carry = tuple(column[cut:] for column in rows)
+            if cut > 0:
+                yield self._batch(*(column[:cut] for column in rows))
+        if carry is not None and len(carry[0]):
+            yield self._batch(*carry)
+
+    def _batch(self, ids, xldates, amounts):
+        errors = xldates_to_datetime64(xldates, self.datemode)[1]
+        valid = errors == XLDATE_OK
+        if not valid.all():
+            self.logger.warning("Dropped %s rows with invalid Excel dates from %s", len(valid) - valid.sum(), self.filename)
+            ids, xldates, amounts = ids[valid], xldates[valid], amounts[valid]
+        starts = _instrumentStarts(ids)
+        offsets = np.append(starts, len(ids))
+        times = xldates - np.repeat(np.minimum.reduceat(xldates, starts), np.diff(offsets))
+        return CashflowPortfolio(offsets, times, amounts, ids[starts])
+
+    def getPV(self, r):
+        """Returns the present value of every instrument in the file given an interest rate (r),
+           as a Series indexed by instrument id. Only one chunk is held in memory at a time."""
+        ids, pvs = [], []
+        for portfolio in self:
+            ids.append(portfolio.ids)
+            pvs.append(portfolio.getPV(r))
+        if not ids:
+            return pd.Series([], dtype=np.float64)
+        return pd.Series(np.concatenate(pvs), index=np.concatenate(ids))
+
+    def __repr__(self):
+        return "CashflowReader(filename={!r}, chunksize={})".format(self.filename, self.chunksize)
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import myLogger
+from globalsconstants import *
+from pyquantarrayutils import segment_sum, select_segments
+from yieldsolver import solveIRR
+from cashflow import RiskRecord
+from discountcurve import DiscountCurve
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+
+class CashflowPortfolio(object):
+    """Packs the payment streams of many cashflows into flat NumPy arrays so
+       that a whole book is discounted in one vectorized operation instead of
+       one Cashflow object at a time.
+       The layout is ragged (CSR-style): the payments of instrument i are
+       times[offsets[i]:offsets[i+1]] and amounts[offsets[i]:offsets[i+1]].
+       Times are days from the start of each cashflow, i.e. the same values as
+       Cashflow.daily_payment_schedule, and are discounted the same way.
+
+       >>> pf = CashflowPortfolio([0, 3, 5], [0, 365, 730, 0, 365], [-100.0, 10.0, 110.0, -50.0, 55.0])
+       >>> len(pf)
+       2
+       >>> np.round(pf.getPV(0.05), 5).tolist()
+       [9.29705, 2.38095]
+       >>> np.round(pf.getPV([0.05, 0.1]), 5).tolist()
+       [9.29705, 0.0]
+       >>> np.round(pf.getDiscountFactors(0.05), 5).tolist()
+       [1.0, 0.95238, 0.90703, 1.0, 0.95238]
+       >>> np.round(pf.getPVMatrix([0.0, 0.05]), 5).tolist()
+       [[20.0, 9.29705], [5.0, 2.38095]]
+       >>> np.round(pf.getIRR().irr, 8).tolist()
+       [0.1, 0.1]
+       >>> np.round(pf.risk(0.05).macaulay_duration, 5).tolist()
+       [1.91286, 1.0]
+       >>> pf.subset([1]).amounts.tolist()
+       [-50.0, 55.0]
+    """
+
+    def __init__(self, offsets, times, amounts, ids=None):
+        self.logger = myLogger.getLogger(__name__)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.times = np.asarray(times, dtype=np.float64)
+        self.amounts = np.asarray(amounts, dtype=np.float64)
+        if (self.offsets.ndim != 1 or len(self.offsets) == 0 or self.offsets[0] != 0
+                or np.any(np.diff(self.offsets) < 0)):
+            raise ValueError("Offsets must be a non-decreasing sequence starting at 0.")
+        if not (len(self.times) == len(self.amounts) == self.offsets[-1]):
+            raise ValueError("Times and amounts must both hold offsets[-1] = {} payments.".format(self.offsets[-1]))
+        self.ids = np.arange(len(self)) if ids is None else np.asarray(ids)
+        self._years = None
+        self._rows = None
+        self.logger.info("Packed %s cashflows with %s payments", len(self), len(self.times))
+
+    @classmethod
+    def fromCashflows(cls, cashflows, ids=None):
+        """Builds a portfolio from a sequence of Cashflow objects."""
+        cashflows = list(cashflows)
+        counts = [len(cf.daily_payment_schedule) for cf in cashflows]
+        offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+        if cashflows:
+            times = np.concatenate([cf.daily_payment_schedule for cf in cashflows])
+            amounts = np.concatenate([cf.cf.values for cf in cashflows])
+        else:
+            times, amounts = [], []
+        return cls(offsets, times, amounts, ids)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def counts(self):
+        """Number of payments per instrument."""
+        return np.diff(self.offsets)
+
+    @property
+    def years(self):
+        """Payment times in years. Computed on first use, so that wrapping memory-mapped
+           arrays does not read all payments."""
+        if self._years is None:
+            self._years = self.times / DAYS_PER_YEAR
+        return self._years
+
+    @property
+    def rows(self):
+        """Instrument number of every payment in the flat arrays."""
+        if self._rows is None:
+            self._rows = np.repeat(np.arange(len(self)), self.counts)
+        return self._rows
+
+    def getInstrument(self, i):
+        """Returns the (times, amounts) views of the i-th instrument."""
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.times[start:end], self.amounts[start:end]
+
+    def subset(self, selected):
+        """Returns a portfolio of the selected instruments, given as a boolean mask or an array of
+           instrument numbers. Only the payments of these instruments are read, so on memory-mapped
+           arrays (see cashflowstore) only their pages are touched."""
+        selected = np.asarray(selected)
+        if selected.dtype == bool:
+            selected = np.flatnonzero(selected)
+        offsets, times, amounts = select_segments(self.offsets, selected, self.times, self.amounts)
+        return CashflowPortfolio(offsets, times, amounts, self.ids[selected])
+
+    def _expandRates(self, r):
+        """Broadcasts a single rate or one rate per instrument onto the flat payment arrays."""
+        if np.ndim(r) == 0:
+            return float(r)
+        r = np.asarray(r, dtype=np.float64)
+        if r.shape != (len(self),):
+            raise ValueError("Expected a single rate or one rate per instrument ({}), got shape {}.".format(len(self), r.shape))
+        return r[self.rows]
+
+    def getDiscountFactors(self, r):
+        """Returns the flat array of discount factors given an interest rate (r).
+           r is either a single rate, one rate per instrument or a DiscountCurve."""
+        if isinstance(r, DiscountCurve):
+            return r.getDiscountFactors(self.times)
+        return np.exp(-self.years * np.log1p(self._expandRates(r)))
+
+    def getDiscountedCashflows(self, r):
+        """Returns the flat array of discounted cashflows given an interest rate (r)."""
+        return self.getDiscountFactors(r) * self.amounts
+
+    def getPV(self, r):
+        """Returns the present value (PV) of every instrument given an interest rate (r)."""
+        return segment_sum(self.getDiscountedCashflows(r), self.offsets)
+
+    def getDiscountFactorMatrix(self, rates):
+        """Returns the discount factors of every payment for a vector of rates.
+           The result has one row per payment and one column per rate."""
+        rates = np.asarray(rates, dtype=np.float64)
+        return np.exp(np.multiply.outer(-self.years, np.log1p(rates)))
+
+    def getDiscountedCashflowMatrix(self, rates):
+        """Returns the discounted cashflows of every payment for a vector of rates."""
+        return self.getDiscountFactorMatrix(rates) * self.amounts[:, np.newaxis]
+
+    def getPVMatrix(self, rates):
+        """Returns the present values of the whole book for a vector of rates.
+           The result has one row per instrument and one column per rate."""
+        return segment_sum(self.getDiscountedCashflowMatrix(rates), self.offsets)
+
+    def getIRR(self, prices=None, tol=1.0e-8, maxiter=50):
+        """Returns the internal rate of return (IRR) of every instrument, solved all at once.
+           If prices are given the yields at which the PVs equal the prices are returned.
+           See yieldsolver.solveIRR for the convergence information in the result."""
+        return solveIRR(self.offsets, self.times, self.amounts, prices, tol, maxiter)
+
+    def risk(self, r):
+        """Returns PV, Macaulay duration, modified duration, convexity, DV01 and PV01 of every
+           instrument given an interest rate (r), as a record array with the fields of
+           cashflow.RiskRecord. The discount factors are computed once for all figures.
+           For a DiscountCurve the figures are for a parallel shift of its continuously
+           compounded zero rates."""
+        discountedcashflows = self.getDiscountedCashflows(r)
+        pv = segment_sum(discountedcashflows, self.offsets)
+        B = pv - segment_sum(np.where(self.times == 0.0, self.amounts, 0.0), self.offsets)
+        duration = segment_sum(self.years * discountedcashflows, self.offsets) / B
+        if isinstance(r, DiscountCurve):
+            modifiedduration = duration
+            convexity = segment_sum(self.years * self.years * discountedcashflows, self.offsets) / B
+            shift = -BASIS_POINT
+        else:
+            rates = np.broadcast_to(np.asarray(r, dtype=np.float64), (len(self),))
+            flatrates = self._expandRates(r)
+            modifiedduration = duration / (1 + rates)
+            convexity = segment_sum(self.years * (self.years + 1) * discountedcashflows, self.offsets) / (1 + rates)**2 / B
+            shift = np.log((1 + flatrates) / (1 + flatrates + BASIS_POINT))
+        dv01 = modifiedduration * B * BASIS_POINT
+        pv01 = -segment_sum(discountedcashflows * np.expm1(self.years * shift), self.offsets)
+        return np.rec.fromarrays([pv, duration, modifiedduration, convexity, dv01, pv01], names=list(RiskRecord._fields))
+
+    def __repr__(self):
+        return "CashflowPortfolio(instruments={}, payments={})".format(len(self), len(self.times))
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import numpy as np
+import myLogger
+from cashflowportfolio import CashflowPortfolio
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+#arrays of a store, each saved as <name>.npy in a version directory of the store
+STORE_ARRAYS = ("offsets", "times", "amounts", "ids")
+
+#file in the store directory naming the current version directory
+STORE_CURRENT = "CURRENT"
+
+
+class CashflowStore(object):
+    """Keeps the cashflows of a portfolio as flat binary arrays in .npy files:
+       offsets, times and amounts in the layout of CashflowPortfolio, plus the instrument ids.
+       Loading memory-maps the files instead of parsing them: nothing is read until used,
+       pricing a subset of instruments only reads the pages of their payments, and processes
+       forked after loading, or loading the same store, share one page-cached copy.
+       Every write goes to a new version directory inside the store directory and is then
+       published by atomically replacing the CURRENT file naming it, so a load sees either
+       the previous or the new portfolio, never a mix. Older versions are removed; portfolios
+       already loaded from them stay readable on POSIX systems while they are mapped.
+
+       >>> import tempfile
+       >>> store = CashflowStore(tempfile.mkdtemp())
+       >>> store.write(CashflowPortfolio([0, 3, 5], [0, 365, 730, 0, 365], [-100.0, 10.0, 110.0, -50.0, 55.0], ["A", "B"]))
+       >>> pf = store.load()
+       >>> len(pf), isinstance(pf.amounts.base, np.memmap)
+       (2, True)
+       >>> np.round(pf.getPV(0.05), 5).tolist()
+       [9.29705, 2.38095]
+       >>> store.load(["B"]).amounts.tolist()
+       [-50.0, 55.0]
+       >>> store.write(CashflowPortfolio([0, 2], [0, 365], [-50.0, 60.0], ["C"]))
+       >>> store.load().ids.tolist(), pf.amounts.tolist()
+       (['C'], [-100.0, 10.0, 110.0, -50.0, 55.0])
+    """
+
+    def __init__(self, directory):
+        self.logger = myLogger.getLogger(__name__)
+        self.directory = directory
+
+    def _filename(self, name, version):
+        return os.path.join(self.directory, version, name + ".npy")
+
+    def _current(self):
+        """Name of the version directory that was written last."""
+        with open(os.path.join(self.directory, STORE_CURRENT)) as f:
+            return f.read().strip()
+
+    def write(self, portfolio):
+        """Writes a CashflowPortfolio, or a sequence of Cashflow objects, to the store."""
+        if not isinstance(portfolio, CashflowPortfolio):
+            portfolio = CashflowPortfolio.fromCashflows(portfolio)
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        ids = portfolio.ids
+        if ids.dtype == object:
+            #.npy files of objects cannot be memory-mapped
+            ids = ids.astype(str)
+        arrays = dict(offsets=portfolio.offsets, times=portfolio.times, amounts=portfolio.amounts, ids=ids)
+        version = os.path.basename(tempfile.mkdtemp(prefix="v", dir=self.directory))
+        for name in STORE_ARRAYS:
+            np.save(self._filename(name, version), np.ascontiguousarray(arrays[name]), allow_pickle=False)
+        #one rename publishes all arrays together
+        current = os.path.join(self.directory, STORE_CURRENT)
+        with open(current + ".tmp", "w") as f:
+            f.write(version)
+        os.replace(current + ".tmp", current)
+        for entry in os.listdir(self.directory):
+            path = os.path.join(self.directory, entry)
+            if entry != version and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        self.logger.info("Wrote %s cashflows with %s payments to %s", len(portfolio), len(portfolio.times), self.directory)
+
+    def load(self, selected=None):
+        """Returns the stored cashflows as a CashflowPortfolio on memory-mapped arrays.
+           If selected is given (instrument ids, or a boolean mask over the instruments),
+           only these instruments are read, into an in-memory portfolio."""
+        version = self._current()
+        arrays = dict((name, np.load(self._filename(name, version), mmap_mode="r")) for name in STORE_ARRAYS)
+        portfolio = CashflowPortfolio(arrays["offsets"], arrays["times"], arrays["amounts"], arrays["ids"])
+        if selected is None:
+            return portfolio
+        selected = np.asarray(selected)
+        if selected.dtype != bool:
+            selected = self._positions(portfolio.ids, selected)
+        return portfolio.subset(selected)
+
+    def _positions(self, ids, selected):
+        """Positions of the instruments with the selected ids, raising KeyError for unknown ids."""
+        if len(ids) == 0:
+            missing = np.ones(len(selected), dtype=bool)
+        else:
+            order = np.argsort(ids, kind="mergesort")
+            positions = order[np.minimum(np.searchsorted(ids, selected, sorter=order), len(ids) - 1)]
+            missing = ids[positions] != selected
+        if np.any(missing):
+            raise KeyError("Unknown instruments: {}".format(selected[missing].tolist()))
+        return positions
+
+    def __repr__(self):
+        return "CashflowStore(directory={!r})".format(self.directory)
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
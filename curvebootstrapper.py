@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import myLogger
+from globalsconstants import *
+from pyquantdateutils import as_datetime64, datetime64_as_days
+from pyquantarrayutils import segment_sum
+from daycounter import Actual360
+from discountcurve import DiscountCurve, LOGLINEAR, INTERPOLATIONS
+from bondtable import BondTable
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+
+class CurveBootstrapper(object):
+    """Builds a DiscountCurve from deposit rates and par bond coupons quoted at the referencedate.
+       deposits is a sequence of (maturitydate, rate) pairs, bonds a sequence of
+       (maturitydate, couponrate, frequency_per_anno) of bonds starting at the referencedate and
+       priced at par (100). Every instrument adds a pillar to the curve at its maturity:
+       - deposits pay 1 + rate * yearfraction at maturity, with the year fraction of the
+         depositdaycounter (Actual/360 by default);
+       - bond schedules are generated like Bond (see BondTable).
+       All payments, and so the pillars, are on the time axis of Cashflow: the calendar days
+       from the referencedate less one (see Cashflow.getCouponPaymentSchedule), so that
+       Bond.getPV(curve) reprices a par bond to 0 and instruments maturing on the same date
+       share one time. Instruments must therefore mature at least two days after the referencedate.
+         Coupons are couponrate * 100 / frequency, or couponrate * 100 * year fraction of the
+         period if a bonddaycounter is given.
+       The pillars are solved in order of maturity, each with a vectorized Newton iteration
+       over the payments of its instrument, with log-linear interpolation between the pillars.
+       Because log-linear interpolation is local, a pillar only depends on the pillars before it:
+       after setQuote or setQuotes only the pillars at or after the earliest changed quote are
+       solved again on the next getCurve.
+       Cubic and monotone convex interpolation are not local, so for them the log-linear pillars
+       are only the starting point of a Newton iteration on all pillars at once, which makes
+       the curve with the requested interpolation reprice every instrument.
+
+       >>> from datetime import date
+       >>> bootstrapper = CurveBootstrapper(date(2012, 1, 2),
+       ...                                  deposits=[(date(2012, 4, 2), 0.01), (date(2012, 7, 2), 0.012)],
+       ...                                  bonds=[(date(2014, 1, 2), 0.015, 2), (date(2017, 1, 2), 0.02, 2)])
+       >>> curve = bootstrapper.getCurve()
+       >>> np.round(curve.getZeroRates([365, 1826]), 5).tolist()
+       [0.01414, 0.0202]
+       >>> bool(np.abs(bootstrapper.getPV()).max() < 1e-10)
+       True
+       >>> from cashflow import Cashflow
+       >>> deposit = Cashflow([date(2012, 1, 2), date(2012, 7, 2)], [-1.0, 1 + 0.012 * 182 / 360.0], time_type="Dates")
+       >>> bool(abs(deposit.getPV(curve)) < 1e-12)
+       True
+       >>> bootstrapper.setQuote(3, 0.021)
+       >>> bootstrapper.getCurve().discountfactors[:4].tolist() == curve.discountfactors[:4].tolist()
+       True
+       >>> for interpolation in INTERPOLATIONS:
+       ...     bootstrapper = CurveBootstrapper(date(2012, 1, 2), deposits=[(date(2012, 7, 2), 0.012)],
+       ...                                      bonds=[(date(2014, 1, 2), 0.015, 2), (date(2022, 1, 2), 0.03, 1)],
+       ...                                      interpolation=interpolation)
+       ...     print(interpolation, bool(np.abs(bootstrapper.getPV()).max() < 1e-10))
+       loglinear True
+       cubic True
+       monotoneconvex True
+    """
+
+    def __init__(self, referencedate, deposits=(), bonds=(), depositdaycounter=None, bonddaycounter=None,
+                 interpolation=LOGLINEAR, tol=1.0e-12, maxiter=50):
+        self.logger = myLogger.getLogger(__name__)
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError("Unknown interpolation: {}".format(interpolation))
+        self.referencedate = as_datetime64([referencedate]).astype("datetime64[D]")[0]
+        self.interpolation = interpolation
+        self.tol = tol
+        self.maxiter = maxiter
+        reference = int(datetime64_as_days(np.array([self.referencedate]))[0])
+        deposits, bonds = list(deposits), list(bonds)
+        ndeposits = len(deposits)
+        #deposits: closed form discount factors 1 / (1 + rate * yearfraction)
+        maturities = as_datetime64([d[0] for d in deposits]).astype("datetime64[D]")
+        depositdaycounter = depositdaycounter or Actual360()
+        self._depositfractions = np.asarray(depositdaycounter.yearFraction(
+            np.repeat(self.referencedate, ndeposits), maturities), dtype=np.float64)
+        #payment days of Cashflow, like the bond payments from BondTable.getTimes
+        deposittimes = (datetime64_as_days(maturities) - reference - 1).astype(np.float64)
+        #bonds: payments of all bonds as flat arrays; amounts are base + couponrate * couponunits
+        table = BondTable(np.repeat(self.referencedate, len(bonds)), [b[0] for b in bonds],
+                          0.0, [b[2] for b in bonds])
+        self._offsets = table.offsets
+        self._times = table.getTimes().astype(np.float64)
+        self._baseamounts = table.getAmounts()
+        if bonddaycounter is None:
+            self._couponunits = np.repeat(100.0 / table.frequencies, np.diff(self._offsets))
+        else:
+            self._couponunits = 100.0 * table.getYearFractions(bonddaycounter)
+        self._couponunits[self._offsets[:-1][np.diff(self._offsets) > 0]] = 0.0
+        bondtimes = self._times[self._offsets[1:] - 1] if len(bonds) else np.zeros(0)
+        self.quotes = np.array([d[1] for d in deposits] + [b[1] for b in bonds], dtype=np.float64)
+        self.ndeposits = ndeposits
+        #pillars in order of maturity; node 0 is day 0 with discount factor 1
+        pillartimes = np.concatenate((deposittimes, bondtimes))
+        order = np.argsort(pillartimes, kind="mergesort")
+        if np.any(pillartimes <= 0) or np.any(np.diff(pillartimes[order]) <= 0):
+            raise ValueError("Instruments must mature after the referencedate on different days")
+        self._instruments = order
+        self._pillars = np.empty(len(order), dtype=np.int64)
+        self._pillars[order] = np.arange(1, len(order) + 1)
+        self.times = np.concatenate(([0.0], pillartimes[order]))
+        #interpolation segment and weight of every bond payment between the pillars
+        self._segments = np.maximum(np.searchsorted(self.times, self._times, side="left"), 1)
+        self._weights = (self._times - self.times[self._segments - 1]) / np.diff(self.times)[self._segments - 1]
+        self._logdfs = np.zeros(len(self.times))
+        self._dirty = 1
+        self._curve = None
+
+    def __len__(self):
+        return len(self.quotes)
+
+    def setQuote(self, i, quote):
+        """Changes the quote of instrument i (deposits first, then bonds, in the given order)."""
+        self.setQuotes(np.where(np.arange(len(self)) == i, quote, self.quotes))
+
+    def setQuotes(self, quotes):
+        """Changes the quotes of all instruments; only pillars at or after the first changed
+           one are solved again."""
+        quotes = np.asarray(quotes, dtype=np.float64)
+        changed = np.flatnonzero(quotes != self.quotes)
+        if len(changed):
+            self._dirty = min(self._dirty, self._pillars[changed].min())
+            self.quotes = quotes.copy()
+            self._curve = None
+
+    def getCurve(self):
+        """Returns the bootstrapped DiscountCurve, solving the pillars not solved yet."""
+        if self._curve is None:
+            first = self._dirty
+            for pillar in range(first, len(self.times)):
+                self._logdfs[pillar] = self._solvePillar(pillar)
+            self._dirty = len(self.times)
+            self._curve = DiscountCurve(self.times[1:], np.exp(self._logdfs[1:]), self.interpolation)
+            self.logger.debug("Solved pillars %s to %s", first, len(self.times) - 1)
+            if self.interpolation != LOGLINEAR:
+                self._curve = self._solveCurve()
+        return self._curve
+
+    def _solveCurve(self):
+        """Returns the curve with the requested interpolation that reprices all instruments, by a
+           Newton iteration on the log discount factors of all pillars starting from the log-linear
+           ones; the Jacobian is taken by forward differences."""
+        x = self._logdfs[1:].copy()
+        h = 1.0e-7
+        for i in range(self.maxiter):
+            residuals = self.getPV(DiscountCurve(self.times[1:], np.exp(x), self.interpolation))
+            jacobian = np.empty((len(x), len(x)))
+            for j in range(len(x)):
+                bumped = x.copy()
+                bumped[j] += h
+                jacobian[:, j] = (self.getPV(DiscountCurve(self.times[1:], np.exp(bumped), self.interpolation)) - residuals) / h
+            step = np.linalg.solve(jacobian, residuals)
+            x -= step
+            if np.abs(step).max() < self.tol:
+                self.logger.debug("Solved %s pillars with %s interpolation in %s iterations", len(x), self.interpolation, i + 1)
+                return DiscountCurve(self.times[1:], np.exp(x), self.interpolation)
+        raise ValueError("Bootstrapping with {} interpolation did not converge".format(self.interpolation))
+
+    def _solvePillar(self, pillar):
+        """Returns the log discount factor of a pillar given the log discount factors before it."""
+        instrument = self._instruments[pillar - 1]
+        if instrument < self.ndeposits:
+            return -np.log1p(self.quotes[instrument] * self._depositfractions[instrument])
+        bond = instrument - self.ndeposits
+        payments = slice(self._offsets[bond], self._offsets[bond + 1])
+        amounts = self._baseamounts[payments] + self.quotes[instrument] * self._couponunits[payments]
+        segments, weights = self._segments[payments], self._weights[payments]
+        before = segments < pillar
+        segments = segments[before]
+        logdfs = (1 - weights[before]) * self._logdfs[segments - 1] + weights[before] * self._logdfs[segments]
+        known = np.dot(amounts[before], np.exp(logdfs))
+        amounts, weights = amounts[~before], weights[~before]
+        previous = self._logdfs[pillar - 1]
+        h = self.times[pillar] - self.times[pillar - 1]
+        #start from the forward rate of the previous period, or 5% for the first
+        forward = np.log1p(0.05) / DAYS_PER_YEAR
+        if pillar > 1:
+            forward = (self._logdfs[pillar - 2] - previous) / (self.times[pillar - 1] - self.times[pillar - 2])
+        x = previous - forward * h
+        for i in range(self.maxiter):
+            discounted = amounts * np.exp((1 - weights) * previous + weights * x)
+            step = (known + discounted.sum()) / np.dot(weights, discounted)
+            x -= step
+            if abs(step) < self.tol:
+                return x
+        raise ValueError("Bootstrapping did not converge at pillar {} (day {})".format(pillar, self.times[pillar]))
+
+    def getPV(self, curve=None):
+        """Returns the present values of the instruments at a curve (by default the bootstrapped one),
+           per unit notional for deposits and per 100 for bonds; they are 0 at the bootstrapped curve."""
+        curve = curve or self.getCurve()
+        deposits = np.arange(self.ndeposits)
+        pillartimes = self.times[self._pillars[deposits]]
+        pv = (1 + self.quotes[deposits] * self._depositfractions) * curve.getDiscountFactors(pillartimes) - 1
+        amounts = self._baseamounts + np.repeat(self.quotes[self.ndeposits:], np.diff(self._offsets)) * self._couponunits
+        return np.concatenate((pv, segment_sum(amounts * curve.getDiscountFactors(self._times), self._offsets)))
+
+    def __repr__(self):
+        return "CurveBootstrapper(referencedate={}, deposits={}, bonds={})".format(
+            self.referencedate, self.ndeposits, len(self) - self.ndeposits)
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
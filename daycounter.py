@@ -1,42 +1,186 @@
 #DayCounter class
+import numpy as np
+import myLogger
+from pyquantdateutils import is_date_array, as_datetime64, datetime64_as_days
+import EnhancedBDay
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+
+def _days(dates):
+    """Returns the day numbers (counted from 1970-01-01) of a date or an array of dates as an int64 array,
+    and a mask of the missing dates (NaT), whose day numbers are set to 0 so that no convention trips over them."""
+    values = as_datetime64(dates if is_date_array(dates) else [dates])
+    nat = np.isnat(values)
+    days = datetime64_as_days(values)
+    days[nat] = 0
+    return days, nat
+
+def _masked(values, nat):
+    """values as floats with NaN where a date was missing, or values unchanged if no date was."""
+    if not nat.any():
+        return values
+    return np.where(nat, np.nan, values)
+
+def _fields(days):
+    """Returns year, month and day of month of arrays of day numbers."""
+    dates = days.astype("datetime64[D]")
+    years = dates.astype("datetime64[Y]")
+    months = dates.astype("datetime64[M]")
+    return (years.astype(np.int64) + 1970, (months - years).astype(np.int64) + 1,
+            (dates - months).astype(np.int64) + 1)
+
+def _isLeap(years):
+    return (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+
+def _isLastOfMonth(days):
+    return _fields(days + 1)[2] == 1
+
+def _isLastOfFebruary(days):
+    return (_fields(days)[1] == 2) & _isLastOfMonth(days)
+
+def _januaryFirst(years):
+    return (years - 1970).astype("datetime64[Y]").astype("datetime64[D]").astype(np.int64)
+
+def _shiftYears(days, n):
+    """Moves day numbers n years back (n > 0), keeping month and day; February 29th becomes the 28th
+    in years that are not leap years."""
+    years, months, monthdays = _fields(days)
+    years = years - n
+    monthdays = np.where((months == 2) & (monthdays == 29) & ~_isLeap(years), 28, monthdays)
+    first = (years - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (months - 1)
+    return (first.astype("datetime64[D]") + (monthdays - 1)).astype(np.int64)
+
 
 class DayCounter(object):
-    
-    """"How many days are there between two dates"""
-
-    def __init__(self, startdate, enddate):
-        self.name = "Simple Daycounter"
-        self.yearfraction = __calcyearfraction(startdate, enddate)
-        
-    def __calcyearfraction (self, startdate, enddate):
-        return enddate - startdate / 360.0
-            
-            
+
+    """"How many days are there between two dates
+    yearFraction and dayCount take single dates or arrays of dates (datetime64 arrays,
+    DatetimeIndex, Series or lists of dates) and return a float or a float array, so that
+    the accruals of a whole book are one NumPy call per convention.
+    If startdate and enddate are given to the constructor, yearfraction is set to their year fraction.
+    The base class counts actual days over 360.
+
+    >>> from datetime import date
+    >>> Actual360().yearFraction(date(2012, 1, 1), date(2012, 7, 1))
+    0.5055555555555555
+    >>> starts = np.array(['2012-01-01', '2012-02-29'], dtype='datetime64[D]')
+    >>> ends = np.array(['2013-01-01', '2012-08-31'], dtype='datetime64[D]')
+    >>> Actual365Fixed().yearFraction(starts, ends).round(6).tolist()
+    [1.00274, 0.50411]
+    >>> Thirty360(convention="European").dayCount(starts, ends).tolist()
+    [360, 181]
+    >>> ActualActual().yearFraction(date(2011, 11, 1), date(2012, 3, 1))
+    0.331057713900741
+    >>> Actual365Fixed().yearFraction(starts, np.array(['2013-01-01', 'NaT'], dtype='datetime64[D]')).round(6).tolist()
+    [1.00274, nan]
+    """
+
+    name = "Simple Daycounter"
+
+    def __init__(self, startdate=None, enddate=None):
+        self.logger = myLogger.getLogger(__name__)
+        if startdate is not None and enddate is not None:
+            self.yearfraction = self.yearFraction(startdate, enddate)
+
+    def yearFraction(self, startdate, enddate):
+        """Returns the year fraction from startdate to enddate, for single dates or arrays of dates."""
+        (start, startnat), (end, endnat) = _days(startdate), _days(enddate)
+        fraction = _masked(self._yearFraction(start, end), startnat | endnat)
+        return fraction if is_date_array(startdate) or is_date_array(enddate) else float(fraction[0])
+
+    def dayCount(self, startdate, enddate):
+        """Returns the number of days from startdate to enddate counted by the convention.
+           The counts are floats with NaN for missing dates (NaT), like a pandas integer column with missing values."""
+        (start, startnat), (end, endnat) = _days(startdate), _days(enddate)
+        count = _masked(self._dayCount(start, end), startnat | endnat)
+        if is_date_array(startdate) or is_date_array(enddate):
+            return count
+        return float(count[0]) if np.isnan(count[0]) else int(count[0])
+
+    def _dayCount(self, start, end):
+        return end - start
+
+    def _yearFraction(self, start, end):
+        return self._dayCount(start, end) / 360.0
+
+    def __eq__(self, other):
+        return repr(self) == repr(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(repr(self))
+
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+
+
 class Actual360(DayCounter):
-    
-     """Actual/360 day count convention
-        Actual/360 day count convention, also known as "Act/360", or "A/360"."""
-    
-    def __init__(self, startdate, enddate):
-        self.name = "Actual/360"
-        self.yearfraction = __calcyearfraction(startdate, enddate)
-        
-    def __calcyearfraction (self, startdate, enddate):
-        return enddate - startdate / 360.0
-            
+
+    """Actual/360 day count convention
+       Actual/360 day count convention, also known as "Act/360", or "A/360"."""
+
+    name = "Actual/360"
+
+
+class Actual365Fixed(DayCounter):
+
+    """Actual/365 (Fixed) day count convention, also known as "Act/365 (Fixed)", "A/365F" or "English"."""
+
+    name = "Actual/365 (Fixed)"
+
+    def _yearFraction(self, start, end):
+        return self._dayCount(start, end) / 365.0
+
+
 class Thirty360(DayCounter):
 
-        """30/360 day counters"""
-    
-    def __init__(self, startdate, enddate):
-        self.name = "30/360"
-        self.yearfraction = __calcyearfraction(startdate, enddate)
-        
-    def __calcyearfraction (self, startdate, enddate):
-        return enddate - startdate / 360.0
-            
+    """30/360 day counters
+    - US (the default), also known as "30/360", "Bond Basis" or "360/360", with the
+      end-of-February rules of the SIA;
+    - European, also known as "30E/360" or "Eurobond Basis";
+    - ISDA, also known as "30E/360 ISDA" or "German", for which the terminationdate
+      (maturity) of the instrument decides whether an end date at the end of February counts as the 30th."""
+
+    name = "30/360"
+    CONVENTIONS = ("US", "European", "ISDA")
+
+    def __init__(self, startdate=None, enddate=None, convention="US", terminationdate=None):
+        if convention not in self.CONVENTIONS:
+            raise ValueError("Unknown 30/360 convention: {}".format(convention))
+        self.convention = convention
+        self.terminationdate = terminationdate
+        super(Thirty360, self).__init__(startdate, enddate)
+
+    def _dayCount(self, start, end):
+        y1, m1, d1 = _fields(start)
+        y2, m2, d2 = _fields(end)
+        if self.convention == "US":
+            februaryend1 = _isLastOfFebruary(start)
+            d2 = np.where(februaryend1 & _isLastOfFebruary(end), 30, d2)
+            d1 = np.where(februaryend1, 30, d1)
+            d2 = np.where((d2 == 31) & (d1 >= 30), 30, d2)
+            d1 = np.where(d1 == 31, 30, d1)
+        elif self.convention == "European":
+            d1 = np.minimum(d1, 30)
+            d2 = np.minimum(d2, 30)
+        else:
+            d1 = np.where(_isLastOfMonth(start), 30, d1)
+            lastofmonth = _isLastOfMonth(end)
+            if self.terminationdate is not None:
+                lastofmonth &= ~((m2 == 2) & (end == _days(self.terminationdate)[0]))
+            d2 = np.where(lastofmonth, 30, d2)
+        return 360 * (y2 - y1) + 30 * (m2 - m1) + (d2 - d1)
+
+    def __repr__(self):
+        return "Thirty360(convention={!r}, terminationdate={!r})".format(self.convention, self.terminationdate)
+
+
 class ActualActual(DayCounter):
-    
+
     """Actual/Actual day count
         The day count can be calculated according to:
         - the ISDA convention, also known as "Actual/Actual (Historical)",
@@ -46,11 +190,103 @@ class ActualActual(DayCounter):
         "Actual/Actual (Bond)";
         - the AFB convention, also known as "Actual/Actual (Euro)".
         For more details, refer to
-        http://www.isda.org/publications/pdf/Day-Count-Fracation1999.pdf"""
-    
-    def __init__(self, startdate, enddate):
-        self.name = "Actual/Actual"
-        self.yearfraction = __calcyearfraction(startdate, enddate)
-        
-    def __calcyearfraction (self, startdate, enddate):
-        return enddate - startdate / 360.0
+        http://www.isda.org/publications/pdf/Day-Count-Fracation1999.pdf
+        For ICMA the reference (coupon) period is passed to yearFraction as refstartdate and
+        refenddate; without it the period itself is taken as a regular coupon period."""
+
+    name = "Actual/Actual"
+    CONVENTIONS = ("ISDA", "ICMA", "AFB")
+
+    def __init__(self, startdate=None, enddate=None, convention="ISDA"):
+        if convention not in self.CONVENTIONS:
+            raise ValueError("Unknown Actual/Actual convention: {}".format(convention))
+        self.convention = convention
+        super(ActualActual, self).__init__(startdate, enddate)
+
+    def yearFraction(self, startdate, enddate, refstartdate=None, refenddate=None):
+        """Returns the year fraction from startdate to enddate, for single dates or arrays of dates.
+           refstartdate and refenddate are the reference coupon periods used by the ICMA convention."""
+        if self.convention != "ICMA":
+            return super(ActualActual, self).yearFraction(startdate, enddate)
+        (start, startnat), (end, endnat) = _days(startdate), _days(enddate)
+        refstart, refstartnat = (start, startnat) if refstartdate is None else _days(refstartdate)
+        refend, refendnat = (end, endnat) if refenddate is None else _days(refenddate)
+        #length of the reference period in whole months, e.g. 6 for semi-annual coupons
+        months = np.round(12.0 * (refend - refstart) / 365.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(refend > refstart, months / 12.0 * (end - start) / (refend - refstart), 0.0)
+        fraction = _masked(fraction, startnat | endnat | refstartnat | refendnat)
+        arrays = [is_date_array(d) for d in (startdate, enddate, refstartdate, refenddate)]
+        return fraction if any(arrays) else float(fraction[0])
+
+    def _yearFraction(self, start, end):
+        if self.convention == "AFB":
+            return self._afb(start, end)
+        y1, y2 = _fields(start)[0], _fields(end)[0]
+        daysinyear1 = np.where(_isLeap(y1), 366.0, 365.0)
+        daysinyear2 = np.where(_isLeap(y2), 366.0, 365.0)
+        return (y2 - y1) + (end - _januaryFirst(y2)) / daysinyear2 - (start - _januaryFirst(y1)) / daysinyear1
+
+    def _afb(self, start, end):
+        """Whole years counted back from the end date, plus the rest over 365 or, if it contains
+        a February 29th, over 366 days."""
+        sign = np.where(end < start, -1.0, 1.0)
+        start, end = np.minimum(start, end), np.maximum(start, end)
+        def back(years):
+            #counting back onto February 28th of a leap year lands on the 29th
+            shifted = _shiftYears(end, years)
+            y, m, d = _fields(shifted)
+            shifted = np.where((years > 0) & (m == 2) & (d == 28) & _isLeap(y), shifted + 1, shifted)
+            return shifted
+        years = _fields(end)[0] - _fields(start)[0]
+        shifted = back(years)
+        years = np.where(shifted < start, years - 1, years)
+        shifted = np.where(shifted < start, back(years), shifted)
+        february29 = lambda years: _januaryFirst(years) + 59
+        ys, yn = _fields(start)[0], _fields(shifted)[0]
+        leapyear = np.where(_isLeap(yn), yn, ys)
+        leap = _isLeap(leapyear) & (shifted > february29(leapyear)) & (start <= february29(leapyear))
+        return sign * (years + (shifted - start) / np.where(leap, 366.0, 365.0))
+
+    def __repr__(self):
+        return "ActualActual(convention={!r})".format(self.convention)
+
+
+class Business252(DayCounter):
+
+    """Business/252 day count convention, also known as "Bus/252", used for Brazilian
+    DI rates: business days of the calendar (BOVESPA by default) over 252.
+    The business days are the difference of two lookups in the cumulative business-day
+    count of the calendar, so millions of date pairs cost two gathers and a subtraction.
+    calendar is a HolidayProfile or JointCalendar, or the name of a profile in EnhancedBDay.
+
+    >>> from datetime import date
+    >>> Business252().dayCount(date(2012, 12, 21), date(2013, 1, 4))
+    7
+    """
+
+    name = "Business/252"
+
+    def __init__(self, startdate=None, enddate=None, calendar="BOVESPA"):
+        if isinstance(calendar, str):
+            calendar = getattr(EnhancedBDay, calendar)()
+        self.calendar = calendar
+        super(Business252, self).__init__(startdate, enddate)
+
+    def _dayCount(self, start, end):
+        if len(start) == 0 and len(end) == 0:
+            return np.zeros(0, dtype=np.int64)
+        first = min(start.min(), end.min())
+        last = max(start.max(), end.max())
+        return self.calendar.businessDayIndex(first, last).count(start, end)
+
+    def _yearFraction(self, start, end):
+        return self._dayCount(start, end) / 252.0
+
+    def __repr__(self):
+        return "Business252(calendar={})".format(self.calendar.name)
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import numpy as np
+import myLogger
+from globalsconstants import *
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+#interpolation methods of a DiscountCurve
+LOGLINEAR = "loglinear"
+CUBIC = "cubic"
+MONOTONE_CONVEX = "monotoneconvex"
+INTERPOLATIONS = (LOGLINEAR, CUBIC, MONOTONE_CONVEX)
+
+
+def _naturalSpline(t, y):
+    """Second derivatives of the natural cubic spline through the points (t, y)."""
+    n = len(t)
+    M = np.zeros(n)
+    if n > 2:
+        h = np.diff(t)
+        slopes = np.diff(y) / h
+        A = np.diag(2.0 * (h[:-1] + h[1:])) + np.diag(h[1:-1], 1) + np.diag(h[1:-1], -1)
+        M[1:-1] = np.linalg.solve(A, 6.0 * np.diff(slopes))
+    return M
+
+def _monotoneConvexForwards(t, forwards):
+    """Instantaneous forward rates at the nodes t of the monotone convex method of Hagan and West,
+       for the discrete forward rates of the periods between the nodes."""
+    f = np.empty(len(t))
+    if len(forwards) == 1:
+        f[:] = forwards[0]
+        return f
+    h = np.diff(t)
+    f[1:-1] = (h[:-1] * forwards[1:] + h[1:] * forwards[:-1]) / (h[:-1] + h[1:])
+    f[0] = forwards[0] - 0.5 * (f[1] - forwards[0])
+    f[-1] = forwards[-1] - 0.5 * (f[-2] - forwards[-1])
+    return f
+
+def _monotoneConvexIntegral(g0, g1, x):
+    """Integral from 0 to x of the Hagan-West correction g of the forward rate in a period,
+       where g0 and g1 are the differences of the instantaneous forwards at the period ends
+       to the discrete forward of the period and x is the fraction of the period."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        #(ii) quadratic
+        quadratic = g0 * (x - 2 * x**2 + x**3) + g1 * (x**3 - x**2)
+        #(iii) flat, then rising to g1
+        eta = (g1 + 2 * g0) / (g1 - g0)
+        rising = g0 * x + (g1 - g0) * np.maximum(x - eta, 0.0)**3 / (3 * (1 - eta)**2)
+        #(iv) falling from g0, then flat
+        eta = 3 * g1 / (g1 - g0)
+        falling = g1 * x + (g0 - g1) * eta / 3 * (1 - (np.maximum(eta - x, 0.0) / eta)**3)
+        #(v) falling to A, then rising
+        eta = g1 / (g1 + g0)
+        A = -g0 * g1 / (g0 + g1)
+        through = (A * x + (g0 - A) * eta / 3 * (1 - (np.maximum(eta - x, 0.0) / eta)**3)
+                   + (g1 - A) * np.maximum(x - eta, 0.0)**3 / (3 * (1 - eta)**2))
+    zero = (g0 == 0) | (g1 == 0)
+    isquadratic = ((g0 < 0) & (-0.5 * g0 <= g1) & (g1 <= -2 * g0)) | ((g0 > 0) & (-0.5 * g0 >= g1) & (g1 >= -2 * g0))
+    isrising = ((g0 < 0) & (g1 > -2 * g0)) | ((g0 > 0) & (g1 < -2 * g0))
+    isfalling = ((g0 > 0) & (g1 < 0) & (g1 > -0.5 * g0)) | ((g0 < 0) & (g1 > 0) & (g1 < -0.5 * g0))
+    return np.select([zero, isquadratic, isrising, isfalling], [0.0, quadratic, rising, falling], through)
+
+
+class DiscountCurve(object):
+    """A term structure of discount factors, interpolated between the discount factors at
+       the node times. Times are in days, like the payment times of Cashflow
+       (daily_payment_schedule) and CashflowPortfolio; a node with discount factor 1 at day 0 is
+       added if there is none. Cashflow, Bond, CashflowPortfolio and BondTable accept a curve
+       wherever they take an interest rate r.
+       Interpolation is one of
+       - "loglinear": linear in the log discount factors, i.e. piecewise flat forward rates;
+       - "cubic": natural cubic spline through the log discount factors;
+       - "monotoneconvex": the monotone convex method of Hagan and West, which keeps the
+         forward rates continuous and, for monotone discrete forwards, monotone.
+       Beyond the last node the forward rate of the last period is kept.
+       getDiscountFactors takes arrays of times. For whole days the discount factors are looked
+       up in a daily grid, computed once on first use for the days up to the last node, or up to
+       lastday, and extended when later days are asked for.
+       key is a fingerprint of the nodes and the interpolation. Results cached per curve, e.g. by
+       Cashflow, are stored under the key, so caches do not keep curves alive and a curve
+       rebuilt from the same nodes, e.g. by CurveBootstrapper, finds the results of the old one.
+
+       >>> curve = DiscountCurve.fromZeroRates([365, 730], [0.05, 0.05])
+       >>> np.round(curve.getDiscountFactors([0, 365, 730, 1095]), 5).tolist()
+       [1.0, 0.95238, 0.90703, 0.86384]
+       >>> from cashflow import Cashflow
+       >>> cf = Cashflow([1, 2, 3], [-100.0, 10.0, 110.0], time_type = "Annual")
+       >>> print("{0:g} {1:g}".format(cf.getPV(curve), cf.getPV(0.05)))
+       9.29705 9.29705
+       >>> rebuilt, hits = DiscountCurve.fromZeroRates([365, 730], [0.05, 0.05]), cf.cacheInfo().hits
+       >>> print("{0:g} {1}".format(cf.getPV(rebuilt), cf.cacheInfo().hits - hits))
+       9.29705 1
+       >>> curve = DiscountCurve([365, 730, 1825], [0.96, 0.915, 0.78], interpolation="monotoneconvex")
+       >>> np.round(curve.getDiscountFactors([182.5, 1000.0]), 5).tolist()
+       [0.98046, 0.88136]
+    """
+
+    def __init__(self, times, discountfactors, interpolation=LOGLINEAR, lastday=None):
+        self.logger = myLogger.getLogger(__name__)
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError("Unknown interpolation: {}".format(interpolation))
+        times = np.asarray(times, dtype=np.float64)
+        discountfactors = np.asarray(discountfactors, dtype=np.float64)
+        if times.shape != discountfactors.shape or times.ndim != 1:
+            raise ValueError("Expected one discount factor per time")
+        if len(times) == 0 or times[0] != 0.0:
+            times = np.concatenate(([0.0], times))
+            discountfactors = np.concatenate(([1.0], discountfactors))
+        if np.any(np.diff(times) <= 0) or np.any(discountfactors <= 0):
+            raise ValueError("Times must be increasing from 0 and discount factors positive")
+        if len(times) < 2:
+            raise ValueError("A discount curve needs at least one node after day 0")
+        self.times = times
+        self.discountfactors = discountfactors
+        self.interpolation = interpolation
+        self.lastday = int(np.ceil(times[-1] if lastday is None else lastday))
+        self._logdfs = np.log(discountfactors)
+        #discrete forward rates (per day) of the periods between the nodes
+        self._forwards = -np.diff(self._logdfs) / np.diff(times)
+        if interpolation == CUBIC:
+            self._secondderivatives = _naturalSpline(times, self._logdfs)
+        elif interpolation == MONOTONE_CONVEX:
+            self._nodeforwards = _monotoneConvexForwards(times, self._forwards)
+        for array in (self.times, self.discountfactors):
+            array.setflags(write=False)
+        self.key = (interpolation, hashlib.sha256(times.tobytes() + discountfactors.tobytes()).hexdigest())
+        self._grid = None
+
+    @classmethod
+    def fromZeroRates(cls, times, rates, interpolation=LOGLINEAR, lastday=None):
+        """Builds a curve from annually compounded zero rates, i.e. discount factors
+           (1 + r)**(-days / DAYS_PER_YEAR) as for a flat rate in Cashflow."""
+        times = np.asarray(times, dtype=np.float64)
+        discountfactors = (1.0 + np.asarray(rates, dtype=np.float64)) ** (-times / DAYS_PER_YEAR)
+        return cls(times, discountfactors, interpolation, lastday)
+
+    def _logDiscountFactors(self, t):
+        """Interpolated log discount factors of an array of times."""
+        t = np.maximum(t, 0.0)
+        i = np.clip(np.searchsorted(self.times, t, side="right"), 1, len(self.times) - 1)
+        t0, t1 = self.times[i - 1], self.times[i]
+        h = t1 - t0
+        beyond = t > self.times[-1]
+        inside = np.where(beyond, t1, t)
+        if self.interpolation == LOGLINEAR:
+            logdfs = self._logdfs[i - 1] - self._forwards[i - 1] * (inside - t0)
+        elif self.interpolation == CUBIC:
+            M0, M1 = self._secondderivatives[i - 1], self._secondderivatives[i]
+            y0, y1 = self._logdfs[i - 1], self._logdfs[i]
+            logdfs = ((M0 * (t1 - inside)**3 + M1 * (inside - t0)**3) / (6 * h)
+                      + (y0 - M0 * h * h / 6) * (t1 - inside) / h + (y1 - M1 * h * h / 6) * (inside - t0) / h)
+        else:
+            forwards = self._forwards[i - 1]
+            g0 = self._nodeforwards[i - 1] - forwards
+            g1 = self._nodeforwards[i] - forwards
+            x = (inside - t0) / h
+            logdfs = self._logdfs[i - 1] - forwards * (inside - t0) - h * _monotoneConvexIntegral(g0, g1, x)
+        return np.where(beyond, logdfs - self._forwards[-1] * (t - self.times[-1]), logdfs)
+
+    def getDiscountFactorGrid(self, lastday=None):
+        """Returns the discount factors of the days 0 to lastday (at least the lastday of the curve).
+           The grid is computed once and kept; it is read-only."""
+        lastday = self.lastday if lastday is None else max(int(lastday), self.lastday)
+        if self._grid is None or len(self._grid) <= lastday:
+            if self._grid is not None:
+                #grow geometrically, so that growing day by day stays linear
+                lastday = max(lastday, 2 * len(self._grid))
+            self._grid = np.exp(self._logDiscountFactors(np.arange(lastday + 1, dtype=np.float64)))
+            self._grid.setflags(write=False)
+            self.logger.debug("Computed daily discount factors up to day %s", lastday)
+        return self._grid
+
+    def getDiscountFactors(self, times):
+        """Returns the discount factors of an array of times in days. Whole days are
+           looked up in the daily grid, other times are interpolated."""
+        times = np.asarray(times)
+        if times.size and (times.dtype.kind in "iu" or np.array_equal(times, np.floor(times))):
+            days = times.astype(np.int64)
+            if days.min() >= 0:
+                return self.getDiscountFactorGrid(days.max())[days]
+        return np.exp(self._logDiscountFactors(times.astype(np.float64)))
+
+    def getZeroRates(self, times):
+        """Returns the annually compounded zero rates of an array of times in days."""
+        times = np.asarray(times, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.getDiscountFactors(times) ** (-DAYS_PER_YEAR / times) - 1.0
+
+    def getForwardRates(self, starttimes, endtimes):
+        """Returns the annually compounded forward rates between arrays of start and end times in days."""
+        starttimes = np.asarray(starttimes, dtype=np.float64)
+        endtimes = np.asarray(endtimes, dtype=np.float64)
+        ratio = self.getDiscountFactors(starttimes) / self.getDiscountFactors(endtimes)
+        return ratio ** (DAYS_PER_YEAR / (endtimes - starttimes)) - 1.0
+
+    def __getstate__(self):
+        """Pickles the curve without its logger and daily grid, which are recreated on use."""
+        state = self.__dict__.copy()
+        del state["logger"]
+        state["_grid"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.logger = myLogger.getLogger(__name__)
+
+    def __repr__(self):
+        return "DiscountCurve(nodes={}, interpolation={!r})".format(len(self.times), self.interpolation)
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
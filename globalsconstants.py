@@ -5,3 +5,9 @@ PRECISION = 8
 
 #precision when printing floats from numpy
 np.set_printoptions(PRECISION)
+
+#number of days per year used to turn payment days into year fractions
+DAYS_PER_YEAR = 365.0
+
+#one basis point, the rate shift used for DV01 and PV01
+BASIS_POINT = 0.0001
@@ -0,0 +1,132 @@
+#calendarreader
+import os
+import mmap
+import numpy as np
+import myLogger
+import EnhancedBDay
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+#holiday profiles written by default
+DEFAULT_PROFILES = ("NYSE", "LSE", "LME", "BOVESPA", "ASX", "TSX", "FSE", "MIL", "TSE")
+
+#layout of a calendar file: a header, one directory entry per profile and the
+#business-day and holiday bitmaps of every profile, packed with one bit per day
+#(little bit order) from January 1st of firstyear and aligned to 8 bytes
+CALENDAR_MAGIC = b"PQCAL"
+CALENDAR_VERSION = 1
+_HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("count", "<u4"),
+                    ("firstyear", "<i4"), ("lastyear", "<i4"), ("ndays", "<i8")])
+_ENTRY = np.dtype([("name", "S32"), ("hash", "S64"), ("businessdays", "<u8"), ("holidays", "<u8")])
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+class Calendar(object):
+    """Stores the precomputed business-day and holiday tables of holiday profiles in
+       one compact binary file, so that processes do not evaluate holiday rules on startup.
+       readCalendar memory-maps the file: all processes reading the same file share one
+       page-cached copy, and the tables of a year are only unpacked when first used.
+       The tables are installed into the shared profile objects, so every user of a profile,
+       e.g. Business252 or BusinessDayWithHolidays, looks its days up in the file.
+       Each profile is stored with the fingerprint of its rules (HolidayProfile.ruleHash);
+       profiles whose rules changed since the file was written are not installed and
+       fall back to evaluating their rules.
+
+       >>> import tempfile
+       >>> filename = os.path.join(tempfile.mkdtemp(), "holidays.cal")
+       >>> Calendar(filename).writeCalendar(profiles=("NYSE", "LSE"), firstyear=2000, lastyear=2030)
+       >>> calendar = Calendar(filename)
+       >>> sorted(calendar.readCalendar())
+       ['LSE', 'NYSE']
+       >>> from datetime import datetime
+       >>> calendar.isBusinessDay("NYSE", datetime(2012, 7, 4))
+       False
+       >>> calendar.profiles["NYSE"] is EnhancedBDay.NYSE()
+       True
+    """
+
+    def __init__(self, filename=None):
+        self.logger = myLogger.getLogger(__name__)
+        self.filename = filename
+        self.profiles = {}
+        self._mmap = None
+
+    def writeCalendar(self, filename=None, profiles=DEFAULT_PROFILES, firstyear=1950, lastyear=2100):
+        """Writes the tables of the profiles (names of classes in EnhancedBDay or HolidayProfile
+           objects) for the years firstyear to lastyear. The file is replaced atomically, so that
+           processes that mapped the old file keep a consistent copy."""
+        filename = filename or self.filename
+        profiles = [self._profile(profile) for profile in profiles]
+        ndays = int(EnhancedBDay.epoch_days(lastyear, 12, 31) - EnhancedBDay.epoch_days(firstyear, 1, 1)) + 1
+        nbytes = (ndays + 7) // 8
+        header = np.zeros(1, dtype=_HEADER)
+        header[0] = (CALENDAR_MAGIC, CALENDAR_VERSION, len(profiles), firstyear, lastyear, ndays)
+        directory = np.zeros(len(profiles), dtype=_ENTRY)
+        offset = _align(_HEADER.itemsize + _ENTRY.itemsize * len(profiles))
+        bitmaps = []
+        for i, profile in enumerate(profiles):
+            profile._ensureYears(firstyear, lastyear)
+            tables = [profile._yearTables(year) for year in range(firstyear, lastyear + 1)]
+            directory[i] = (profile.__class__.__name__, profile.ruleHash(), offset, _align(offset + nbytes))
+            for table in zip(*tables):
+                bitmaps.append((offset, np.packbits(np.concatenate(table), bitorder="little")))
+                offset = _align(offset + nbytes)
+        temporary = filename + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(header.tobytes())
+            f.write(directory.tobytes())
+            for position, bits in bitmaps:
+                f.seek(position)
+                f.write(bits.tobytes())
+            f.truncate(offset)
+        os.replace(temporary, filename)
+        self.logger.info("Wrote %s holiday profiles for %s to %s to %s", len(profiles), firstyear, lastyear, filename)
+
+    def readCalendar(self, filename=None):
+        """Memory-maps a calendar file and installs its tables into the holiday profiles.
+           Returns a dict of the installed profiles by name."""
+        filename = filename or self.filename
+        with open(filename, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = np.frombuffer(mapped, dtype=_HEADER, count=1)[0]
+        if header["magic"] != CALENDAR_MAGIC:
+            raise ValueError("{} is not a calendar file".format(filename))
+        if header["version"] != CALENDAR_VERSION:
+            raise ValueError("Calendar file {} has version {}, expected {}".format(filename, header["version"], CALENDAR_VERSION))
+        firstyear, lastyear = int(header["firstyear"]), int(header["lastyear"])
+        nbytes = (int(header["ndays"]) + 7) // 8
+        directory = np.frombuffer(mapped, dtype=_ENTRY, count=int(header["count"]), offset=_HEADER.itemsize)
+        for entry in directory:
+            name = entry["name"].decode("ascii")
+            profile = getattr(EnhancedBDay, name, None)
+            if profile is None:
+                self.logger.warning("Unknown holiday profile %s in %s", name, filename)
+                continue
+            profile = profile()
+            if profile.ruleHash() != entry["hash"].decode("ascii"):
+                self.logger.warning("Rules of %s changed since %s was written, not using its tables", name, filename)
+                continue
+            businessbits = np.frombuffer(mapped, dtype=np.uint8, count=nbytes, offset=int(entry["businessdays"]))
+            holidaybits = np.frombuffer(mapped, dtype=np.uint8, count=nbytes, offset=int(entry["holidays"]))
+            profile.installTables(firstyear, lastyear, businessbits, holidaybits)
+            self.profiles[name] = profile
+        self._mmap = mapped
+        self.logger.info("Loaded %s holiday profiles for %s to %s from %s", len(self.profiles), firstyear, lastyear, filename)
+        return self.profiles
+
+    def isBusinessDay(self, profile, date):
+        """Looks the date up in the tables of the profile, given by name or as object."""
+        return self._profile(profile).isBusinessDay(date)
+
+    def _profile(self, profile):
+        if isinstance(profile, str):
+            return self.profiles.get(profile) or getattr(EnhancedBDay, profile)()
+        return profile
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
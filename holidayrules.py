@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""Declarative holiday rules for holiday profiles.
+A rule describes one family of holidays (a fixed date with its observance on
+weekends, the n-th weekday of a month, a day relative to Easter, ...) and is
+evaluated for a whole range of days at once with NumPy, instead of one date
+at a time. Rules are combined with | and &.
+
+>>> rules = (FixedDate(July, 4, observed=NEAREST_WEEKDAY), NthWeekday(September, Monday, 1))
+>>> days = holiday_days(rules, 2015, 2016)
+>>> [str(day) for day in days]
+['2015-07-03', '2015-07-04', '2015-09-07', '2016-07-04', '2016-09-05']
+"""
+from datetime import date
+import numpy as np
+import myLogger
+from lrucache import LRUCache
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+#gives names to calendar numbers for readability and to use globally within module
+Monday      = 1
+Tuesday     = 2
+Wednesday   = 3
+Thursday    = 4
+Friday      = 5
+Saturday    = 6
+Sunday      = 7
+
+January     = 1
+February    = 2
+March       = 3
+April       = 4
+May         = 5
+June        = 6
+July        = 7
+August      = 8
+September   = 9
+October     = 10
+November    = 11
+December    = 12
+
+#observance of fixed-date holidays falling on a weekend, as (days later, weekdays) pairs:
+#the holiday is also observed that many days later if that day is one of the weekdays
+MONDAY_IF_SUNDAY = ((1, (Monday,)),)
+MONDAY_IF_WEEKEND = ((1, (Monday,)), (2, (Monday,)))
+NEAREST_WEEKDAY = ((1, (Monday,)), (-1, (Friday,)))
+#Christmas and Boxing Day on a weekend are observed on the following Monday and Tuesday
+CHRISTMAS_BOXING_DAY = ((2, (Monday, Tuesday)),)
+
+#day number of 1970-01-01 in the ordinals of date.toordinal(); days are counted from there as in numpy datetime64[D]
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+#exact equinox times in days of the month for the year 2000
+VERNAL_EQUINOX = 20.69115
+AUTUMNAL_EQUINOX = 23.09
+
+
+def epoch_days(years, months, days):
+    """Returns the day numbers, counted from 1970-01-01, of arrays of years, months and days."""
+    first = (np.asarray(years) - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+    return ((first + (np.asarray(months) - 1)).astype("datetime64[D]") + (np.asarray(days) - 1)).astype(np.int64)
+
+def easter_sunday(years):
+    """Returns the day numbers of Easter Sunday for an array of years (Butcher's algorithm).
+
+    >>> easter_sunday(np.array([2012])).astype("datetime64[D]")
+    array(['2012-04-08'], dtype='datetime64[D]')
+    """
+    y = np.asarray(years, dtype=np.int64)
+    a = y % 19
+    b = y // 100
+    c = y % 100
+    d = (19 * a + b - b // 4 - ((b - (b + 8) // 25 + 1) // 3) + 15) % 30
+    e = (32 + 2 * (b % 4) + 2 * (c // 4) - d - (c % 4)) % 7
+    f = d + e - 7 * ((a + 11 * d + 22 * e) // 451) + 114
+    return epoch_days(y, f // 31, f % 31 + 1)
+
+def equinox_day(equinoxtime, years):
+    """Returns the day of the month of the equinox for an array of years,
+    given the exact equinox time in the year 2000."""
+    y = np.asarray(years, dtype=np.int64) - 2000
+    diff_per_year = 0.242194
+    number_of_leap_years = y // 4 + y // 100 - y // 400
+    return np.trunc(equinoxtime + y * diff_per_year - number_of_leap_years).astype(np.int64)
+
+
+def _isIn(values, choices):
+    """np.isin for a handful of choices, as a chain of comparisons (faster for few choices)."""
+    mask = np.zeros(values.shape, dtype=bool)
+    for choice in choices:
+        mask |= values == choice
+    return mask
+
+
+class DayFields(object):
+    """Calendar fields of every day from day number first to last (inclusive), computed once
+       and shared by all rules: y, m, d, w (isoweekday) and the number of days of the month."""
+
+    def __init__(self, first, last):
+        self.days = np.arange(first, last + 1, dtype=np.int64)
+        dates = self.days.astype("datetime64[D]")
+        years = dates.astype("datetime64[Y]")
+        months = dates.astype("datetime64[M]")
+        self.y = years.astype(np.int64) + 1970
+        self.m = (months - years).astype(np.int64) + 1
+        self.d = (dates - months).astype(np.int64) + 1
+        #1970-01-01 was a Thursday
+        self.w = (self.days + Thursday - 1) % 7 + 1
+        self.monthdays = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(np.int64)
+        self._peryear = {}
+
+    @classmethod
+    def forYears(cls, firstyear, lastyear):
+        """Returns the (shared and cached) fields of all days of the years firstyear to lastyear."""
+        fields = _fieldsCache.get((firstyear, lastyear))
+        if fields is None:
+            fields = cls(epoch_days(firstyear, 1, 1), epoch_days(lastyear, 12, 31))
+            _fieldsCache.put((firstyear, lastyear), fields)
+        return fields
+
+    def perYear(self, key, function):
+        """Evaluates function once on the array of years and spreads the result over the days.
+           The result is cached under key."""
+        values = self._peryear.get(key)
+        if values is None:
+            firstyear = self.y[0]
+            values = function(np.arange(firstyear, self.y[-1] + 1))[self.y - firstyear]
+            self._peryear[key] = values
+        return values
+
+
+#fields of the year ranges evaluated last; all profiles building the same years share them
+_fieldsCache = LRUCache(8)
+
+
+class HolidayRule(object):
+    """Base class of the holiday rules. Subclasses implement _mask(fields), which returns
+       a boolean array over the days of a DayFields object.
+       The restrictions common to all rules are:
+       weekdays      only days on one of these weekdays
+       first_year    only from this year on
+       last_year     only up to this year
+       except_years  not in these years
+       every         only in years divisible by every
+    """
+
+    def __init__(self, weekdays=None, first_year=None, last_year=None, except_years=(), every=None):
+        self.weekdays = None if weekdays is None else tuple(weekdays)
+        self.first_year = first_year
+        self.last_year = last_year
+        self.except_years = tuple(except_years)
+        self.every = every
+
+    def _mask(self, fields):
+        raise NotImplementedError
+
+    def mask(self, fields):
+        """Returns the boolean array of the holidays of the rule among the days of fields."""
+        mask = self._mask(fields)
+        if self.weekdays is not None:
+            mask &= _isIn(fields.w, self.weekdays)
+        if self.first_year is not None:
+            mask &= fields.y >= self.first_year
+        if self.last_year is not None:
+            mask &= fields.y <= self.last_year
+        if self.except_years:
+            mask &= ~_isIn(fields.y, self.except_years)
+        if self.every is not None:
+            mask &= fields.y % self.every == 0
+        return mask
+
+    def __and__(self, other):
+        return AllOf(self, other)
+
+    def __or__(self, other):
+        return AnyOf(self, other)
+
+    def __repr__(self):
+        params = sorted((key, value) for key, value in vars(self).items() if value not in (None, ()))
+        return "{}({})".format(self.__class__.__name__, ", ".join("{}={!r}".format(*p) for p in params))
+
+
+class _DayOfMonth(HolidayRule):
+    """A day of a month, observed days later on the given weekdays if it falls on a weekend."""
+
+    def __init__(self, month, observed=(), **restrictions):
+        super(_DayOfMonth, self).__init__(**restrictions)
+        self.month = month
+        self.observed = tuple((delta, tuple(weekdays)) for delta, weekdays in observed)
+
+    def _day(self, fields):
+        raise NotImplementedError
+
+    def _mask(self, fields):
+        day = self._day(fields)
+        mask = fields.d == day
+        for delta, weekdays in self.observed:
+            mask |= (fields.d == day + delta) & _isIn(fields.w, weekdays)
+        return mask & (fields.m == self.month)
+
+
+class FixedDate(_DayOfMonth):
+    """The same day every year, e.g. FixedDate(December, 25, observed=CHRISTMAS_BOXING_DAY)."""
+
+    def __init__(self, month, day, observed=(), **restrictions):
+        super(FixedDate, self).__init__(month, observed, **restrictions)
+        self.day = day
+
+    def _day(self, fields):
+        return self.day
+
+
+class Equinox(_DayOfMonth):
+    """The day of the vernal (in March) or autumnal (in September) equinox, moved by offset days,
+       e.g. Equinox(March, VERNAL_EQUINOX, observed=MONDAY_IF_SUNDAY)."""
+
+    def __init__(self, month, equinoxtime, offset=0, observed=(), **restrictions):
+        super(Equinox, self).__init__(month, observed, **restrictions)
+        self.equinoxtime = equinoxtime
+        self.offset = offset
+
+    def _day(self, fields):
+        return fields.perYear(("equinox", self.equinoxtime), lambda years: equinox_day(self.equinoxtime, years)) + self.offset
+
+
+class WeekdayInRange(HolidayRule):
+    """The weekday falling on one of the days firstday to lastday of the month,
+       e.g. WeekdayInRange(May, Monday, 18, 24) for the Monday on or before May 24th."""
+
+    def __init__(self, month, weekday, firstday, lastday, **restrictions):
+        super(WeekdayInRange, self).__init__(**restrictions)
+        self.month = month
+        self.weekday = weekday
+        self.firstday = firstday
+        self.lastday = lastday
+
+    def _mask(self, fields):
+        return ((fields.m == self.month) & (fields.w == self.weekday)
+                & (fields.d >= self.firstday) & (fields.d <= self.lastday))
+
+
+class NthWeekday(WeekdayInRange):
+    """The n-th weekday of the month, e.g. NthWeekday(November, Thursday, 4) for Thanksgiving."""
+
+    def __init__(self, month, weekday, n, **restrictions):
+        super(NthWeekday, self).__init__(month, weekday, 7 * n - 6, 7 * n, **restrictions)
+
+
+class LastWeekday(HolidayRule):
+    """The last weekday of the month, e.g. LastWeekday(May, Monday) for Memorial Day."""
+
+    def __init__(self, month, weekday, **restrictions):
+        super(LastWeekday, self).__init__(**restrictions)
+        self.month = month
+        self.weekday = weekday
+
+    def _mask(self, fields):
+        return (fields.m == self.month) & (fields.w == self.weekday) & (fields.d > fields.monthdays - 7)
+
+
+class EasterOffset(HolidayRule):
+    """The day offset days after Easter Sunday, e.g. EasterOffset(-2) for Good Friday."""
+
+    def __init__(self, offset=0, **restrictions):
+        super(EasterOffset, self).__init__(**restrictions)
+        self.offset = offset
+
+    def _mask(self, fields):
+        return fields.days == fields.perYear("easter", easter_sunday) + self.offset
+
+
+class OneOff(HolidayRule):
+    """Closures on single dates, e.g. OneOff(date(2012, 6, 5))."""
+
+    def __init__(self, *dates, **restrictions):
+        super(OneOff, self).__init__(**restrictions)
+        self.dates = tuple(dates)
+
+    def _mask(self, fields):
+        return _isIn(fields.days, [d.toordinal() - EPOCH_ORDINAL for d in self.dates])
+
+
+class Closure(HolidayRule):
+    """Closure from start to end (inclusive), e.g. Closure(date(2001, 9, 11), date(2001, 9, 14))."""
+
+    def __init__(self, start, end, **restrictions):
+        super(Closure, self).__init__(**restrictions)
+        self.start = start
+        self.end = end
+
+    def _mask(self, fields):
+        return ((fields.days >= self.start.toordinal() - EPOCH_ORDINAL)
+                & (fields.days <= self.end.toordinal() - EPOCH_ORDINAL))
+
+
+class AllOf(HolidayRule):
+    """Days that are holidays of all the rules."""
+
+    def __init__(self, *rules, **restrictions):
+        super(AllOf, self).__init__(**restrictions)
+        self.rules = tuple(rules)
+
+    def _mask(self, fields):
+        return np.logical_and.reduce([rule.mask(fields) for rule in self.rules])
+
+
+class AnyOf(HolidayRule):
+    """Days that are holidays of any of the rules."""
+
+    def __init__(self, *rules, **restrictions):
+        super(AnyOf, self).__init__(**restrictions)
+        self.rules = tuple(rules)
+
+    def _mask(self, fields):
+        return holiday_mask(self.rules, fields)
+
+
+def holiday_mask(rules, fields):
+    """Returns the boolean array of the days of fields that are holidays of any of the rules."""
+    mask = np.zeros(len(fields.days), dtype=bool)
+    for rule in rules:
+        mask |= rule.mask(fields)
+    return mask
+
+def holiday_days(rules, firstyear, lastyear):
+    """Returns the holidays of the years firstyear to lastyear as a datetime64[D] array."""
+    fields = DayFields.forYears(firstyear, lastyear)
+    return fields.days[holiday_mask(rules, fields)].astype("datetime64[D]")
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict, namedtuple
+
+#statistics of an LRUCache, same fields as functools.lru_cache
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+class LRUCache(object):
+    """A small least recently used cache with hit and miss counters.
+       Once maxsize entries are stored, adding a new one evicts the entry
+       that was used least recently.
+
+       >>> cache = LRUCache(maxsize=2)
+       >>> cache.put("a", 1)
+       >>> cache.put("b", 2)
+       >>> cache.get("a")
+       1
+       >>> cache.put("c", 3)
+       >>> cache.get("b") is None
+       True
+       >>> cache.info()
+       CacheInfo(hits=1, misses=1, maxsize=2, currsize=2)
+    """
+
+    def __init__(self, maxsize=32):
+        if maxsize < 0:
+            raise ValueError("Cache size must not be negative: {}".format(maxsize))
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Returns the cached value for key and marks it as recently used, or default if not cached."""
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Stores value for key, evicting the least recently used entry if the cache is full."""
+        self._entries.pop(key, None)
+        if self.maxsize == 0:
+            return
+        if len(self._entries) >= self.maxsize:
+            self._entries.popitem(last=False)
+        self._entries[key] = value
+
+    def clear(self):
+        """Drops all entries. The hit and miss counters are kept."""
+        self._entries.clear()
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import myLogger
+from globalsconstants import *
+from cashflow import Cashflow
+from cashflowportfolio import CashflowPortfolio
+from pyquantarrayutils import segment_sum
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+#ways of drawing the normal variates of the paths
+PSEUDO = "pseudo"
+ANTITHETIC = "antithetic"
+SOBOL = "sobol"
+VARIATES = (PSEUDO, ANTITHETIC, SOBOL)
+
+#memory the variates and rates of one block of paths may take
+DEFAULT_MAXBYTES = 64 * 1024 * 1024
+
+
+def _standardError(total, totalsquares, count):
+    """Standard error of the mean of count independent samples, from their sum and sum of squares."""
+    mean = total / count
+    return np.sqrt(np.maximum(totalsquares / count - mean * mean, 0.0) / count)
+
+
+class NormalVariates(object):
+    """Draws standard normal variates, one row of nsteps per path, block after block from one
+       stream, so that drawing in blocks gives the same paths as drawing all at once.
+       - "pseudo": NumPy's default generator with the seed;
+       - "antithetic": the first half of every block is drawn, the second half is its negative;
+       - "sobol": scrambled Sobol points (scipy.stats.qmc) with the seed, mapped through the
+         inverse normal distribution; blocks of a power of 2 keep the balance of the sequence.
+    """
+
+    def __init__(self, nsteps, method=PSEUDO, seed=0):
+        if method not in VARIATES:
+            raise ValueError("Unknown variates: {}".format(method))
+        self.nsteps = nsteps
+        self.method = method
+        if method == SOBOL:
+            from scipy.stats import qmc
+            self._sobol = qmc.Sobol(d=nsteps, scramble=True, seed=seed)
+        else:
+            self._generator = np.random.default_rng(seed)
+
+    def draw(self, npaths):
+        """Returns the variates of the next npaths paths as an npaths x nsteps array."""
+        if self.method == SOBOL:
+            from scipy.special import ndtri
+            points = self._sobol.random(npaths)
+            return ndtri(np.clip(points, 1.0e-16, 1.0 - 1.0e-16))
+        if self.method == ANTITHETIC:
+            half = self._generator.standard_normal(((npaths + 1) // 2, self.nsteps))
+            return np.concatenate((half, -half))[:npaths]
+        return self._generator.standard_normal((npaths, self.nsteps))
+
+
+class ShortRateModel(object):
+    """One-factor short rate model; rates are annual continuously compounded, times in years.
+       simulate fills a preallocated paths x times array step by step, vectorized over the paths."""
+
+    def __init__(self, r0, a, sigma):
+        self.r0 = r0
+        self.a = a
+        self.sigma = sigma
+
+    def simulate(self, grid, variates):
+        """Returns the short rates of the paths at the times of the grid (grid[0] == 0), given
+           one normal variate per path and step."""
+        rates = np.empty((variates.shape[0], len(grid)))
+        rates[:, 0] = self.r0
+        dts = np.diff(grid)
+        for j, dt in enumerate(dts):
+            rates[:, j + 1] = self._step(rates[:, j], grid[j], dt, variates[:, j])
+        return rates
+
+    def _step(self, r, t, dt, z):
+        raise NotImplementedError
+
+    def _ouStep(self, dt):
+        """Decay and standard deviation of an Ornstein-Uhlenbeck step of length dt."""
+        decay = np.exp(-self.a * dt)
+        return decay, self.sigma * np.sqrt(-np.expm1(-2 * self.a * dt) / (2 * self.a))
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, ", ".join(
+            "{}={}".format(name, value) for name, value in sorted(vars(self).items()) if not name.startswith("_")))
+
+
+class Vasicek(ShortRateModel):
+    """Vasicek model dr = a (b - r) dt + sigma dW, stepped exactly."""
+
+    def __init__(self, r0, a, b, sigma):
+        super(Vasicek, self).__init__(r0, a, sigma)
+        self.b = b
+
+    def _step(self, r, t, dt, z):
+        decay, deviation = self._ouStep(dt)
+        return self.b + (r - self.b) * decay + deviation * z
+
+    def getDiscountFactors(self, times):
+        """Returns the closed form zero coupon bond prices for times in days."""
+        T = np.asarray(times, dtype=np.float64) / DAYS_PER_YEAR
+        a, b, sigma = self.a, self.b, self.sigma
+        B = -np.expm1(-a * T) / a
+        A = (b - sigma**2 / (2 * a**2)) * (B - T) - sigma**2 * B**2 / (4 * a)
+        return np.exp(A - B * self.r0)
+
+
+class CIR(ShortRateModel):
+    """Cox-Ingersoll-Ross model dr = a (b - r) dt + sigma sqrt(r) dW, stepped with the
+       full truncation Euler scheme, which keeps Gaussian variates (and so Sobol points) usable."""
+
+    def __init__(self, r0, a, b, sigma):
+        super(CIR, self).__init__(r0, a, sigma)
+        self.b = b
+
+    def _step(self, r, t, dt, z):
+        positive = np.maximum(r, 0.0)
+        return r + self.a * (self.b - positive) * dt + self.sigma * np.sqrt(positive * dt) * z
+
+    def simulate(self, grid, variates):
+        """Returns the short rates of the paths, floored at 0 (negative values are only a state of the scheme)."""
+        return np.maximum(super(CIR, self).simulate(grid, variates), 0.0)
+
+    def getDiscountFactors(self, times):
+        """Returns the closed form zero coupon bond prices for times in days."""
+        T = np.asarray(times, dtype=np.float64) / DAYS_PER_YEAR
+        a, b, sigma = self.a, self.b, self.sigma
+        h = np.sqrt(a * a + 2 * sigma * sigma)
+        denominator = 2 * h + (a + h) * np.expm1(h * T)
+        A = (2 * h * np.exp((a + h) * T / 2) / denominator) ** (2 * a * b / sigma**2)
+        B = 2 * np.expm1(h * T) / denominator
+        return A * np.exp(-B * self.r0)
+
+
+class HullWhite(ShortRateModel):
+    """Hull-White one-factor model dr = (theta(t) - a r) dt + sigma dW fitted to a DiscountCurve:
+       r(t) = x(t) + alpha(t) with the Ornstein-Uhlenbeck process x, stepped exactly, and
+       alpha(t) = f(0, t) + sigma^2 / (2 a^2) (1 - exp(-a t))^2 from the forward rates of the curve."""
+
+    def __init__(self, curve, a, sigma):
+        self.curve = curve
+        super(HullWhite, self).__init__(self._forwards(np.zeros(1))[0], a, sigma)
+
+    def _forwards(self, grid):
+        """Instantaneous continuously compounded forward rates of the curve at times in years."""
+        days = grid * DAYS_PER_YEAR
+        h = 0.5
+        lower = np.maximum(days - h, 0.0)
+        logdfs = np.log(self.curve.getDiscountFactors(days + h)) - np.log(self.curve.getDiscountFactors(lower))
+        return -logdfs / (days + h - lower) * DAYS_PER_YEAR
+
+    def simulate(self, grid, variates):
+        x = np.empty((variates.shape[0], len(grid)))
+        x[:, 0] = 0.0
+        for j, dt in enumerate(np.diff(grid)):
+            decay, deviation = self._ouStep(dt)
+            x[:, j + 1] = x[:, j] * decay + deviation * variates[:, j]
+        alpha = self._forwards(grid) + self.sigma**2 / (2 * self.a**2) * np.expm1(-self.a * grid)**2
+        x += alpha
+        return x
+
+    def getDiscountFactors(self, times):
+        """Returns the zero coupon bond prices, which are those of the fitted curve."""
+        return self.curve.getDiscountFactors(np.asarray(times, dtype=np.float64))
+
+
+class MonteCarloEngine(object):
+    """Simulates short rate paths of a model and the pathwise discount factors
+       exp(-integral of r) at payment times in days, as used by Cashflow and CashflowPortfolio.
+       The time grid holds steps of 1 / stepsperyear years and all payment times. Paths are
+       generated in blocks of chunksize paths (by default as many as fit into maxbytes), so that
+       runs of millions of paths take bounded memory: iterPaths yields the blocks, getDiscountFactors
+       and getPV average over them, and price averages a pathwise payoff.
+       variates is "pseudo", "antithetic" or "sobol" (see NormalVariates); with a fixed seed,
+       results do not depend on the chunksize for pseudo and antithetic variates. For antithetic
+       variates npaths and chunksize are rounded up to even numbers, so that all paths are paired.
+       Standard errors are those of independent samples: the paths, or for antithetic variates
+       the averages of the antithetic pairs. Sobol points are not independent, so for them the
+       error is not a valid estimate; run independent seeds (scramblings) to estimate it.
+       getPV reduces the payments of a block of paths in groups of instruments of at most
+       maxbytes, so large portfolios take bounded memory as well.
+
+       >>> model = Vasicek(r0=0.03, a=0.5, b=0.04, sigma=0.01)
+       >>> engine = MonteCarloEngine(model, [365, 1825], npaths=20000, variates="antithetic", seed=1)
+       >>> bool(np.all(np.abs(engine.getDiscountFactors() - model.getDiscountFactors([365, 1825])) < 1.0e-3))
+       True
+       >>> cf = Cashflow([0, 1, 5], [-100.0, 5.0, 105.0], time_type = "Annual")
+       >>> pv, error = engine.getPV(cf)
+       >>> bool(abs(pv - np.dot(cf.cf.values, model.getDiscountFactors([0, 365, 1825]))) < 3 * error + 1.0e-2)
+       True
+    """
+
+    def __init__(self, model, times, npaths, stepsperyear=52, variates=PSEUDO, seed=0, chunksize=None, maxbytes=DEFAULT_MAXBYTES):
+        self.logger = myLogger.getLogger(__name__)
+        self.model = model
+        self.times = np.unique(np.asarray(times, dtype=np.float64))
+        self.npaths = npaths
+        self.variates = variates
+        self.seed = seed
+        self.maxbytes = maxbytes
+        years = self.times / DAYS_PER_YEAR
+        last = years[-1] if len(years) else 0.0
+        steps = np.arange(int(np.ceil(last * stepsperyear)) + 1) / float(stepsperyear)
+        self.grid = np.union1d(steps[steps < last], np.concatenate(([0.0], years)))
+        self._positions = np.searchsorted(self.grid, years)
+        nsteps = max(len(self.grid) - 1, 1)
+        if chunksize is None:
+            chunksize = max(2, maxbytes // (3 * 8 * nsteps))
+            #even for antithetic pairs, a power of 2 for Sobol points
+            chunksize = 2 ** int(np.log2(chunksize)) if variates == SOBOL else chunksize // 2 * 2
+        if variates == ANTITHETIC:
+            self.npaths += npaths % 2
+            chunksize += chunksize % 2
+        self.chunksize = chunksize
+
+    def iterPaths(self):
+        """Yields blocks of (rates, discountfactors): the short rates on the grid and the pathwise
+           discount factors at the times, one row per path."""
+        variates = NormalVariates(max(len(self.grid) - 1, 1), self.variates, self.seed)
+        dts = np.diff(self.grid)
+        for start in range(0, self.npaths, self.chunksize):
+            n = min(self.chunksize, self.npaths - start)
+            rates = self.model.simulate(self.grid, variates.draw(n))
+            #trapezoidal integral of the short rate along every path
+            integrals = np.zeros(rates.shape)
+            np.cumsum(0.5 * (rates[:, 1:] + rates[:, :-1]) * dts, axis=1, out=integrals[:, 1:])
+            yield rates, np.exp(-integrals[:, self._positions])
+
+    def _samples(self, values):
+        """Independent samples of the pathwise values of a block (one row per path): the paths
+           themselves, or for antithetic variates the averages of the pairs of paths (see NormalVariates)."""
+        if self.variates != ANTITHETIC:
+            return values
+        half = len(values) // 2
+        return 0.5 * (values[:half] + values[half:])
+
+    def getDiscountFactors(self):
+        """Returns the Monte Carlo estimates of the discount factors at the times."""
+        total = np.zeros(len(self.times))
+        for rates, discountfactors in self.iterPaths():
+            total += discountfactors.sum(axis=0)
+        return total / self.npaths
+
+    def price(self, payoff):
+        """Averages a pathwise payoff over all paths. payoff(rates, discountfactors) gets the rates on
+           the grid and the discount factors at the times of a block of paths and returns the
+           discounted value of every path. Returns the estimate and its standard error."""
+        total = sampletotal = samplesquares = 0.0
+        nsamples = 0
+        for rates, discountfactors in self.iterPaths():
+            values = payoff(rates, discountfactors)
+            total += values.sum()
+            samples = self._samples(values)
+            sampletotal += samples.sum()
+            samplesquares += np.dot(samples, samples)
+            nsamples += len(samples)
+        mean = total / self.npaths
+        error = _standardError(sampletotal, samplesquares, nsamples)
+        self.logger.info("Priced %s paths: %s +- %s", self.npaths, mean, error)
+        return mean, error
+
+    def getPV(self, cashflows):
+        """Returns the PV of a Cashflow, or the PVs of the instruments of a CashflowPortfolio, with
+           their standard errors. The payment times must be 0 or among the times of the engine."""
+        if isinstance(cashflows, Cashflow):
+            times, amounts, offsets = cashflows.daily_payment_schedule, cashflows.cf.values, np.array([0, len(cashflows.cf)])
+        else:
+            times, amounts, offsets = cashflows.times, cashflows.amounts, cashflows.offsets
+        #payments at day 0 are not discounted
+        known = np.concatenate(([0.0], self.times))
+        columns = np.searchsorted(known, times)
+        if np.any(columns >= len(known)) or np.any(known[np.minimum(columns, len(known) - 1)] != times):
+            raise ValueError("Payment times are not times of the Monte Carlo engine")
+        ninstruments = len(offsets) - 1
+        total, sampletotal, samplesquares = np.zeros(ninstruments), np.zeros(ninstruments), np.zeros(ninstruments)
+        nsamples = 0
+        for rates, discountfactors in self.iterPaths():
+            discountfactors = np.hstack((np.ones((len(discountfactors), 1)), discountfactors))
+            #payments x paths blocks of at most maxbytes, cut at instrument boundaries
+            group = max(1, self.maxbytes // (16 * len(discountfactors)))
+            first = 0
+            while first < ninstruments:
+                last = max(first + 1, int(np.searchsorted(offsets, offsets[first] + group, side="right")) - 1)
+                payments = slice(offsets[first], offsets[last])
+                #one row per payment, one column per path
+                block = discountfactors.T[columns[payments]]
+                block *= amounts[payments, np.newaxis]
+                values = segment_sum(block, offsets[first:last + 1] - offsets[first])
+                total[first:last] += values.sum(axis=1)
+                samples = self._samples(values.T)
+                sampletotal[first:last] += samples.sum(axis=0)
+                samplesquares[first:last] += (samples * samples).sum(axis=0)
+                first = last
+            nsamples += len(self._samples(discountfactors[:, 0]))
+        mean = total / self.npaths
+        errors = _standardError(sampletotal, samplesquares, nsamples)
+        if isinstance(cashflows, Cashflow):
+            return mean[0], errors[0]
+        return mean, errors
+
+    def __repr__(self):
+        return "MonteCarloEngine(model={!r}, npaths={}, steps={}, variates={!r})".format(
+            self.model, self.npaths, len(self.grid) - 1, self.variates)
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
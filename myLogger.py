@@ -1,38 +1,176 @@
+import os
 import sys
+import queue
+import threading
 import logging
+import logging.handlers
 import colorstreamhandler
 
+#level given to new loggers unless another one is passed; debug and info records
+#of pricing calls format whole arrays, so they are off unless asked for
+DEFAULT_LEVEL = logging.WARNING
+
+#records at this level and below are dropped by all pyquant loggers, see setProductionMode
+_disabled = logging.NOTSET
+
+#one console handler per logger name, shared by all loggers of that name
+_handlers = {}
+
+#process-wide loggers handed out by getLogger
+_loggers = {}
+_lock = threading.Lock()
+
+#set while records are emitted from a background thread, see startQueueLogging
+_queueHandler = None
+_queueListener = None
+
+def setProductionMode(enabled = True, level = logging.INFO):
+	"""Switches the loggers from getLogger to production mode: records at level and
+	   below are dropped by a single comparison, before any message is formatted.
+	   Other loggers of the process are not affected.
+	   setProductionMode(False) restores normal logging.
+	   Production mode is also switched on at import if the environment
+	   variable PYQUANT_PRODUCTION is set to 1.
+	"""
+	global _disabled
+	_disabled = level if enabled else logging.NOTSET
+
+def isProductionMode():
+	return _disabled > logging.NOTSET
+
+def getLogger(moduleName, logLevel = None):
+	"""Returns the process-wide TLogger for moduleName, creating it on first use.
+	   Use this instead of creating a TLogger per object: instruments then share
+	   one logger per module and constructing them costs a dictionary lookup.
+
+	   >>> getLogger("myLogger module testlogger") is getLogger("myLogger module testlogger")
+	   True
+	"""
+	logger = _loggers.get(moduleName)
+	if logger is None:
+		with _lock:
+			logger = _loggers.get(moduleName)
+			if logger is None:
+				logger = _loggers[moduleName] = TLogger(moduleName, logLevel)
+	return logger
+
+class _QueueHandler(logging.handlers.QueueHandler):
+	"""Puts records on the queue as they are. Formatting is left to the
+	   listener thread, so arguments passed to a log call must not be
+	   changed afterwards."""
+
+	def prepare(self, record):
+		return record
+
+class _HandlerRouter(logging.Handler):
+	"""Hands each record taken off the queue to the console handler of its logger."""
+
+	def handle(self, record):
+		handler = _handlers.get(record.name)
+		if handler is not None and record.levelno >= handler.level:
+			handler.handle(record)
+
+def startQueueLogging():
+	"""Moves log output off the calling threads: the loggers from getLogger only
+	   put records on a queue and a background listener formats and writes them.
+	   stopQueueLogging() flushes the queue and restores direct output.
+
+	   >>> log = getLogger("myLogger module queuelogger")
+	   >>> startQueueLogging()
+	   >>> isinstance(log.handlers[0], logging.handlers.QueueHandler)
+	   True
+	   >>> stopQueueLogging()
+	   >>> log.handlers == [_handlers["myLogger module queuelogger"]]
+	   True
+	"""
+	global _queueHandler, _queueListener
+	with _lock:
+		if _queueListener is not None:
+			return
+		records = queue.Queue()
+		_queueHandler = _QueueHandler(records)
+		_queueListener = logging.handlers.QueueListener(records, _HandlerRouter())
+		_queueListener.start()
+		for logger in _loggers.values():
+			logger.handlers = [_queueHandler]
+
+def stopQueueLogging():
+	"""Writes out all queued records, stops the listener thread and lets the loggers
+	   write directly to their console handlers again."""
+	global _queueHandler, _queueListener
+	with _lock:
+		if _queueListener is None:
+			return
+		_queueListener.stop()
+		_queueHandler = _queueListener = None
+		for name, logger in _loggers.items():
+			logger.handlers = [_handlers[name]]
+
+def _sharedHandler(moduleName, logLevel, logFormat):
+	"""Returns the console handler for moduleName, creating it on first use."""
+	ch = _handlers.get(moduleName)
+	if ch is None:
+		# create console handler and set level to debug
+		ch = colorstreamhandler.ColorizingStreamHandler()
+		#ch = logging.StreamHandler(sys.stdout) #see http://www.daniweb.com/software-development/python/threads/142823/doctest-logging
+		ch.setLevel(logLevel)
+
+		# create formatter
+		formatter = logging.Formatter(logFormat)
+
+		# add formatter to ch
+		ch.setFormatter(formatter)
+		_handlers[moduleName] = ch
+	return ch
+
 class TLogger(logging.Logger):
 	"""Create a loggger subclass which gets  
 	   a logger with the name of the module that calls it.
+	   All loggers with the same name write through one shared handler.
+	   Pass arguments instead of formatted strings, e.g. logger.debug("PV: %s", pv),
+	   so that messages are only formatted if they are emitted.
 	   
 	   >>> mylog = TLogger("myLogger module testlogger")
 	   >>> mylog.info("I am a logger info.") # doctest: +ELLIPSIS, +NORMALIZE_WHITESPACE
 	   >>> mylog.warn("I am a logger warning.") # doctest: +ELLIPSIS, +NORMALIZE_WHITESPACE
 	   >>> mylog.error("I am a logger error.") # doctest: +ELLIPSIS, +NORMALIZE_WHITESPACE
 	   >>> mylog.critical("I am a logger critical error.") # doctest: +ELLIPSIS, +NORMALIZE_WHITESPACE
+	   >>> TLogger("myLogger module testlogger").handlers == mylog.handlers
+	   True
+	   >>> mylog.setLevel(logging.DEBUG)
+	   >>> setProductionMode(True)
+	   >>> mylog.isEnabledFor(logging.DEBUG), mylog.isEnabledFor(logging.ERROR)
+	   (False, True)
+	   >>> other = logging.getLogger("myLogger module other")
+	   >>> other.setLevel(logging.DEBUG)
+	   >>> other.isEnabledFor(logging.INFO)
+	   True
+	   >>> setProductionMode(False)
 	"""
 	
-	def __init__(self, moduleName, logLevel = logging.DEBUG, logFormat = '%(asctime)s - %(name)s - %(levelname)s - %(message)s' ):
+	def __init__(self, moduleName, logLevel = None, logFormat = '%(asctime)s - %(name)s - %(levelname)s - %(message)s' ):
 		# create logger
 		super(TLogger, self).__init__(moduleName)
+		if logLevel is None:
+			logLevel = DEFAULT_LEVEL
 		self.setLevel(logLevel)
 
-		# create console handler and set level to debug
-		ch = colorstreamhandler.ColorizingStreamHandler()
-		#ch = logging.StreamHandler(sys.stdout) #see http://www.daniweb.com/software-development/python/threads/142823/doctest-logging
-		ch.setLevel(logLevel)
-
-		# create formatter
-		formatter = logging.Formatter(logFormat)
+		# add the shared console handler, or the queue while queue logging is on
+		handler = _sharedHandler(moduleName, logLevel, logFormat)
+		self.addHandler(_queueHandler or handler)
 
-		# add formatter to ch
-		ch.setFormatter(formatter)
+	def isEnabledFor(self, level):
+		"""Cheap level check used by debug(), info(), etc. before anything is formatted."""
+		return level > _disabled and level > self.manager.disable and level >= self.level
 
-		# add ch to logger
-		self.addHandler(ch) 
+	def __reduce__(self):
+		# pickle by name: unpickling returns the process-wide logger instead of copying handlers
+		return getLogger, (self.name,)
 		
 
+if os.environ.get("PYQUANT_PRODUCTION") == "1":
+	setProductionMode(True)
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+##
+# Helpers for ragged (CSR-style) arrays, where segment i of a flat array
+# covers the elements offsets[i]:offsets[i+1]. Used to hold the payments of
+# many instruments in one array.
+
+def segment_sum(values, offsets):
+    """Sums values along the first axis over the segments given by offsets.
+       Empty segments sum to zero.
+
+       >>> segment_sum(np.array([1.0, 2.0, 3.0]), np.array([0, 2, 2, 3])).tolist()
+       [3.0, 0.0, 3.0]
+    """
+    counts = np.diff(offsets)
+    sums = np.zeros((len(counts),) + values.shape[1:])
+    nonempty = np.flatnonzero(counts)
+    if len(nonempty):
+        sums[nonempty] = np.add.reduceat(values, offsets[:-1][nonempty], axis=0)
+    return sums
+
+def select_segments(offsets, selected, *arrays):
+    """Returns the offsets and the flat arrays restricted to the selected segments.
+       selected is a boolean mask or an array of segment numbers.
+
+       >>> offsets, values = select_segments(np.array([0, 2, 2, 3]), np.array([2, 0]), np.array([1.0, 2.0, 3.0]))
+       >>> offsets.tolist(), values.tolist()
+       ([0, 1, 3], [3.0, 1.0, 2.0])
+    """
+    selected = np.asarray(selected)
+    if selected.dtype == bool:
+        selected = np.flatnonzero(selected)
+    starts = offsets[:-1][selected]
+    counts = np.diff(offsets)[selected]
+    suboffsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+    index = np.arange(suboffsets[-1]) - np.repeat(suboffsets[:-1] - starts, counts)
+    return (suboffsets,) + tuple(a[index] for a in arrays)
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
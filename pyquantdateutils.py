@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import datetime as dt
 import time as tm
+import numpy as np
+import pandas as pd
 import myLogger
 
 # create logger
-module_logger = myLogger.TLogger(__name__)
+module_logger = myLogger.getLogger(__name__)
 
 ##
 # Convert an Excel number (presumed to represent a date, a datetime or a time) into
@@ -26,7 +28,8 @@ module_logger = myLogger.TLogger(__name__)
 # @throws XLDateBadDatemode datemode arg is neither 0 nor 1
 # @throws XLDateError Covers the 4 specific errors
 
-_XLDAYS_TOO_LARGE = 100000
+#first serial number in year 10000, by datemode (9999-12-31 is 2958465 in the 1900 datemode)
+_XLDAYS_TOO_LARGE = (2958466, 2958466 - 1462)
 
 def xldate_as_datetime(xldate, datemode=0):
     if datemode not in (0, 1):
@@ -42,7 +45,7 @@ def xldate_as_datetime(xldate, datemode=0):
     if seconds == 86400:
         seconds = 0
         xldays += 1
-    if xldays >= _XLDAYS_TOO_LARGE:
+    if xldays >= _XLDAYS_TOO_LARGE[datemode]:
         raise XLDateTooLarge(xldate)
 
     if xldays == 0:
@@ -65,6 +68,126 @@ def datetime_as_xldate(pydatetime):
     delta = pydatetime - temp
     return float(delta.days) + (float(delta.seconds) / 86400)
 
+#error codes of the array conversions, one per element instead of an exception
+XLDATE_OK = 0
+XLDATE_NEGATIVE = 1
+XLDATE_AMBIGUOUS = 2
+XLDATE_TOO_LARGE = 3
+XLDATE_INVALID = 4
+XLDATE_TIME = 5
+
+def _xldate_base(datemode):
+    """Day that Excel serial number 0 stands for, counting serial 60 as the nonexistent 1900-02-29."""
+    if datemode not in (0, 1):
+        raise XLDateBadDatemode(datemode)
+    return np.datetime64("1899-12-30", "D") + 1462 * datemode
+
+def xldates_to_datetime64(xldates, datemode=0):
+    """Converts an array of Excel numbers into datetime64[s], to the nearest second, like
+       xldate_as_datetime does for one number. Instead of raising, it returns the dates
+       together with an array of error codes:
+       XLDATE_NEGATIVE for negative numbers, XLDATE_AMBIGUOUS for the days before
+       1900-03-01 in the 1900 datemode (1.0 <= xldate < 61.0), XLDATE_TOO_LARGE for
+       Gregorian year 10000 or later and XLDATE_INVALID for NaN and infinities. These dates are NaT.
+       Numbers below 1.0 are times of day; they are returned on the day of serial 0 with
+       the code XLDATE_TIME. All other codes are XLDATE_OK.
+
+       >>> dates, errors = xldates_to_datetime64([40534, 40534.5, 59, -1, 0.25])
+       >>> [str(date) for date in dates]
+       ['2010-12-22T00:00:00', '2010-12-22T12:00:00', 'NaT', 'NaT', '1899-12-30T06:00:00']
+       >>> errors.tolist()
+       [0, 0, 2, 1, 5]
+       >>> xldates_to_datetime64([39072.0], datemode=1)[0]
+       array(['2010-12-22T00:00:00'], dtype='datetime64[s]')
+       >>> dates, errors = xldates_to_datetime64([2958465, 2958466, 1e300, np.inf, -np.inf])
+       >>> str(dates[0]), errors.tolist()
+       ('9999-12-31T00:00:00', [0, 3, 3, 4, 4])
+    """
+    base = _xldate_base(datemode)
+    xldates = np.asarray(xldates, dtype=np.float64)
+    errors = np.zeros(xldates.shape, dtype=np.int8)
+    finite = np.isfinite(xldates)
+    with np.errstate(invalid="ignore"):
+        #range check before the cast to int64, which huge numbers overflow
+        toolarge = finite & (xldates >= _XLDAYS_TOO_LARGE[datemode])
+        valid = finite & (xldates >= 0.0) & ~toolarge
+        numbers = np.where(valid, xldates, 0.0)
+        xldays = np.floor(numbers)
+        seconds = xldays.astype(np.int64) * 86400 + np.round((numbers - xldays) * 86400.0).astype(np.int64)
+        xldays = seconds // 86400
+        errors[finite & (xldates < 0.0)] = XLDATE_NEGATIVE
+    errors[~finite] = XLDATE_INVALID
+    #rounding to the second may carry the last second of 9999-12-31 into year 10000
+    toolarge |= valid & (xldays >= _XLDAYS_TOO_LARGE[datemode])
+    errors[toolarge] = XLDATE_TOO_LARGE
+    valid &= ~toolarge
+    errors[valid & (xldays > 0) & (xldays < 61) & (datemode == 0)] = XLDATE_AMBIGUOUS
+    errors[valid & (xldays == 0)] = XLDATE_TIME
+    dates = base.astype("datetime64[s]") + seconds
+    dates[(errors != XLDATE_OK) & (errors != XLDATE_TIME)] = np.datetime64("NaT")
+    return dates, errors
+
+def datetime64_to_xldates(dates, datemode=0):
+    """Converts an array of dates (datetime64, DatetimeIndex, Series or list of datetimes)
+       into Excel numbers of the datemode, the inverse of xldates_to_datetime64, and returns
+       them with an array of error codes. Dates without a valid number are NaN with the codes
+       XLDATE_NEGATIVE (before the day of serial 0), XLDATE_AMBIGUOUS (before 1900-03-01 in
+       the 1900 datemode), XLDATE_TOO_LARGE (year 10000 or later) and XLDATE_INVALID (NaT).
+
+       >>> xldates, errors = datetime64_to_xldates(np.array(['2010-12-22T12:00', '1900-01-01', 'NaT'], dtype='datetime64[m]'))
+       >>> xldates.tolist(), errors.tolist()
+       ([40534.5, nan, nan], [0, 2, 4])
+    """
+    base = _xldate_base(datemode)
+    values = as_datetime64(dates)
+    nat = np.isnat(values)
+    seconds = (values.astype("datetime64[s]") - base).astype(np.int64)
+    xldates = seconds / 86400.0
+    errors = np.zeros(values.shape, dtype=np.int8)
+    errors[xldates < 0.0] = XLDATE_NEGATIVE
+    errors[(xldates >= 1.0) & (xldates < 61.0) & (datemode == 0)] = XLDATE_AMBIGUOUS
+    errors[xldates >= _XLDAYS_TOO_LARGE[datemode]] = XLDATE_TOO_LARGE
+    errors[nat] = XLDATE_INVALID
+    xldates[errors != XLDATE_OK] = np.nan
+    return xldates, errors
+
+def is_date_array(dates):
+    """True for inputs handled by the vectorized date functions: NumPy arrays,
+       pandas DatetimeIndex or Series, and lists or tuples of dates."""
+    return isinstance(dates, (np.ndarray, pd.Index, pd.Series, list, tuple))
+
+def as_datetime64(dates):
+    """Returns a datetime64 array for a datetime64 array, a DatetimeIndex, a Series
+       or a list of datetimes. datetime64 input is returned as is, keeping its unit.
+
+       >>> as_datetime64([dt.date(2012, 7, 4), dt.date(2012, 7, 5)])
+       array(['2012-07-04T00:00:00.000000', '2012-07-05T00:00:00.000000'],
+             dtype='datetime64[us]')
+    """
+    values = np.asarray(dates)
+    if values.dtype.kind != "M":
+        values = values.astype("datetime64[us]")
+    return values
+
+def datetime64_as_days(values):
+    """Returns the day numbers, counted from 1970-01-01, of a datetime64 array.
+       Times of day are dropped; NaT maps to the smallest int64.
+
+       >>> datetime64_as_days(np.array(['1970-01-02T12:00', '1969-12-31'], dtype='datetime64[m]')).tolist()
+       [1, -1]
+    """
+    return values.astype("datetime64[D]").astype(np.int64)
+
+def like_dates(dates, values):
+    """Wraps the array values like the date input it was computed from: a Series with
+       the same index for a Series, a DatetimeIndex for a DatetimeIndex if values are dates,
+       the plain array otherwise."""
+    if isinstance(dates, pd.Series):
+        return pd.Series(values, index=dates.index, name=dates.name)
+    if isinstance(dates, pd.DatetimeIndex) and values.dtype.kind == "M":
+        return pd.DatetimeIndex(values, name=dates.name)
+    return values
+
 class Error(Exception):
     """Base class for exceptions in this module."""
     pass
@@ -80,14 +203,14 @@ class XLDateBadDatemode(Error):
     def __init__(self, expr):
         self.expr = expr
         self.msg = "Datemode should be 0 or 1 for 1900 or 1904 mode."
-        print self.msg
+        super(XLDateBadDatemode, self).__init__(self.msg)
     
 class XLDateNegative(Error):
     """Raised when a negative Excel date was passed."""
     def __init__(self, expr):
         self.expr = expr
         self.msg = "A negative Excel date was passed."
-        print self.msg
+        super(XLDateNegative, self).__init__(self.msg)
 
 class XLDateTooLarge(Error):
     """Raised when an extremely large Excel date was passed."""
@@ -100,11 +223,11 @@ class XLDateAmbiguous(Error):
 
 if __name__ == "__main__" :
     myxldate = xldate_as_datetime(40534)
-    print myxldate
+    print(myxldate)
     #myxldate = xldate_as_datetime(40534,2)
     #myxldate = xldate_as_datetime(-40534)
     #print myxldate
     a = dt.datetime.now()
-    print a
+    print(a)
     b = datetime_as_xldate(a)
-    print b
+    print(b)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import myLogger
+from globalsconstants import *
+from pyquantarrayutils import segment_sum
+from discountcurve import DiscountCurve
+from cashflowportfolio import CashflowPortfolio
+try:
+    import scipy.sparse as sparse
+except ImportError:
+    sparse = None
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+#memory the discount factor blocks of one chunk of scenarios may take
+DEFAULT_MAXBYTES = 64 * 1024 * 1024
+
+
+class ScenarioEngine(object):
+    """Prices a portfolio under many rate scenarios at once and returns a matrix of PVs with
+       one row per instrument and one column per scenario, like CashflowPortfolio.getPVMatrix.
+       The payment days of all instruments are reduced to one grid of distinct days and the
+       amounts to a sparse instruments x days matrix, so the PVs of a block of scenarios are one
+       sparse matrix product with the days x scenarios discount factors. Without scipy the
+       discount factors are gathered onto the payments and summed per instrument instead.
+       Scenarios are processed in chunks so that a block of discount factors takes at most maxbytes.
+       The base is a flat annual rate r or a DiscountCurve; scenarios are
+       - parallel shifts of the continuously compounded zero rates (getParallelPVMatrix),
+       - twists, shifts changing linearly from a short end shift at day 0 to a long end shift
+         at pivotday and constant after it (getTwistPVMatrix),
+       - full curves replacing the base (getCurvePVMatrix).
+       portfolio is a CashflowPortfolio or a sequence of Cashflow objects.
+
+       >>> pf = CashflowPortfolio([0, 3, 5], [0, 365, 730, 0, 365], [-100.0, 10.0, 110.0, -50.0, 55.0])
+       >>> engine = ScenarioEngine(pf, 0.05)
+       >>> np.round(engine.getParallelPVMatrix([0.0, 0.01]), 5).tolist()
+       [[9.29705, 7.22665], [2.38095, 1.85975]]
+       >>> curves = [DiscountCurve.fromZeroRates([365, 730], [r, r]) for r in (0.0, 0.05)]
+       >>> np.round(engine.getCurvePVMatrix(curves), 5).tolist() == np.round(pf.getPVMatrix([0.0, 0.05]), 5).tolist()
+       True
+    """
+
+    def __init__(self, portfolio, base, maxbytes=DEFAULT_MAXBYTES):
+        self.logger = myLogger.getLogger(__name__)
+        if not isinstance(portfolio, CashflowPortfolio):
+            portfolio = CashflowPortfolio.fromCashflows(portfolio)
+        self.portfolio = portfolio
+        self.base = base
+        self.maxbytes = maxbytes
+        #shared grid of payment days
+        self.days, self._inverse = np.unique(portfolio.times, return_inverse=True)
+        self._inverse = self._inverse.ravel()
+        self.years = self.days / DAYS_PER_YEAR
+        self._amounts = None
+        if sparse is not None:
+            self._amounts = sparse.csr_matrix((portfolio.amounts, self._inverse, portfolio.offsets),
+                                              shape=(len(portfolio), len(self.days)))
+        if isinstance(base, DiscountCurve):
+            self.discountfactors = base.getDiscountFactors(self.days)
+        else:
+            self.discountfactors = np.exp(-self.years * np.log1p(base))
+
+    def _chunkSize(self):
+        """Number of scenarios per chunk."""
+        rows = len(self.portfolio.times) if self._amounts is None else max(len(self.days), len(self.portfolio))
+        return max(1, self.maxbytes // (8 * max(rows, 1)))
+
+    def _pvMatrix(self, nscenarios, discountfactors):
+        """PV matrix for nscenarios scenarios, where discountfactors(start, end) returns the
+           discount factors of the day grid for the scenarios start to end, one column each."""
+        pv = np.empty((len(self.portfolio), nscenarios))
+        chunk = self._chunkSize()
+        for start in range(0, nscenarios, chunk):
+            end = min(start + chunk, nscenarios)
+            if self._amounts is not None:
+                pv[:, start:end] = self._amounts.dot(discountfactors(start, end))
+            else:
+                block = discountfactors(start, end)[self._inverse]
+                block *= self.portfolio.amounts[:, np.newaxis]
+                pv[:, start:end] = segment_sum(block, self.portfolio.offsets)
+        self.logger.info("Priced %s instruments under %s scenarios in chunks of %s", len(self.portfolio), nscenarios, chunk)
+        return pv
+
+    def getParallelPVMatrix(self, shifts):
+        """Returns the PVs for parallel shifts of the continuously compounded zero rates of the base."""
+        shifts = np.asarray(shifts, dtype=np.float64)
+        return self._pvMatrix(len(shifts), lambda start, end:
+                              self.discountfactors[:, np.newaxis] * np.exp(-np.multiply.outer(self.years, shifts[start:end])))
+
+    def getTwistPVMatrix(self, shortshifts, longshifts, pivotday=10 * 365):
+        """Returns the PVs for twists of the continuously compounded zero rates of the base: scenario i
+           shifts day 0 by shortshifts[i] and days from pivotday on by longshifts[i], linearly in between."""
+        shortshifts = np.asarray(shortshifts, dtype=np.float64)
+        longshifts = np.broadcast_to(np.asarray(longshifts, dtype=np.float64), shortshifts.shape)
+        weights = np.minimum(self.days / float(pivotday), 1.0)[:, np.newaxis]
+        def discountfactors(start, end):
+            shifts = shortshifts[start:end] + weights * (longshifts[start:end] - shortshifts[start:end])
+            return self.discountfactors[:, np.newaxis] * np.exp(-self.years[:, np.newaxis] * shifts)
+        return self._pvMatrix(len(shortshifts), discountfactors)
+
+    def getCurvePVMatrix(self, curves):
+        """Returns the PVs for a sequence of DiscountCurve scenarios, or for a matrix of discount factors
+           with one row per day of the grid (days) and one column per scenario."""
+        if isinstance(curves, np.ndarray):
+            return self._pvMatrix(curves.shape[1], lambda start, end: curves[:, start:end])
+        curves = list(curves)
+        return self._pvMatrix(len(curves), lambda start, end:
+                              np.column_stack([curve.getDiscountFactors(self.days) for curve in curves[start:end]]))
+
+    def __repr__(self):
+        return "ScenarioEngine(instruments={}, days={})".format(len(self.portfolio), len(self.days))
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()
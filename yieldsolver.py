@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+import numpy as np
+import myLogger
+from globalsconstants import *
+from pyquantarrayutils import segment_sum, select_segments
+
+# create logger
+module_logger = myLogger.getLogger(__name__)
+
+#result of a batched IRR solve, one entry per instrument
+IRRResult = namedtuple("IRRResult", ["irr", "converged", "iterations"])
+
+#rates at which failed instruments are probed for a sign change before bisecting
+_BRACKET_RATES = np.array([-0.99, -0.9, -0.5, -0.2, 0.0, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 64.0, 256.0, 1024.0])
+
+
+def _initialGuess(offsets, years, amounts, targets):
+    """Estimates log(1 + IRR) from the ratio of inflows to outflows and
+       the distance between their weighted average payment times."""
+    inflows = np.where(amounts > 0.0, amounts, 0.0)
+    outflows = np.where(amounts < 0.0, -amounts, 0.0)
+    p = segment_sum(inflows, offsets)
+    n = segment_sum(outflows, offsets) + targets
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = segment_sum(inflows * years, offsets) / p - segment_sum(outflows * years, offsets) / n
+        x = np.log(p / n) / t
+    x[~np.isfinite(x)] = np.log1p(0.05)
+    return np.clip(x, np.log1p(-0.5), np.log1p(1.0))
+
+
+def _bisect(offsets, years, amounts, targets, tol, maxiter):
+    """Bracketing fallback: finds a sign change on a fixed grid of rates and
+       bisects all brackets at once. Instruments without a sign change get NaN."""
+    rows = np.repeat(np.arange(len(targets)), np.diff(offsets))
+    xs = np.log1p(_BRACKET_RATES)
+    f = segment_sum(amounts[:, np.newaxis] * np.exp(-np.multiply.outer(years, xs)), offsets) - targets[:, np.newaxis]
+    change = np.signbit(f[:, :-1]) != np.signbit(f[:, 1:])
+    found = change.any(axis=1)
+    first = np.argmax(change, axis=1)
+    index = np.arange(len(targets))
+    lo, hi = xs[first], xs[first + 1]
+    flo = f[index, first]
+    iterations = np.zeros(len(targets), dtype=np.int64)
+    active = found.copy()
+    for i in range(maxiter):
+        if not active.any():
+            break
+        mid = 0.5 * (lo + hi)
+        fmid = segment_sum(amounts * np.exp(-years * mid[rows]), offsets) - targets
+        left = np.signbit(fmid) == np.signbit(flo)
+        lo = np.where(active & left, mid, lo)
+        flo = np.where(active & left, fmid, flo)
+        hi = np.where(active & ~left, mid, hi)
+        iterations += active
+        active &= np.expm1(hi) - np.expm1(lo) > tol
+    irr = np.where(found, np.expm1(0.5 * (lo + hi)), np.nan)
+    return irr, found, iterations
+
+
+def solveIRR(offsets, times, amounts, targets=None, tol=1.0e-8, maxiter=50):
+    """Solves the internal rates of return of many cashflows at once.
+       The payments of instrument i are times[offsets[i]:offsets[i+1]] (days from
+       the start of the cashflow) and amounts[offsets[i]:offsets[i+1]], the layout
+       used by CashflowPortfolio.
+       If targets (e.g. dirty prices) are given, the rate returned is the yield at
+       which the PV of the amounts equals the target, otherwise the PV is zero.
+       tol is the tolerance on the rate, either one value or one per instrument.
+       All instruments are iterated together with a Halley step on log(1 + r)
+       using analytic first and second derivatives. Instruments that do not
+       converge within maxiter steps are solved again by bisection.
+
+       >>> result = solveIRR([0, 3, 5], [0, 365, 730, 0, 365], [-100.0, 10.0, 110.0, -50.0, 55.0])
+       >>> np.round(result.irr, 8).tolist()
+       [0.1, 0.1]
+       >>> result.converged.tolist()
+       [True, True]
+       >>> np.round(solveIRR([0, 2], [365, 730], [10.0, 110.0], targets=[100.0]).irr, 8).tolist()
+       [0.1]
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    years = np.asarray(times, dtype=np.float64) / DAYS_PER_YEAR
+    amounts = np.asarray(amounts, dtype=np.float64)
+    n = len(offsets) - 1
+    targets = np.zeros(n) if targets is None else np.broadcast_to(np.asarray(targets, dtype=np.float64), (n,))
+    tol = np.broadcast_to(np.asarray(tol, dtype=np.float64), (n,))
+    rows = np.repeat(np.arange(n), np.diff(offsets))
+
+    x = _initialGuess(offsets, years, amounts, targets)
+    converged = np.zeros(n, dtype=bool)
+    iterations = np.zeros(n, dtype=np.int64)
+    for i in range(maxiter):
+        active = ~converged
+        if not active.any():
+            break
+        weighted = amounts * np.exp(-years * x[rows])
+        f = segment_sum(weighted, offsets) - targets
+        weighted *= years
+        f1 = -segment_sum(weighted, offsets)
+        weighted *= years
+        f2 = segment_sum(weighted, offsets)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            step = 2.0 * f * f1 / (2.0 * f1 * f1 - f * f2)
+            newton = f / f1
+        step = np.where(np.isfinite(step), step, newton)
+        #safeguard: never move further than a factor e in 1 + r per iteration
+        step = np.clip(step, -1.0, 1.0)
+        ok = active & np.isfinite(step)
+        xnew = np.where(ok, x - step, x)
+        converged |= ok & (np.abs(np.expm1(xnew) - np.expm1(x)) <= tol)
+        iterations += active
+        x = xnew
+
+    irr = np.expm1(x)
+    failed = ~converged | ~np.isfinite(irr)
+    if failed.any():
+        module_logger.info("Newton iteration failed for %s of %s instruments, bisecting", failed.sum(), n)
+        index = np.flatnonzero(failed)
+        suboffsets, subyears, subamounts = select_segments(offsets, failed, years, amounts)
+        irr[index], converged[index], extra = _bisect(suboffsets, subyears, subamounts, targets[index], tol[index], 100)
+        iterations[index] += extra
+    return IRRResult(irr, converged, iterations)
+
+
+if __name__ == "__main__" :
+    import doctest
+    doctest.testmod()